@@ -0,0 +1,252 @@
+import numpy as np
+from scripts.price_index import PriceIndex
+
+
+''' MARKET PARAMETERS '''
+# float equivalents of the parameters of `scripts/deploy.py`
+PRICE_FRAME_CAP = 5.
+FEE = .0015
+
+''' STORE PARAMETERS '''
+CAPACITY = 1 << 12  # positions allocated up front, doubled as needed
+
+''' POSITION COLUMNS '''
+COLUMNS = {
+    'is_long': np.bool_,
+    'leverage': np.float64,
+    'entry': np.int32,  # index of the entry price point
+    'exit': np.int32,  # index of the exit price point, -1 while open
+    'collateral': np.float64,  # OVL spent on the build, fees included
+    'cost': np.float64,  # collateral locked after the build fee
+    'debt': np.float64,
+    'oi': np.float64,
+    'value': np.float64,  # OVL paid out on the unwind, after fees
+}
+OPEN = -1
+
+
+def price_frame(is_long, entry_bid, entry_ask, exit_bid, exit_ask,
+                price_frame_cap=PRICE_FRAME_CAP):
+    '''
+    Vectorized `OverlayV1Market.priceFrame`: longs exit on the bid having
+    entered on the ask, capped, shorts the other way round.
+    '''
+    return np.where(
+        is_long,
+        np.minimum(exit_bid / entry_ask, price_frame_cap),
+        exit_ask / entry_bid
+    )
+
+
+def value(is_long, oi, debt, frame):
+    '''
+    Vectorized `Position._value`, floored to zero.
+
+    Inputs:
+      is_long [np.ndarray]:  Sides of the positions
+      oi      [np.ndarray]:  Open interest of the positions
+      debt    [np.ndarray]:  Debt of the positions
+      frame   [np.ndarray]:  Price frames of the positions
+
+    Output:
+      [np.ndarray]: Values of the positions
+    '''
+    return np.where(
+        is_long,
+        np.maximum(oi * frame - debt, 0.),  # oi * priceFrame - debt
+        np.maximum(oi * 2 - debt - oi * frame, 0.)  # oi * (2 - pf) - debt
+    )
+
+
+class Backtest:
+    '''
+    Replays a reflected feed point by point, one a minute, letting a
+    strategy build and unwind positions at each point's bid and ask.
+
+    Positions are held column by column in arrays, without market impact
+    or funding, so that hundreds of thousands of them over weeks of points
+    stay cheap. Amounts are floats in OVL.
+    '''
+
+    def __init__(self, index, price_frame_cap=PRICE_FRAME_CAP, fee=FEE,
+                 capacity=CAPACITY):
+        '''
+        Inputs:
+          index           [PriceIndex]:  Reflected feed to replay
+          price_frame_cap [float]:       Cap on the price frame of longs
+          fee             [float]:       Fee rate on build and unwind
+                                         notional
+          capacity        [int]:         Positions allocated up front
+        '''
+        self.index = index
+        self.bid = index.series['bid']
+        self.ask = index.series['ask']
+        self.price_frame_cap = price_frame_cap
+        self.fee = fee
+
+        self.columns = {
+            name: np.empty(capacity, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self.size = 0
+        self.now = 0  # index of the price point being replayed
+
+    @classmethod
+    def load(cls, prefix, **kwargs):
+        return cls(PriceIndex.load(prefix), **kwargs)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        '''
+        Column of every position built so far, a view.
+        '''
+        return self.columns[name][:self.size]
+
+    def _reserve(self, n):
+        capacity = len(self.columns['entry'])
+        if self.size + n <= capacity:
+            return
+
+        while capacity < self.size + n:
+            capacity *= 2
+
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+
+    def build(self, collateral, leverage, is_long):
+        '''
+        Builds positions at the current price point, as
+        `OverlayV1OVLCollateral.build` takes the fee out of the collateral.
+
+        Inputs:
+          collateral [float | np.ndarray]:  OVL to spend on each position
+          leverage   [float | np.ndarray]:  Leverage of each position
+          is_long    [bool | np.ndarray]:   Side of each position
+
+        Output:
+          [np.ndarray]: Ids of the positions built
+        '''
+        collateral, leverage, is_long = np.broadcast_arrays(
+            np.asarray(collateral, dtype=np.float64),
+            np.asarray(leverage, dtype=np.float64),
+            np.asarray(is_long, dtype=np.bool_)
+        )
+        collateral = collateral.ravel()
+        n = len(collateral)
+
+        self._reserve(n)
+        ids = np.arange(self.size, self.size + n)
+
+        cost = collateral - collateral * leverage.ravel() * self.fee
+        oi = cost * leverage.ravel()
+
+        rows = slice(self.size, self.size + n)
+        self.columns['is_long'][rows] = is_long.ravel()
+        self.columns['leverage'][rows] = leverage.ravel()
+        self.columns['entry'][rows] = self.now
+        self.columns['exit'][rows] = OPEN
+        self.columns['collateral'][rows] = collateral
+        self.columns['cost'][rows] = cost
+        self.columns['debt'][rows] = oi - cost
+        self.columns['oi'][rows] = oi
+        self.columns['value'][rows] = 0.
+
+        self.size += n
+
+        return ids
+
+    def frames(self, ids, at=None):
+        '''
+        Price frames of positions exiting at price point `at`, the current
+        one by default.
+        '''
+        at = self.now if at is None else at
+        entry = self.columns['entry'][ids]
+        return price_frame(
+            self.columns['is_long'][ids],
+            self.bid[entry],
+            self.ask[entry],
+            self.bid[at],
+            self.ask[at],
+            self.price_frame_cap
+        )
+
+    def values(self, ids, at=None):
+        '''
+        OVL the positions would pay out if unwound at price point `at`,
+        the current one by default, after the unwind fee.
+        '''
+        debt = self.columns['debt'][ids]
+        notional = value(
+            self.columns['is_long'][ids],
+            self.columns['oi'][ids],
+            debt,
+            self.frames(ids, at)
+        ) + debt
+
+        return np.maximum(notional * (1 - self.fee) - debt, 0.)
+
+    def unwind(self, ids):
+        '''
+        Unwinds open positions at the current price point.
+
+        Output:
+          [np.ndarray]: OVL paid out on each
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+
+        if np.any(self.columns['exit'][ids] != OPEN):
+            raise ValueError('Backtest: position already unwound')
+
+        paid = self.values(ids)
+
+        self.columns['exit'][ids] = self.now
+        self.columns['value'][ids] = paid
+
+        return paid
+
+    def open_ids(self):
+        return np.flatnonzero(self['exit'] == OPEN)
+
+    def run(self, strategy, start=0, end=None):
+        '''
+        Replays price points `start` to `end`, calling `strategy(self, i)`
+        at each, then unwinds whatever is left open at the last one.
+
+        The strategy reads prices up to point `i` off `self.index` and
+        calls `build` and `unwind`, with arrays to trade many positions at
+        once.
+
+        Output:
+          [dict]: Position columns with their `pnl`, see `report`
+        '''
+        end = len(self.index) if end is None else end
+
+        for i in range(start, end):
+            self.now = i
+            strategy(self, i)
+
+        left = self.open_ids()
+        if len(left):
+            self.unwind(left)
+
+        return self.report()
+
+    def report(self):
+        '''
+        Position columns, views, with the PnL of each position: OVL paid out
+        less collateral spent, marked at the current point while open.
+        '''
+        report = {name: self[name] for name in COLUMNS}
+
+        value = report['value'].copy()
+        left = self.open_ids()
+        value[left] = self.values(left)
+
+        report['pnl'] = value - report['collateral']
+
+        return report
@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import numpy as np
+from scripts.feeds import load_columns, write_columns, COLUMNS_EXT
+
+
+''' CACHE PARAMETERS '''
+CACHE_DIR = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../feeds/.cache'))
+CACHE_SIZE_LIMIT = 256 * 2 ** 20  # bytes
+
+# column recording the key an entry or output was computed under
+KEY_COLUMN = 'cache.key'
+
+
+def cache_key(digests, params):
+    '''
+    Cache key for outputs derived from content with the given digests
+    under the given parameters.
+
+    Inputs:
+      digests [list]:  Content digests of the inputs
+      params  [dict]:  JSON serializable parameters of the derivation
+
+    Output:
+      [str]: sha256 hex digest
+    '''
+    blob = json.dumps({'digests': digests, 'params': params}, sort_keys=True)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def key_column(key):
+    return np.frombuffer(bytes.fromhex(key), dtype='u1')
+
+
+def column_key(columns):
+    '''
+    Key stored in `columns`, or None if they were not written with one.
+    '''
+    if KEY_COLUMN not in columns:
+        return None
+    return columns[KEY_COLUMN].tobytes().hex()
+
+
+def entry_path(key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, key + COLUMNS_EXT)
+
+
+def lookup(key, cache_dir=CACHE_DIR):
+    '''
+    Memory maps the cache entry for `key`, marking it recently used.
+
+    Output:
+      [dict]: Entry columns, or None on a miss
+    '''
+    path = entry_path(key, cache_dir)
+
+    try:
+        os.utime(path)
+        return load_columns(path)
+    except FileNotFoundError:
+        # missing, or evicted by a concurrent writer
+        return None
+
+
+def store(key, columns, cache_dir=CACHE_DIR, limit=CACHE_SIZE_LIMIT):
+    '''
+    Atomically writes `columns` as the cache entry for `key`, then evicts
+    the least recently used entries beyond `limit` bytes.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+
+    columns = dict(columns)
+    columns[KEY_COLUMN] = key_column(key)
+
+    path = entry_path(key, cache_dir)
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    write_columns(tmp, columns)
+    os.replace(tmp, path)
+
+    evict(cache_dir, limit)
+
+
+def evict(cache_dir=CACHE_DIR, limit=CACHE_SIZE_LIMIT):
+    '''
+    Removes least recently used entries until the cache fits in `limit`
+    bytes. Entries removed or replaced by a concurrent writer meanwhile are
+    skipped.
+
+    Output:
+      [list]: Keys of the evicted entries
+    '''
+    entries = []
+
+    for name in os.listdir(cache_dir):
+        if not name.endswith(COLUMNS_EXT):
+            continue
+        try:
+            stat = os.stat(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    entries.sort()
+    size = sum(entry[1] for entry in entries)
+
+    evicted = []
+
+    for _, entry_size, name in entries:
+        if size <= limit:
+            break
+        size -= entry_size
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            continue
+        evicted.append(name[:-len(COLUMNS_EXT)])
+
+    return evicted
@@ -0,0 +1,445 @@
+import numpy as np
+import typing as tp
+from functools import lru_cache
+from scripts.fixed_point import \
+    ONE, \
+    Revert, \
+    as_array, \
+    div_down, \
+    mul_down, \
+    mul_up, \
+    pow_up, \
+    sub
+
+
+''' COMPTROLLER PARAMETERS '''
+CHORD = 60  # rollers in each `Roller[60]` buffer
+TWO = 2 * ONE
+INVERSE_E = 0x51AF86713316A9A
+IMPACT_WINDOW = 600
+STATIC_CAP = 800000 * ONE
+BRRRRD_EXPECTED = 26320 * ONE
+BRRRRD_WINDOW_MACRO = 2592000
+BRRRRD_WINDOW_MICRO = 86400
+FACTOR_CACHE_SIZE = 1 << 16  # memoized impact factors
+
+
+@lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def impact_factor(power):
+    '''
+    `1 - e^-power` as `OverlayV1Comptroller._intake` rounds it, through
+    `FixedPoint.powUp`.
+    '''
+    return sub(ONE, pow_up(INVERSE_E, power))
+
+
+class Roller(tp.NamedTuple):
+    time: int
+    ying: int
+    yang: int
+
+
+class Rollers:
+    '''
+    `Roller[60]` circular buffer of `OverlayV1Comptroller` as parallel
+    arrays, with the cycloid pointing at the most recent roller. Rollers
+    with `time <= 1` are uninitialized, as the contract reads them.
+
+    Times are int64, `ying` and `yang` are arbitrary precision integers.
+    '''
+
+    def __init__(self, time, chord=CHORD):
+        '''
+        Inputs:
+          time  [int]:  Deployment time, stamped on the first roller
+          chord [int]:  Length of the buffer
+        '''
+        self.chord = chord
+        self.time = np.zeros(chord, dtype=np.int64)
+        self.ying = np.zeros(chord, dtype=object)
+        self.yang = np.zeros(chord, dtype=object)
+        self.time[0] = time
+        self.cycloid = 0
+
+    @classmethod
+    def load(cls, rollers, cycloid):
+        '''
+        Buffer holding `rollers` as read from a deployed comptroller, e.g.
+        `[comptroller.impactRollers(i) for i in range(CHORD)]`.
+
+        Inputs:
+          rollers [list]:  `(time, ying, yang)` of each roller
+          cycloid [int]:   Index of the most recent roller
+        '''
+        self = cls(0, len(rollers))
+        for i, (time, ying, yang) in enumerate(rollers):
+            self[i] = Roller(int(time), int(ying), int(yang))
+        self.cycloid = int(cycloid)
+        return self
+
+    def __len__(self):
+        return self.chord
+
+    def __getitem__(self, index):
+        return Roller(
+            int(self.time[index]),
+            self.ying[index],
+            self.yang[index]
+        )
+
+    def __setitem__(self, index, roller):
+        self.time[index] = roller.time
+        self.ying[index] = roller.ying
+        self.yang[index] = roller.yang
+
+    @property
+    def rollers(self):
+        return [self[i] for i in range(self.chord)]
+
+    def copy(self):
+        other = Rollers.__new__(Rollers)
+        other.chord = self.chord
+        other.time = self.time.copy()
+        other.ying = self.ying.copy()
+        other.yang = self.yang.copy()
+        other.cycloid = self.cycloid
+        return other
+
+    def roll(self, roller, last_moment):
+        '''
+        Writes `roller` over the current roller if it is of the same moment,
+        else to the next one, wrapping around at the end of the buffer.
+
+        Output:
+          [int]: Cycloid of the roller written
+        '''
+        if roller.time != last_moment:
+            self.cycloid = (self.cycloid + 1) % self.chord
+
+        self[self.cycloid] = roller
+
+        return self.cycloid
+
+    def scry(self, now, ago):
+        '''
+        Time of the current roller, the current roller at `now` and the
+        roller in effect `ago` seconds before `now`.
+        '''
+        roller_now = self[self.cycloid]
+        last_moment = roller_now.time
+        target = now - ago
+
+        if roller_now.time <= target:
+            return (
+                last_moment,
+                roller_now._replace(time=now),
+                Roller(0, roller_now.ying, roller_now.yang)
+            )
+
+        before_or_at, _ = self.scry_rollers(now, target)
+
+        return last_moment, roller_now._replace(time=now), before_or_at
+
+    def scry_rollers(self, now, target):
+        before_or_at = self[self.cycloid]
+
+        if before_or_at.time <= target:
+            if before_or_at.time == target:
+                return before_or_at, Roller(0, 0, 0)
+            return before_or_at, before_or_at._replace(time=now)
+
+        cycloid = (self.cycloid + 1) % self.chord
+
+        before_or_at = self[cycloid]
+
+        if before_or_at.time <= 1:
+            before_or_at = self[0]
+
+        if target <= before_or_at.time:
+            return before_or_at, before_or_at
+
+        return self.binary_search(target & 0xffffffff, cycloid & 0xffff)
+
+    def binary_search(self, target, cycloid):
+        '''
+        Rollers on either side of `target`, halving the buffer from the
+        roller after `cycloid` as the contract does.
+        '''
+        times = self.time
+        chord = self.chord
+
+        left = (cycloid + 1) % chord
+        right = left + chord - 1
+
+        while left <= right:
+            i = (left + right) // 2
+
+            before_or_at = times[i % chord]
+
+            if before_or_at <= 1:
+                left = i + 1
+                continue
+
+            target_at_or_after = before_or_at <= target
+
+            if target_at_or_after and target <= times[(i + 1) % chord]:
+                return self[i % chord], self[(i + 1) % chord]
+
+            if not target_at_or_after:
+                right = i - 1
+            else:
+                left = i + 1
+
+        # the contract searches on until it runs out of gas
+        raise Revert("binarySearch: no roller at target")
+
+
+class Comptroller:
+    '''
+    Impact and brrrr accounting of `OverlayV1Comptroller` at explicit
+    times, without a chain. The market model threads its chain time and
+    depth through it, and histories can be replayed in bulk.
+    '''
+
+    def __init__(
+        self,
+        time,
+        lmbda=0,
+        static_cap=STATIC_CAP,
+        brrrrd_expected=BRRRRD_EXPECTED,
+        brrrrd_window_macro=BRRRRD_WINDOW_MACRO,
+        brrrrd_window_micro=BRRRRD_WINDOW_MICRO,
+        impact_window=IMPACT_WINDOW
+    ):
+        '''
+        Inputs:
+          time                [int]:  Deployment time
+          lmbda               [int]:  Market impact constant
+          static_cap          [int]:  Open interest cap
+          brrrrd_expected     [int]:  Expected worst case inflation
+          brrrrd_window_macro [int]:  Window `brrrrd_expected` is over
+          brrrrd_window_micro [int]:  Period brrrr is filed over
+          impact_window       [int]:  Window pressure is summed over
+        '''
+        self.lmbda = lmbda
+        self.static_cap = static_cap
+        self.brrrrd_expected = brrrrd_expected
+        self.brrrrd_window_macro = brrrrd_window_macro
+        self.brrrrd_window_micro = brrrrd_window_micro
+        self.impact_window = impact_window
+
+        self.impact_rollers = Rollers(time)
+        self.brrrrd_rollers = Rollers(time)
+        self.brrrrd_accumulator = [0, 0]
+        self.brrrrd_filing = 0
+
+    def copy(self):
+        other = Comptroller.__new__(Comptroller)
+        other.__dict__.update(self.__dict__)
+        other.impact_rollers = self.impact_rollers.copy()
+        other.brrrrd_rollers = self.brrrrd_rollers.copy()
+        other.brrrrd_accumulator = list(self.brrrrd_accumulator)
+        return other
+
+    ''' brrrr '''
+
+    def brrrr(self, now, brrrr, anti_brrrr):
+        '''
+        Accumulates minted and burnt OVL, filing the accumulator into the
+        brrrrd rollers once `now` passes the filing time.
+        '''
+        filing = self.brrrrd_filing
+
+        if now > filing:
+            rollers = self.brrrrd_rollers
+            roller = rollers[rollers.cycloid]
+            rollers.roll(
+                Roller(
+                    filing,
+                    roller.ying + self.brrrrd_accumulator[0],
+                    roller.yang + self.brrrrd_accumulator[1]
+                ),
+                roller.time
+            )
+            self.brrrrd_accumulator = [brrrr, anti_brrrr]
+            micro = self.brrrrd_window_micro
+            self.brrrrd_filing += micro + (now - filing) // micro * micro
+        else:
+            self.brrrrd_accumulator[0] += brrrr
+            self.brrrrd_accumulator[1] += anti_brrrr
+
+    def get_brrrrd(self, now):
+        '''
+        Output:
+          [int]: OVL minted over the macro window
+          [int]: OVL burnt over the macro window
+        '''
+        _, roller_now, roller_then = self.brrrrd_rollers.scry(
+            now, self.brrrrd_window_macro)
+        return (
+            self.brrrrd_accumulator[0] + roller_now.ying - roller_then.ying,
+            self.brrrrd_accumulator[1] + roller_now.yang - roller_then.yang
+        )
+
+    ''' cap '''
+
+    def _oi_cap(self, dynamic, depth, brrrrd=0):
+        if dynamic:
+            dynamic_cap = mul_down(
+                _checked_sub(TWO, div_down(brrrrd, self.brrrrd_expected)),
+                self.static_cap
+            )
+            return min(self.static_cap, dynamic_cap, depth)
+        return min(self.static_cap, depth)
+
+    def oi_cap(self, now, depth):
+        '''
+        Open interest cap at `now`, static while inflation is under
+        expectations, shrinking to zero as it reaches twice them.
+
+        Inputs:
+          now   [int]:  Time
+          depth [int]:  Market depth in OVL terms
+        '''
+        brrrrd, anti_brrrrd = self.get_brrrrd(now)
+
+        burnt = expected = surpassed = False
+
+        if brrrrd < anti_brrrrd:
+            burnt = True
+        else:
+            brrrrd -= anti_brrrrd
+            expected = brrrrd < self.brrrrd_expected
+            surpassed = brrrrd > self.brrrrd_expected * 2
+
+        if surpassed:
+            return 0
+        if burnt or expected:
+            return self._oi_cap(False, depth)
+        return self._oi_cap(True, depth, brrrrd)
+
+    ''' impact '''
+
+    def pressure(self, now, is_long, oi, cap):
+        _, roller_now, roller_impact = self.impact_rollers.scry(
+            now, self.impact_window)
+        pressure = roller_now.ying - roller_impact.ying if is_long \
+            else roller_now.yang - roller_impact.yang
+        return pressure + div_down(oi, cap)
+
+    def impact(self, now, is_long, oi, cap):
+        '''
+        Market impact of a build of `oi` on one side, without taking it.
+        '''
+        pressure = self.pressure(now, is_long, oi, cap)
+        power = mul_down(self.lmbda, pressure)
+        impact = impact_factor(power) if pressure != 0 else 0
+        return mul_up(oi, impact)
+
+    def intake(self, now, is_long, oi, cap):
+        '''
+        Rolls the pressure of a build of `oi` into the impact rollers and
+        returns its market impact, registered as burnt.
+        '''
+        last_moment, roller_now, roller_impact = self.impact_rollers.scry(
+            now, self.impact_window)
+
+        pressure = div_down(oi, cap)
+
+        if is_long:
+            roller_now = roller_now._replace(ying=roller_now.ying + pressure)
+            power = mul_down(self.lmbda, roller_now.ying - roller_impact.ying)
+        else:
+            roller_now = roller_now._replace(yang=roller_now.yang + pressure)
+            power = mul_down(self.lmbda, roller_now.yang - roller_impact.yang)
+
+        impact = impact_factor(power) if pressure != 0 else 0
+
+        self.impact_rollers.roll(roller_now, last_moment)
+
+        impact = mul_up(oi, impact)
+
+        self.brrrr(now, 0, impact)
+
+        return impact
+
+    ''' replay '''
+
+    def replay_intake(self, times, is_long, oi, depth=None, cap=None):
+        '''
+        Takes in a history of builds in order, as `ComptrollerShim`'s
+        `impactBatch` does over the blocks they were mined in.
+
+        Each build is capped at `cap` when given, else at the open
+        interest cap over `depth`, which defaults to the static cap.
+
+        Inputs:
+          times   [np.ndarray]:  Non-decreasing times of the builds
+          is_long [np.ndarray]:  Sides of the builds
+          oi      [np.ndarray]:  Open interest built
+          depth   [np.ndarray]:  Market depths at the builds
+          cap     [np.ndarray]:  Caps to take the builds in at
+
+        Output:
+          [np.ndarray]: Market impact of each build
+        '''
+        times = np.asarray(times, dtype=np.int64)
+        _require_ascending(times)
+
+        if depth is None:
+            depth = self.static_cap
+        caps = None if cap is None else \
+            np.broadcast_to(as_array(cap), times.shape).tolist()
+
+        is_long = np.broadcast_to(is_long, times.shape).tolist()
+        oi = np.broadcast_to(as_array(oi), times.shape).tolist()
+        depth = np.broadcast_to(as_array(depth), times.shape).tolist()
+
+        impacts = np.empty(len(times), dtype=object)
+
+        for i, now in enumerate(times.tolist()):
+            cap_ = self.oi_cap(now, depth[i]) if caps is None else caps[i]
+            impacts[i] = self.intake(now, is_long[i], oi[i], cap_)
+
+        return impacts
+
+    def replay_brrrr(self, times, brrrr, anti_brrrr):
+        '''
+        Files a history of mints and burns in order, as `ComptrollerShim`'s
+        `brrrrBatch` does over the blocks they were mined in.
+
+        Inputs:
+          times      [np.ndarray]:  Non-decreasing times of the mints
+          brrrr      [np.ndarray]:  OVL minted
+          anti_brrrr [np.ndarray]:  OVL burnt
+
+        Outputs:
+          [np.ndarray]: OVL minted over the macro window after each
+          [np.ndarray]: OVL burnt over the macro window after each
+        '''
+        times = np.asarray(times, dtype=np.int64)
+        _require_ascending(times)
+
+        brrrr = np.broadcast_to(as_array(brrrr), times.shape).tolist()
+        anti_brrrr = np.broadcast_to(
+            as_array(anti_brrrr), times.shape).tolist()
+
+        brrrrd = np.empty(len(times), dtype=object)
+        anti_brrrrd = np.empty(len(times), dtype=object)
+
+        for i, now in enumerate(times.tolist()):
+            self.brrrr(now, brrrr[i], anti_brrrr[i])
+            brrrrd[i], anti_brrrrd[i] = self.get_brrrrd(now)
+
+        return brrrrd, anti_brrrrd
+
+
+def _checked_sub(a, b):
+    if b > a:
+        raise Revert("Integer overflow")
+    return a - b
+
+
+def _require_ascending(times):
+    if np.any(np.diff(times) < 0):
+        raise ValueError('Comptroller: times not ascending')
@@ -8,7 +8,8 @@ from brownie import \
     chain, \
     accounts
 import os
-import json
+from scripts.feeds import load_feed
+from scripts.uploader import load_observations
 
 
 ''' OVERLAY TOKEN PARAMETERS '''
@@ -78,14 +79,11 @@ def deploy_uni_pool(factory, token0, token1, path):
     '''
 
     base = os.path.dirname(os.path.abspath(__file__))
-    raw_uni_framed_path = os.path.join(base, path + '_raw_uni_framed.json')
-    reflected_path = os.path.join(base, path + '_reflected.json')
 
-    with open(os.path.normpath(raw_uni_framed_path)) as f:
-        data = json.load(f)
+    observations, shims, reflected = load_feed(
+        os.path.normpath(os.path.join(base, path)))
 
-    with open(os.path.normpath(reflected_path)) as f:
-        beginning = json.load(f)['timestamp'][0]
+    beginning = reflected['timestamp'][0]
 
     # Creates a pool with the provided token pair
     factory.createPool(token0, token1)
@@ -95,11 +93,7 @@ def deploy_uni_pool(factory, token0, token1, path):
 
     uniswapv3_pool = IUniswapV3OracleMock(factory.allPools(0))
 
-    uniswapv3_pool.loadObservations(
-        data['observations'],
-        data['shims'],
-        {'from': FEED_OWNER}
-    )
+    load_observations(uniswapv3_pool, observations, shims, FEED_OWNER)
 
     chain.mine(timestamp=beginning)
 
@@ -0,0 +1,543 @@
+import os
+import json
+import mmap
+import hashlib
+import numpy as np
+
+
+''' FEED PARAMETERS '''
+ONE_DAY = 86400
+
+# bytes read from a feed file at a time when streaming
+CHUNK_SIZE = 1 << 16
+
+''' COLUMNAR FORMAT '''
+COLUMNS_MAGIC = b'OVLCOLS1'
+COLUMNS_ALIGN = 64
+COLUMNS_EXT = '.cols'
+
+# columns recording the sources a columnar file was derived from: the size
+# and modification time in nanoseconds of each, and a hash of their content
+SOURCE_STAMPS = 'source.stamps'
+SOURCE_DIGEST = 'source.digest'
+
+# 64 bit little endian words holding the exact uint160 seconds per
+# liquidity cumulatives and the uint128 shim liquidities
+X128_WORDS = 3
+LIQUIDITY_WORDS = 2
+
+REFLECTED_SERIES = ['one_hr', 'ten_min', 'spot', 'bids', 'asks']
+
+
+def _chunks(f, reverse):
+    '''
+    Reads an open binary file in `CHUNK_SIZE` blocks, from the end backwards
+    if `reverse`.
+    '''
+    if not reverse:
+
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+
+    while 0 < pos:
+        step = min(CHUNK_SIZE, pos)
+        pos -= step
+        f.seek(pos)
+        yield f.read(step)
+
+
+def records(path, reverse=False):
+    '''
+    Lazily parses the records of a `_raw_uni.json` feed, a JSON array of
+    flat `{"observation": [...], "shim": [...]}` objects, holding at most
+    one chunk and one record in memory.
+
+    Inputs:
+      path    [str]:   Path to the raw feed file
+      reverse [bool]:  Whether to yield records from the end of the file
+
+    Output:
+      [dict]: Parsed records in file order, or reverse file order
+    '''
+    with open(path, 'rb') as f:
+
+        buf = b''
+        pos = 0
+
+        for chunk in _chunks(f, reverse):
+
+            if reverse:
+
+                buf = chunk + buf[:pos]
+                pos = len(buf)
+
+                while True:
+                    end = buf.rfind(b'}', 0, pos)
+                    if end < 0:
+                        pos = 0
+                        break
+                    start = buf.rfind(b'{', 0, end)
+                    if start < 0:
+                        pos = end + 1
+                        break
+                    yield json.loads(buf[start:end + 1])
+                    pos = start
+
+            else:
+
+                buf = buf[pos:] + chunk
+                pos = 0
+
+                while True:
+                    start = buf.find(b'{', pos)
+                    if start < 0:
+                        pos = len(buf)
+                        break
+                    end = buf.find(b'}', start)
+                    if end < 0:
+                        pos = start
+                        break
+                    yield json.loads(buf[start:end + 1])
+                    pos = end + 1
+
+
+def stream_feed(path, ascending=True, frame=ONE_DAY):
+    '''
+    Streams `(observation, shim)` pairs of a `_raw_uni.json` feed in time
+    order, regardless of the order the feed was exported in, keeping only
+    those within `frame` seconds of the earliest observation.
+
+    Memory stays flat in the size of the feed: the first and last records
+    are read to find the file's order and earliest timestamp, then records
+    are parsed lazily from whichever end the requested order starts at.
+
+    Inputs:
+      path      [str]:   Path to the raw feed file
+      ascending [bool]:  Oldest first if true, newest first otherwise
+      frame     [int]:   Seconds after the earliest observation to keep,
+                         or None to stream the whole feed
+
+    Output:
+      [tuple]: `(observation, shim)` lists as found in the feed
+    '''
+    first = next(records(path), None)
+    last = next(records(path, reverse=True), None)
+
+    if first is None:
+        return
+
+    newest_first = last['observation'][0] < first['observation'][0]
+    earliest = min(first['observation'][0], last['observation'][0])
+    cutoff = None if frame is None else earliest + frame
+
+    for record in records(path, reverse=ascending == newest_first):
+
+        ob = record['observation']
+
+        if cutoff is not None and cutoff < ob[0]:
+            if ascending:
+                return
+            continue
+
+        yield ob, record['shim']
+
+
+def _align(n):
+    return -(-n // COLUMNS_ALIGN) * COLUMNS_ALIGN
+
+
+def to_words(values, words):
+    '''
+    Packs unsigned integers of up to `64 * words` bits into a (n, words)
+    little endian uint64 array, losslessly.
+    '''
+    packed = b''.join(int(v).to_bytes(8 * words, 'little') for v in values)
+    return np.frombuffer(packed, dtype='<u8').reshape(-1, words)
+
+
+def from_words(array):
+    '''
+    Unpacks a (n, words) array from `to_words` into python integers.
+    '''
+    array = np.ascontiguousarray(array, dtype='<u8')
+    return [int.from_bytes(row.tobytes(), 'little') for row in array]
+
+
+def write_columns(path, columns):
+    '''
+    Writes named arrays to a single columnar file: a magic number, a JSON
+    header of dtypes, shapes and offsets, then each array's raw bytes
+    aligned to `COLUMNS_ALIGN`.
+
+    Inputs:
+      path    [str]:   Path of the columnar file to write
+      columns [dict]:  Arrays keyed by column name
+    '''
+    arrays = {}
+    header = {}
+    offset = 0
+
+    for name, array in columns.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        header[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+        offset = _align(offset + array.nbytes)
+
+    meta = json.dumps(header).encode()
+    start = _align(len(COLUMNS_MAGIC) + 8 + len(meta))
+
+    with open(path, 'wb') as f:
+        f.write(COLUMNS_MAGIC)
+        f.write(len(meta).to_bytes(8, 'little'))
+        f.write(meta)
+        for name, array in arrays.items():
+            f.seek(start + header[name]['offset'])
+            f.write(array.tobytes())
+        f.truncate(start + offset)
+
+
+def load_columns(path):
+    '''
+    Memory maps a columnar file written by `write_columns`. Arrays are
+    read-only views onto the mapping; nothing is copied or parsed beyond
+    the header.
+
+    Inputs:
+      path [str]:  Path of the columnar file
+
+    Output:
+      [dict]: Read-only arrays keyed by column name
+    '''
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic = len(COLUMNS_MAGIC)
+    if mapped[:magic] != COLUMNS_MAGIC:
+        raise ValueError('{} is not a columnar feed file'.format(path))
+
+    size = int.from_bytes(mapped[magic:magic + 8], 'little')
+    header = json.loads(mapped[magic + 8:magic + 8 + size])
+    start = _align(magic + 8 + size)
+
+    columns = {}
+
+    for name, info in header.items():
+        shape = tuple(info['shape'])
+        columns[name] = np.frombuffer(
+            mapped,
+            dtype=np.dtype(info['dtype']),
+            count=int(np.prod(shape)),
+            offset=start + info['offset']
+        ).reshape(shape)
+
+    return columns
+
+
+def feed_columns(observations, shims):
+    '''
+    Typed columns for observations and shims as loaded into
+    `UniswapV3OracleMock`.
+
+    Inputs:
+      observations [list]:  `[blockTimestamp, tickCumulative,
+                             secondsPerLiquidityCumulativeX128,
+                             initialized]` entries
+      shims        [list]:  `[timestamp, liquidity, tick, cardinality]`
+                            entries
+
+    Output:
+      [dict]: Arrays keyed `observations.*` and `shims.*`
+    '''
+    return {
+        'observations.timestamp': np.array(
+            [ob[0] for ob in observations], dtype='<u4'),
+        'observations.tick_cumulative': np.array(
+            [ob[1] for ob in observations], dtype='<i8'),
+        'observations.liquidity_cumulative': to_words(
+            [ob[2] for ob in observations], X128_WORDS),
+        'observations.initialized': np.array(
+            [ob[3] for ob in observations], dtype='|b1'),
+        'shims.timestamp': np.array(
+            [shim[0] for shim in shims], dtype='<u4'),
+        'shims.liquidity': to_words(
+            [shim[1] for shim in shims], LIQUIDITY_WORDS),
+        'shims.tick': np.array([shim[2] for shim in shims], dtype='<i4'),
+        'shims.cardinality': np.array(
+            [shim[3] for shim in shims], dtype='<u2'),
+    }
+
+
+def reflected_columns(reflected):
+    '''
+    Typed columns for a reflected feed, keyed `reflected.*`.
+    '''
+    columns = {
+        'reflected.timestamp': np.array(reflected['timestamp'], dtype='<i8')
+    }
+    extra = sorted(set(reflected) - set(REFLECTED_SERIES) - {'timestamp'})
+    for series in REFLECTED_SERIES + extra:
+        columns['reflected.' + series] = np.array(
+            reflected[series], dtype='<f8')
+    return columns
+
+
+def observations_from_columns(columns):
+    '''
+    Contract ready observation tuples from `feed_columns` arrays.
+    '''
+    return [list(ob) for ob in zip(
+        columns['observations.timestamp'].tolist(),
+        columns['observations.tick_cumulative'].tolist(),
+        from_words(columns['observations.liquidity_cumulative']),
+        columns['observations.initialized'].tolist()
+    )]
+
+
+def shims_from_columns(columns):
+    '''
+    Contract ready shim tuples from `feed_columns` arrays.
+    '''
+    return [list(shim) for shim in zip(
+        columns['shims.timestamp'].tolist(),
+        from_words(columns['shims.liquidity']),
+        columns['shims.tick'].tolist(),
+        columns['shims.cardinality'].tolist()
+    )]
+
+
+def reflected_from_columns(columns):
+    '''
+    `_reflected.json` shaped dict of lists from `reflected_columns` arrays.
+    '''
+    return {
+        name.split('.', 1)[1]: array.tolist()
+        for name, array in columns.items()
+        if name.startswith('reflected.')
+    }
+
+
+def file_digest(path):
+    '''
+    sha256 hex digest of a file's content, read in blocks.
+    '''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _stamps(sources):
+    stats = [os.stat(source) for source in sources]
+    return np.array(
+        [[stat.st_size, stat.st_mtime_ns] for stat in stats], dtype='<i8')
+
+
+def _digest(sources):
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(bytes.fromhex(file_digest(source)))
+    return np.frombuffer(digest.digest(), dtype='u1')
+
+
+def source_columns(*sources):
+    '''
+    Columns identifying the current content of the `sources` files, for
+    `load_current` to validate whatever was derived from them.
+    '''
+    return {
+        SOURCE_STAMPS: _stamps(sources),
+        SOURCE_DIGEST: _digest(sources)
+    }
+
+
+def _persist(path, columns):
+    '''
+    Atomically writes `columns` to `path`, leaving it as it was if the
+    directory cannot be written to.
+    '''
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        write_columns(tmp, columns)
+        os.replace(tmp, path)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_current(path, *sources):
+    '''
+    Memory maps the columnar file at `path` if it was derived from the
+    `sources` files as they are now. Sizes and modification times are
+    checked first and content hashes only when those differ, so files
+    touched without changing, e.g. by a checkout, still hit, and the file
+    is restamped so the next load skips hashing. With no source left, the
+    columnar file is taken as is.
+
+    Inputs:
+      path    [str]:  Path of the columnar file
+      sources [str]:  Paths of the files it was derived from
+
+    Output:
+      [dict]: Read-only arrays keyed by column name, None if the columnar
+              file is missing or out of date
+    '''
+    if not os.path.exists(path):
+        return None
+
+    columns = load_columns(path)
+
+    present = [os.path.exists(source) for source in sources]
+    if not any(present):
+        return columns
+    if not all(present) or SOURCE_DIGEST not in columns:
+        return None
+
+    stamps = _stamps(sources)
+    if np.array_equal(columns[SOURCE_STAMPS], stamps):
+        return columns
+
+    if not np.array_equal(columns[SOURCE_DIGEST], _digest(sources)):
+        return None
+
+    columns = dict(columns)
+    columns[SOURCE_STAMPS] = stamps
+    _persist(path, columns)
+
+    return columns
+
+
+def framed_columns(observations, shims, reflected):
+    '''
+    Columns of a framed and reflected feed, as stored in `<prefix>.cols`.
+    '''
+    columns = feed_columns(observations, shims)
+    columns.update(reflected_columns(reflected))
+    return columns
+
+
+def framed_from_columns(columns):
+    '''
+    Contract ready observations and shims and the reflected series from
+    `framed_columns` arrays.
+    '''
+    return (
+        observations_from_columns(columns),
+        shims_from_columns(columns),
+        reflected_from_columns(columns)
+    )
+
+
+def write_feed(prefix, observations, shims, reflected, extra=None):
+    '''
+    Writes the columnar equivalent of `<prefix>_raw_uni_framed.json` and
+    `<prefix>_reflected.json` to `<prefix>.cols`, along with any `extra`
+    columns.
+    '''
+    columns = framed_columns(observations, shims, reflected)
+    columns.update(extra or {})
+    write_columns(prefix + COLUMNS_EXT, columns)
+
+
+def load_feed(prefix):
+    '''
+    Loads a framed and reflected feed, memory mapped from `<prefix>.cols`
+    when it was derived from the JSON files as they are now, see
+    `load_current`. Otherwise the JSON files are parsed and `<prefix>.cols`
+    is written for later loads, in this session or the next.
+
+    Inputs:
+      prefix [str]:  Feed path prefix, e.g. `feeds/univ3_dai_weth`
+
+    Outputs:
+      [list]: Framed observations, ready for `loadObservations`
+      [list]: Framed shims, ready for `loadObservations`
+      [dict]: Reflected series, as in `_reflected.json`
+    '''
+    framed_path = prefix + '_raw_uni_framed.json'
+    reflected_path = prefix + '_reflected.json'
+    columns_path = prefix + COLUMNS_EXT
+
+    columns = load_current(columns_path, framed_path, reflected_path)
+    if columns is not None:
+        return framed_from_columns(columns)
+
+    with open(framed_path) as f:
+        framed = json.load(f)
+    with open(reflected_path) as f:
+        reflected = json.load(f)
+
+    observations, shims = framed['observations'], framed['shims']
+
+    columns = framed_columns(observations, shims, reflected)
+    columns.update(source_columns(framed_path, reflected_path))
+    _persist(columns_path, columns)
+
+    return observations, shims, reflected
+
+
+def raw_feed(prefix, frame=ONE_DAY):
+    '''
+    `(observation, shim)` pairs of the raw feed at `<prefix>`, oldest first
+    and within `frame` seconds of the earliest observation. Reads the
+    memory mapped `<prefix>_raw_uni.cols` when it is up to date, otherwise
+    streams `<prefix>_raw_uni.json`.
+    '''
+    raw_path = prefix + '_raw_uni.json'
+    columns_path = prefix + '_raw_uni' + COLUMNS_EXT
+
+    columns = load_current(columns_path, raw_path)
+
+    if columns is None:
+        yield from stream_feed(raw_path, frame=frame)
+        return
+
+    times = columns['observations.timestamp']
+
+    end = len(times) if frame is None or len(times) == 0 \
+        else int(np.searchsorted(times, int(times[0]) + frame, side='right'))
+
+    head = {name: column[:end] for name, column in columns.items()}
+
+    yield from zip(observations_from_columns(head), shims_from_columns(head))
+
+
+def convert_feed(prefix):
+    '''
+    Converts the JSON files of the feed at `<prefix>` to columnar files:
+    the full raw history to `<prefix>_raw_uni.cols`, oldest first, and the
+    framed and reflected feed to `<prefix>.cols` unless it is current.
+    '''
+    raw_path = prefix + '_raw_uni.json'
+
+    if os.path.exists(raw_path):
+        obs, shims = [], []
+        for ob, shim in stream_feed(raw_path, frame=None):
+            obs.append(ob)
+            shims.append(shim)
+        columns = feed_columns(obs, shims)
+        columns.update(source_columns(raw_path))
+        write_columns(prefix + '_raw_uni' + COLUMNS_EXT, columns)
+
+    if os.path.exists(prefix + '_reflected.json'):
+        load_feed(prefix)
+
+
+def main(*prefixes):
+
+    base = os.path.dirname(os.path.abspath(__file__))
+
+    prefixes = prefixes or ('univ3_dai_weth', 'univ3_axs_weth')
+
+    for prefix in prefixes:
+        convert_feed(os.path.normpath(os.path.join(base, '../feeds', prefix)))
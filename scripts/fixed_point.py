@@ -0,0 +1,546 @@
+import numpy as np
+
+
+''' FIXED POINT CONSTANTS '''
+ONE = 10 ** 18
+MAX_POW_RELATIVE_ERROR = 10000  # 10^(-14)
+UINT256_MAX = (1 << 256) - 1
+
+''' LOG EXP MATH CONSTANTS '''
+ONE_18 = 10 ** 18
+ONE_20 = 10 ** 20
+ONE_36 = 10 ** 36
+MAX_NATURAL_EXPONENT = 130 * ONE_18
+MIN_NATURAL_EXPONENT = -41 * ONE_18
+LN_36_LOWER_BOUND = ONE_18 - 10 ** 17
+LN_36_UPPER_BOUND = ONE_18 + 10 ** 17
+MILD_EXPONENT_BOUND = 2 ** 254 // ONE_20
+
+# e^x_n for decreasing powers of two x_n, `LogExpMath.sol` x0 to x11;
+# x0 and x1 in 18 decimals with a0 and a1 integers, the rest in 20
+X0, A0 = 128 * ONE_18, 38877084059945950922200000000000000000000000000000000000  # noqa: E501
+X1, A1 = 64 * ONE_18, 6235149080811616882910000000
+TERMS = [
+    (3200000000000000000000, 7896296018268069516100000000000000),
+    (1600000000000000000000, 888611052050787263676000000),
+    (800000000000000000000, 298095798704172827474000),
+    (400000000000000000000, 5459815003314423907810),
+    (200000000000000000000, 738905609893065022723),
+    (100000000000000000000, 271828182845904523536),
+    (50000000000000000000, 164872127070012814685),
+    (25000000000000000000, 128402541668774148407),
+    (12500000000000000000, 113314845306682631683),
+    (6250000000000000000, 106449445891785942956),
+]
+EXP_TERMS = 8  # x2 to x9 reduce the exponent, x10 and x11 only the log
+
+''' ERROR CODES '''
+# `Errors.sol` codes, reverting as `BAL#<code>`; the overflow codes are
+# left out, as checked arithmetic panics before their checks can run
+SUB_OVERFLOW = 1
+ZERO_DIVISION = 4
+X_OUT_OF_BOUNDS = 6
+Y_OUT_OF_BOUNDS = 7
+PRODUCT_OUT_OF_BOUNDS = 8
+INVALID_EXPONENT = 9
+OUT_OF_BOUNDS = 100
+
+
+class Revert(Exception):
+    '''
+    A reverted contract call, with the revert string as `revert_msg` like
+    brownie's `VirtualMachineError`.
+    '''
+
+    def __init__(self, revert_msg):
+        super().__init__(revert_msg)
+        self.revert_msg = revert_msg
+
+
+def _require(condition, error):
+    '''
+    `Errors._require`: reverts with `BAL#<error>` unless `condition`.
+    '''
+    if not condition:
+        raise Revert('BAL#{:03d}'.format(error))
+
+
+def _checked(condition):
+    '''
+    Solidity's checked arithmetic: reverts on overflow before any
+    `_require` on the result can run.
+    '''
+    if not np.all(condition):
+        raise Revert('Integer overflow')
+
+
+def _nonzero(a):
+    '''
+    Solidity reverts on division by zero, as `_ln` of zero divides by it.
+    '''
+    if not np.all(a != 0):
+        raise Revert('Division or modulo by zero')
+
+
+def _sdiv(a, b):
+    '''
+    Solidity signed integer division, truncating toward zero.
+    '''
+    q = abs(a) // abs(b)
+    return -q if (a < 0) != (b < 0) else q
+
+
+def _smod(a, b):
+    '''
+    Solidity signed integer remainder, with the sign of the dividend.
+    '''
+    return a - _sdiv(a, b) * b
+
+
+''' LOG EXP MATH '''
+
+
+def exp(x):
+    '''
+    `LogExpMath.exp`: e^x for an 18 decimal `x`.
+    '''
+    _require(MIN_NATURAL_EXPONENT <= x <= MAX_NATURAL_EXPONENT,
+             INVALID_EXPONENT)
+
+    if x < 0:
+        return ONE_18 * ONE_18 // exp(-x)
+
+    if x >= X0:
+        x -= X0
+        first_an = A0
+    elif x >= X1:
+        x -= X1
+        first_an = A1
+    else:
+        first_an = 1
+
+    x *= 100
+
+    product = ONE_20
+    for x_n, a_n in TERMS[:EXP_TERMS]:
+        if x >= x_n:
+            x -= x_n
+            product = product * a_n // ONE_20
+
+    series_sum = ONE_20
+    term = x
+    series_sum += term
+    for n in range(2, 13):
+        term = term * x // ONE_20 // n
+        series_sum += term
+
+    return product * series_sum // ONE_20 * first_an // 100
+
+
+def _ln(a):
+    _nonzero(a)
+
+    if a < ONE_18:
+        return -_ln(ONE_18 * ONE_18 // a)
+
+    total = 0
+    if a >= A0 * ONE_18:
+        a //= A0
+        total += X0
+    if a >= A1 * ONE_18:
+        a //= A1
+        total += X1
+
+    total *= 100
+    a *= 100
+
+    for x_n, a_n in TERMS:
+        if a >= a_n:
+            a = a * ONE_20 // a_n
+            total += x_n
+
+    z = (a - ONE_20) * ONE_20 // (a + ONE_20)
+    z_squared = z * z // ONE_20
+
+    num = z
+    series_sum = num
+    for n in range(3, 12, 2):
+        num = num * z_squared // ONE_20
+        series_sum += num // n
+
+    return (total + series_sum * 2) // 100
+
+
+def _ln_36(x):
+    x *= ONE_18
+
+    z = _sdiv((x - ONE_36) * ONE_36, x + ONE_36)
+    z_squared = _sdiv(z * z, ONE_36)
+
+    num = z
+    series_sum = num
+    for n in range(3, 16, 2):
+        num = _sdiv(num * z_squared, ONE_36)
+        series_sum += _sdiv(num, n)
+
+    return series_sum * 2
+
+
+def ln(a):
+    '''
+    `LogExpMath.ln`: natural logarithm of an 18 decimal `a`.
+    '''
+    _require(a > 0, OUT_OF_BOUNDS)
+
+    if LN_36_LOWER_BOUND < a < LN_36_UPPER_BOUND:
+        return _sdiv(_ln_36(a), ONE_18)
+    return _ln(a)
+
+
+def log(arg, base):
+    '''
+    `LogExpMath.log`: logarithm of `arg` in `base`, both 18 decimals.
+    '''
+    log_base = _ln_36(base) if LN_36_LOWER_BOUND < base < LN_36_UPPER_BOUND \
+        else _ln(base) * ONE_18
+    log_arg = _ln_36(arg) if LN_36_LOWER_BOUND < arg < LN_36_UPPER_BOUND \
+        else _ln(arg) * ONE_18
+
+    return _sdiv(log_arg * ONE_18, log_base)
+
+
+def power(x, y):
+    '''
+    `LogExpMath.pow`: x^y for 18 decimal `x` and `y`, as e^(ln(x) * y).
+    '''
+    _require(x < 2 ** 255, X_OUT_OF_BOUNDS)
+    _require(y < MILD_EXPONENT_BOUND, Y_OUT_OF_BOUNDS)
+
+    if LN_36_LOWER_BOUND < x < LN_36_UPPER_BOUND:
+        ln_36_x = _ln_36(x)
+        logx_times_y = _sdiv(ln_36_x, ONE_18) * y \
+            + _sdiv(_smod(ln_36_x, ONE_18) * y, ONE_18)
+    else:
+        logx_times_y = _ln(x) * y
+
+    logx_times_y = _sdiv(logx_times_y, ONE_18)
+
+    _require(
+        MIN_NATURAL_EXPONENT <= logx_times_y <= MAX_NATURAL_EXPONENT,
+        PRODUCT_OUT_OF_BOUNDS
+    )
+
+    return exp(logx_times_y)
+
+
+''' FIXED POINT '''
+
+
+def add(a, b):
+    c = a + b
+    _checked(c <= UINT256_MAX)
+    return c
+
+
+def sub(a, b):
+    _require(b <= a, SUB_OVERFLOW)
+    return a - b
+
+
+def mul_down(a, b):
+    product = a * b
+    _checked(product <= UINT256_MAX)
+    return product // ONE
+
+
+def mul_up(a, b):
+    product = a * b
+    _checked(product <= UINT256_MAX)
+    return 0 if product == 0 else (product - 1) // ONE + 1
+
+
+def div_down(a, b):
+    _require(b != 0, ZERO_DIVISION)
+    if a == 0:
+        return 0
+    _checked(a * ONE <= UINT256_MAX)
+    return a * ONE // b
+
+
+def div_up(a, b):
+    _require(b != 0, ZERO_DIVISION)
+    if a == 0:
+        return 0
+    _checked(a * ONE <= UINT256_MAX)
+    return (a * ONE - 1) // b + 1
+
+
+def pow_down(x, y):
+    '''
+    `FixedPoint.powDown`: x^y rounded down by the maximum relative error
+    of `power`.
+    '''
+    if y == 0 or x == ONE:
+        return ONE
+
+    raw = power(x, y)
+    max_error = add(mul_up(raw, MAX_POW_RELATIVE_ERROR), 1)
+
+    return 0 if raw < max_error else raw - max_error
+
+
+def pow_up(x, y):
+    '''
+    `FixedPoint.powUp`: x^y rounded up by the maximum relative error of
+    `power`.
+    '''
+    if x == ONE or y == 0:
+        return ONE
+
+    raw = power(x, y)
+
+    return add(raw, add(mul_up(raw, MAX_POW_RELATIVE_ERROR), 1))
+
+
+def complement(x):
+    return ONE - x if x < ONE else 0
+
+
+''' VECTORIZED '''
+
+
+def as_array(values):
+    '''
+    Object array of python integers from integers, int64 arrays or lists,
+    so products never wrap.
+    '''
+    array = np.asarray(values)
+
+    if array.dtype.kind in 'iub':
+        return array.astype(object)  # elements become python integers
+
+    if array.dtype != object:
+        array = array.astype(object)
+    elif all(type(v) is int for v in array.flat):
+        return array
+
+    return np.vectorize(int, otypes=[object])(array) if array.size \
+        else array
+
+
+def _constant(value):
+    '''
+    Object scalar, so numpy never casts a wide constant to a C integer.
+    '''
+    return np.array(value, dtype=object)
+
+
+def _require_all(condition, error):
+    _require(bool(np.all(condition)), error)
+
+
+def _sdiv_array(a, b):
+    q = np.abs(a) // np.abs(b)
+    return np.where((a < 0) != (b < 0), -q, q)
+
+
+def _smod_array(a, b):
+    return a - _sdiv_array(a, b) * b
+
+
+def exp_array(x):
+    '''
+    Vectorized `exp`, equal to it element for element.
+    '''
+    x = as_array(x)
+
+    _require_all((MIN_NATURAL_EXPONENT <= x) & (x <= MAX_NATURAL_EXPONENT),
+                 INVALID_EXPONENT)
+
+    negative = x < 0
+    x = np.abs(x)
+
+    first_an = np.where(
+        x >= X0,
+        _constant(A0),
+        np.where(x >= X1, _constant(A1), _constant(1))
+    )
+    x = np.where(x >= X0, x - X0, np.where(x >= X1, x - X1, x))
+
+    x = x * 100
+
+    product = np.full(x.shape, ONE_20, dtype=object)
+    for x_n, a_n in TERMS[:EXP_TERMS]:
+        over = x >= x_n
+        x = np.where(over, x - x_n, x)
+        product = np.where(over, product * a_n // ONE_20, product)
+
+    series_sum = ONE_20 + x
+    term = x
+    for n in range(2, 13):
+        term = term * x // ONE_20 // n
+        series_sum = series_sum + term
+
+    result = product * series_sum // ONE_20 * first_an // 100
+
+    return np.where(negative, ONE_18 * ONE_18 // np.where(
+        negative, result, 1), result)
+
+
+def _ln_array(a):
+    _nonzero(a)
+
+    negative = a < ONE_18
+    a = np.where(negative, ONE_18 * ONE_18 // np.where(negative, a, 1), a)
+
+    total = np.zeros(a.shape, dtype=object)
+
+    over = a >= A0 * ONE_18
+    a = np.where(over, a // A0, a)
+    total = np.where(over, total + X0, total)
+
+    over = a >= A1 * ONE_18
+    a = np.where(over, a // A1, a)
+    total = np.where(over, total + X1, total)
+
+    total = total * 100
+    a = a * 100
+
+    for x_n, a_n in TERMS:
+        over = a >= a_n
+        a = np.where(over, a * ONE_20 // a_n, a)
+        total = np.where(over, total + x_n, total)
+
+    z = (a - ONE_20) * ONE_20 // (a + ONE_20)
+    z_squared = z * z // ONE_20
+
+    num = z
+    series_sum = num
+    for n in range(3, 12, 2):
+        num = num * z_squared // ONE_20
+        series_sum = series_sum + num // n
+
+    result = (total + series_sum * 2) // 100
+
+    return np.where(negative, -result, result)
+
+
+def _ln_36_array(x):
+    x = x * ONE_18
+
+    z = _sdiv_array((x - ONE_36) * ONE_36, x + ONE_36)
+    z_squared = _sdiv_array(z * z, ONE_36)
+
+    num = z
+    series_sum = num
+    for n in range(3, 16, 2):
+        num = _sdiv_array(num * z_squared, ONE_36)
+        series_sum = series_sum + _sdiv_array(num, n)
+
+    return series_sum * 2
+
+
+def ln_array(a):
+    '''
+    Vectorized `ln`, equal to it element for element.
+    '''
+    a = as_array(a)
+
+    _require_all(a > 0, OUT_OF_BOUNDS)
+
+    near_one = (LN_36_LOWER_BOUND < a) & (a < LN_36_UPPER_BOUND)
+
+    return np.where(
+        near_one,
+        _sdiv_array(_ln_36_array(a), ONE_18),
+        _ln_array(np.where(near_one, ONE_18, a))
+    )
+
+
+def power_array(x, y):
+    '''
+    Vectorized `power` over broadcast `x` and `y`, equal to it element for
+    element.
+    '''
+    x, y = np.broadcast_arrays(as_array(x), as_array(y))
+
+    _require_all(x < 2 ** 255, X_OUT_OF_BOUNDS)
+    _require_all(y < MILD_EXPONENT_BOUND, Y_OUT_OF_BOUNDS)
+
+    near_one = (LN_36_LOWER_BOUND < x) & (x < LN_36_UPPER_BOUND)
+
+    ln_36_x = _ln_36_array(np.where(near_one, x, ONE_18))
+    ln_x = _ln_array(np.where(near_one, ONE_18, x))
+
+    logx_times_y = np.where(
+        near_one,
+        _sdiv_array(ln_36_x, ONE_18) * y
+        + _sdiv_array(_smod_array(ln_36_x, ONE_18) * y, ONE_18),
+        ln_x * y
+    )
+
+    logx_times_y = _sdiv_array(logx_times_y, ONE_18)
+
+    _require_all(
+        (MIN_NATURAL_EXPONENT <= logx_times_y)
+        & (logx_times_y <= MAX_NATURAL_EXPONENT),
+        PRODUCT_OUT_OF_BOUNDS
+    )
+
+    return exp_array(logx_times_y)
+
+
+def mul_down_array(a, b):
+    product = as_array(a) * as_array(b)
+    _checked(product <= UINT256_MAX)
+    return product // ONE
+
+
+def mul_up_array(a, b):
+    product = as_array(a) * as_array(b)
+    _checked(product <= UINT256_MAX)
+    return np.where(product == 0, 0, (product - 1) // ONE + 1)
+
+
+def div_down_array(a, b):
+    a, b = as_array(a), as_array(b)
+    _require_all(b != 0, ZERO_DIVISION)
+    _checked(a * ONE <= UINT256_MAX)
+    return a * ONE // b
+
+
+def div_up_array(a, b):
+    a, b = as_array(a), as_array(b)
+    _require_all(b != 0, ZERO_DIVISION)
+    _checked(a * ONE <= UINT256_MAX)
+    return np.where(a == 0, 0, (a * ONE - 1) // b + 1)
+
+
+def pow_up_array(x, y):
+    '''
+    Vectorized `pow_up` over broadcast `x` and `y`.
+    '''
+    x, y = np.broadcast_arrays(as_array(x), as_array(y))
+
+    trivial = (x == ONE) | (y == 0)
+
+    raw = power_array(np.where(trivial, 2 * ONE, x), np.where(trivial, 0, y))
+    raw = raw + mul_up_array(raw, MAX_POW_RELATIVE_ERROR) + 1
+    _checked(raw <= UINT256_MAX)
+
+    return np.where(trivial, ONE, raw)
+
+
+def pow_down_array(x, y):
+    '''
+    Vectorized `pow_down` over broadcast `x` and `y`.
+    '''
+    x, y = np.broadcast_arrays(as_array(x), as_array(y))
+
+    trivial = (x == ONE) | (y == 0)
+
+    raw = power_array(np.where(trivial, 2 * ONE, x), np.where(trivial, 0, y))
+    max_error = mul_up_array(raw, MAX_POW_RELATIVE_ERROR) + 1
+
+    return np.where(
+        trivial, ONE, np.where(raw < max_error, 0, raw - max_error))
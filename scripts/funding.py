@@ -0,0 +1,177 @@
+import numpy as np
+from functools import lru_cache
+from scripts.fixed_point import \
+    ONE, \
+    as_array, \
+    mul_down, \
+    mul_down_array, \
+    mul_up, \
+    pow_up, \
+    pow_up_array, \
+    sub
+
+
+''' FUNDING PARAMETERS '''
+K = 343454218783234  # funding constant of the markets under test
+COMPOUNDING_PERIOD = 600
+FACTOR_CACHE_SIZE = 1 << 16  # memoized funding factors
+
+
+@lru_cache(maxsize=FACTOR_CACHE_SIZE)
+def funding_factor(k, epochs):
+    '''
+    `(1 - 2k)^epochs` as `OverlayV1OI.computeFunding` rounds it, through
+    `FixedPoint.powUp`.
+    '''
+    return pow_up(sub(ONE, mul_up(k, 2 * ONE)), ONE * epochs)
+
+
+def compute_funding(oi_long, oi_short, epochs, k):
+    '''
+    `OverlayV1OI.computeFunding`: pays funding from the heavier side to the
+    lighter one over `epochs` compounding periods.
+
+    Inputs:
+      oi_long  [int]:  Long open interest
+      oi_short [int]:  Short open interest
+      epochs   [int]:  Compounding periods to pay funding for
+      k        [int]:  Funding constant
+
+    Outputs:
+      [int]: Long open interest after funding
+      [int]: Short open interest after funding
+      [int]: Funding paid, negative if longs are paying shorts
+    '''
+    if oi_long == 0 and oi_short == 0:
+        return 0, 0, 0
+
+    if epochs == 0:
+        return oi_long, oi_short, 0
+
+    factor = funding_factor(k, epochs)
+
+    funder, funded = oi_long, oi_short
+    paying_longs = funder <= funded
+    if paying_longs:
+        funder, funded = funded, funder
+
+    if funded == 0:
+        oi_now = mul_down(factor, funder)
+        funding_paid = funder - oi_now
+        funder = oi_now
+    else:
+        imbalance_now = mul_down(factor, funder - funded)
+        total = funder + funded
+        funding_paid = (funder - funded) // 2
+        funder = (total + imbalance_now) // 2
+        funded = (total - imbalance_now) // 2
+
+    return (funded, funder, funding_paid) if paying_longs \
+        else (funder, funded, -funding_paid)
+
+
+def funding_factors(k, epochs):
+    '''
+    Vectorized `funding_factor` over broadcast `k` and `epochs`, raising
+    each distinct pair only once.
+    '''
+    k, epochs = np.broadcast_arrays(as_array(k), as_array(epochs))
+
+    pairs = list(zip(k.ravel().tolist(), epochs.ravel().tolist()))
+    distinct = list(dict.fromkeys(pairs))
+
+    bases = [sub(ONE, mul_up(k_, 2 * ONE)) for k_, _ in distinct]
+    exponents = [ONE * epochs_ for _, epochs_ in distinct]
+    factors = dict(zip(distinct, pow_up_array(bases, exponents).tolist())) \
+        if distinct else {}
+
+    result = np.empty(len(pairs), dtype=object)
+    result[:] = [factors[pair] for pair in pairs]
+
+    return result.reshape(k.shape)
+
+
+def compute_funding_array(oi_long, oi_short, epochs, k=K):
+    '''
+    Vectorized `compute_funding` over broadcast arrays, one element per
+    market or scenario, each with its own funding constant and epochs.
+    Equal to `compute_funding` element for element.
+
+    Inputs:
+      oi_long  [np.ndarray]:  Long open interests
+      oi_short [np.ndarray]:  Short open interests
+      epochs   [np.ndarray]:  Compounding periods to pay funding for
+      k        [np.ndarray]:  Funding constants
+
+    Outputs:
+      [np.ndarray]: Long open interests after funding
+      [np.ndarray]: Short open interests after funding
+      [np.ndarray]: Funding paid, negative where longs are paying shorts
+    '''
+    oi_long, oi_short, epochs, k = np.broadcast_arrays(
+        as_array(oi_long), as_array(oi_short), as_array(epochs), as_array(k))
+
+    factor = funding_factors(k, epochs)
+
+    paying_longs = oi_long <= oi_short
+    funder = np.where(paying_longs, oi_short, oi_long)
+    funded = np.where(paying_longs, oi_long, oi_short)
+
+    lone = funded == 0
+    total = funder + funded
+
+    oi_now = mul_down_array(factor, funder)
+    imbalance_now = mul_down_array(factor, funder - funded)
+
+    funding_paid = np.where(lone, funder - oi_now, (funder - funded) // 2)
+    funder, funded = (
+        np.where(lone, oi_now, (total + imbalance_now) // 2),
+        np.where(lone, funded, (total - imbalance_now) // 2)
+    )
+
+    idle = (epochs == 0) | ((oi_long == 0) & (oi_short == 0))
+
+    return (
+        np.where(idle, oi_long, np.where(paying_longs, funded, funder)),
+        np.where(idle, oi_short, np.where(paying_longs, funder, funded)),
+        np.where(idle, 0, np.where(paying_longs, funding_paid, -funding_paid))
+    )
+
+
+def epochs_array(now, compounded, period=COMPOUNDING_PERIOD):
+    '''
+    Vectorized `OverlayV1OI.epochs`.
+
+    Outputs:
+      [np.ndarray]: Compounding periods elapsed since `compounded`
+      [np.ndarray]: Time the last elapsed period ended
+    '''
+    now, compounded, period = np.broadcast_arrays(
+        np.asarray(now, dtype=np.int64),
+        np.asarray(compounded, dtype=np.int64),
+        np.asarray(period, dtype=np.int64)
+    )
+
+    compoundings = (now - compounded) // period
+
+    return compoundings, compounded + compoundings * period
+
+
+def advance(oi_long, oi_short, compounded, now, k=K,
+            period=COMPOUNDING_PERIOD):
+    '''
+    Pays the funding due at `now` on markets last compounded at
+    `compounded`, as `OverlayV1Market.update` does.
+
+    Outputs:
+      [np.ndarray]: Long open interests after funding
+      [np.ndarray]: Short open interests after funding
+      [np.ndarray]: Funding paid, negative where longs are paying shorts
+      [np.ndarray]: Times the markets are compounded to
+    '''
+    compoundings, compounded = epochs_array(now, compounded, period)
+
+    oi_long, oi_short, funding_paid = compute_funding_array(
+        oi_long, oi_short, compoundings, k)
+
+    return oi_long, oi_short, funding_paid, compounded
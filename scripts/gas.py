@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import typing as tp
+from brownie import chain, web3
+
+
+''' BENCHMARK PARAMETERS '''
+# functions whose gas is recorded, wherever they run in a transaction
+MEASURED = (
+    'build',
+    'unwind',
+    'liquidate',
+    'update',
+    'enterOI',
+    'exitData',
+    'exitOI',
+    'intake',
+    'payFunding',
+    'fetchPricePoint',
+)
+BATCH_GAS_LIMIT = 3000000  # gas limit of each transaction sharing a block
+
+''' REPORT PARAMETERS '''
+BASE = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = os.path.normpath(os.path.join(BASE, '../reports/gas.json'))
+BASELINE_PATH = os.path.normpath(
+    os.path.join(BASE, '../tests/markets/gas_baseline.json'))
+REGRESSION_THRESHOLD = .02  # relative rise in gas over the baseline
+
+
+class Regression(tp.NamedTuple):
+    scenario: str
+    call: str
+    baseline: int
+    gas: int
+
+
+def _name(fn):
+    return fn.split('.')[-1]
+
+
+def call_gas(tx, names=MEASURED):
+    '''
+    Gas of the calls to the functions `names` a transaction made, internal
+    or external, from its brownie trace.
+
+    A call costs the gas left before the caller jumps, or calls, into it
+    less the gas left once it has returned, so it includes everything it
+    calls in turn. Refunds only apply at the end of a transaction and are
+    counted in the gas of the transaction alone, recorded under the name of
+    the function it called.
+
+    Inputs:
+      tx    [TransactionReceipt]:  Confirmed transaction
+      names [tuple]:               Names of the functions to measure
+
+    Output:
+      [dict]: Total gas by function name, summed over repeated calls
+    '''
+    gas = {}
+
+    if _name(tx.fn_name) in names:
+        gas[_name(tx.fn_name)] = tx.gas_used
+
+    trace = tx.trace
+
+    for i in range(1, len(trace)):
+        step = trace[i]
+        depth, jump_depth = step['depth'], step['jumpDepth']
+        last = trace[i - 1]
+
+        entered = depth > last['depth'] or (
+            depth == last['depth'] and jump_depth > last['jumpDepth'])
+        if not entered or _name(step['fn']) not in names:
+            continue
+
+        end = next((
+            j for j in range(i + 1, len(trace))
+            if trace[j]['depth'] < depth or (
+                trace[j]['depth'] == depth
+                and trace[j]['jumpDepth'] < jump_depth)
+        ), None)
+
+        left = trace[-1]['gas'] - trace[-1]['gasCost'] if end is None \
+            else trace[end]['gas']
+
+        name = _name(step['fn'])
+        gas[name] = gas.get(name, 0) + last['gas'] - left
+
+    return gas
+
+
+def in_one_block(*sends):
+    '''
+    Mines transactions into a single block, in order: the dev chain's miner
+    is paused while each of `sends` submits one, then one block is mined.
+
+    Inputs:
+      sends [function]:  Take transaction parameters, to be passed on, and
+                         send one transaction
+
+    Output:
+      [list]: Confirmed transactions, one per send
+    '''
+    params = {'gas_limit': BATCH_GAS_LIMIT, 'required_confs': 0}
+
+    web3.provider.make_request('miner_stop', [])
+    try:
+        txs = [send(params) for send in sends]
+        chain.mine()
+    finally:
+        web3.provider.make_request('miner_start', [])
+
+    for tx in txs:
+        tx.wait(1)
+
+    assert len({tx.block_number for tx in txs}) == 1, \
+        "transactions mined into more than one block"
+
+    return txs
+
+
+def record(report, scenario, tx, names=MEASURED):
+    '''
+    Adds the gas of `tx` to `report` under `scenario`.
+    '''
+    report.setdefault(scenario, {}).update(call_gas(tx, names))
+    return report
+
+
+def write_report(report, path=REPORT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    '''
+    Gas report at `path`, None if there is none.
+    '''
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(report, baseline, threshold=REGRESSION_THRESHOLD):
+    '''
+    Calls of `report` that use more gas than in `baseline` by more than
+    `threshold`, relative. Scenarios or calls missing from the baseline are
+    new and not compared.
+
+    Inputs:
+      report    [dict]:   Gas by call by scenario
+      baseline  [dict]:   Gas by call by scenario to compare against
+      threshold [float]:  Relative rise in gas tolerated
+
+    Output:
+      [list]: Regressions, in scenario and call order
+    '''
+    regressions = []
+
+    for scenario, calls in sorted(report.items()):
+        for call, gas in sorted(calls.items()):
+            before = baseline.get(scenario, {}).get(call)
+            if before is not None and gas > before * (1 + threshold):
+                regressions.append(Regression(scenario, call, before, gas))
+
+    return regressions
+
+
+def format_report(report, baseline=None):
+    '''
+    Table of the gas of every call of every scenario, and its change over
+    `baseline` where it has one.
+    '''
+    baseline = baseline or {}
+    lines = []
+
+    for scenario, calls in sorted(report.items()):
+        lines.append(scenario)
+        for call, gas in sorted(calls.items()):
+            before = baseline.get(scenario, {}).get(call)
+            change = '' if not before \
+                else '{:+.2%}'.format(gas / before - 1)
+            lines.append('  {:<16}{:>10}  {}'.format(call, gas, change))
+
+    return '\n'.join(lines)
+
+
+def main(*args):
+    '''
+    Prints the last gas report against the baseline. `accept` makes the
+    last report the baseline.
+    '''
+    report = load_report(REPORT_PATH)
+    if report is None:
+        sys.exit('no gas report at {}, run tests/markets/test_gas.py'.format(
+            REPORT_PATH))
+
+    if 'accept' in args:
+        write_report(report, BASELINE_PATH)
+        print('baseline updated from {}'.format(REPORT_PATH))
+        return
+
+    baseline = load_report(BASELINE_PATH)
+    print(format_report(report, baseline))
+
+    for regression in compare(report, baseline or {}):
+        print('regression {}: {} -> {}'.format(
+            '.'.join(regression[:2]), regression.baseline, regression.gas))
@@ -0,0 +1,227 @@
+import os
+import csv
+import json
+import numpy as np
+from decimal import Decimal
+from datetime import datetime
+from itertools import islice
+from scripts.cache import CACHE_DIR, KEY_COLUMN, cache_key, lookup, store
+from scripts.feeds import X128_WORDS, file_digest, to_words
+
+
+''' INGESTION PARAMETERS '''
+CSV_CHUNK_ROWS = 1 << 14  # rows parsed per chunk of a csv fixture
+FIXTURES_DIR = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../tests/markets/fixtures'))
+
+# bumped whenever the normalized columns change
+INGEST_PARAMS = {'version': 1}
+
+''' FIXTURE FORMATS '''
+TICK_PAIRS = 'tick_pairs'  # csv of tick cumulatives now and a window ago
+TICK_SERIES = 'tick_series'  # csv of timestamped tickCumulative rows
+MOCK_FEEDS = 'mock_feeds'  # json of observe samples keyed by pool name
+
+TICK_PAIRS_HEADER = ['', 'tick_cumulative_now', 'tick_cumulative_then']
+TICK_SERIES_HEADER = ['', '_time', '_field', '_value']
+
+
+def _int(value):
+    '''
+    Exact integer from a csv field, which may carry a zero fraction.
+    '''
+    number = Decimal(value)
+    if number != number.to_integral_value():
+        raise ValueError('ingest: non integral value {}'.format(value))
+    return int(number)
+
+
+def _timestamp(value):
+    '''
+    Unix timestamp from an ISO 8601 csv field, e.g.
+    `2021-05-04 20:35:34+00:00`.
+    '''
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def csv_chunks(path, rows=CSV_CHUNK_ROWS):
+    '''
+    Parses a csv file lazily, `rows` rows at a time.
+
+    Inputs:
+      path [str]:  Path to the csv file
+      rows [int]:  Rows per chunk
+
+    Outputs:
+      [list]:  Header fields, then lists of `rows` rows of fields each
+    '''
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        yield next(reader)
+        while True:
+            chunk = list(islice(reader, rows))
+            if not chunk:
+                return
+            yield chunk
+
+
+def detect_format(path):
+    '''
+    Fixture format of the file at `path`, from its extension and header.
+    '''
+    if path.endswith('.json'):
+        return MOCK_FEEDS
+
+    with open(path, newline='') as f:
+        header = next(csv.reader(f))
+
+    if header == TICK_PAIRS_HEADER:
+        return TICK_PAIRS
+    if header == TICK_SERIES_HEADER:
+        return TICK_SERIES
+
+    raise ValueError('ingest: unknown fixture format {}'.format(path))
+
+
+def ingest_tick_pairs(path, rows=CSV_CHUNK_ROWS):
+    '''
+    Normalizes a csv of tick cumulatives observed now and a window ago.
+
+    Output:
+      [dict]: `observed.tick_cumulative` (n, 2) int64 column, now then
+              a window ago
+    '''
+    chunks = csv_chunks(path, rows)
+    next(chunks)
+
+    ticks = [
+        np.array([[_int(now), _int(then)] for _, now, then in chunk],
+                 dtype='<i8').reshape(-1, 2)
+        for chunk in chunks
+    ]
+
+    return {
+        'observed.tick_cumulative': np.concatenate(ticks) if ticks
+        else np.zeros((0, 2), dtype='<i8')
+    }
+
+
+def ingest_tick_series(path, field='tickCumulative', rows=CSV_CHUNK_ROWS):
+    '''
+    Normalizes a csv of timestamped tick cumulative rows into observation
+    columns, keeping the rows of `field` in time order.
+
+    Output:
+      [dict]: `observations.timestamp` and `observations.tick_cumulative`
+              columns, as in `feeds.feed_columns`
+    '''
+    chunks = csv_chunks(path, rows)
+    next(chunks)
+
+    timestamps = []
+    ticks = []
+
+    for chunk in chunks:
+        chunk = [row for row in chunk if row[2] == field]
+        timestamps.append(np.array(
+            [_timestamp(row[1]) for row in chunk], dtype='<u4'))
+        ticks.append(np.array([_int(row[3]) for row in chunk], dtype='<i8'))
+
+    timestamps = np.concatenate(timestamps) if timestamps \
+        else np.zeros(0, dtype='<u4')
+    ticks = np.concatenate(ticks) if ticks else np.zeros(0, dtype='<i8')
+    order = np.argsort(timestamps, kind='stable')
+
+    return {
+        'observations.timestamp': timestamps[order],
+        'observations.tick_cumulative': ticks[order]
+    }
+
+
+def ingest_mock_feeds(path):
+    '''
+    Normalizes a json of `observe` samples keyed by pool name.
+
+    Output:
+      [dict]: Pool name to `observed.timestamp`, `observed.tick_cumulative`
+              (n, 2) and `observed.liquidity_cumulative` (n, 2,
+              `X128_WORDS`) columns, now then a window ago
+    '''
+    with open(path) as f:
+        feeds = json.load(f)
+
+    normalized = {}
+
+    for pool, feed in feeds.items():
+        liquidity = [v for pair in feed['liquidity_cumulatives'] for v in pair]
+        normalized[pool] = {
+            'observed.timestamp': np.array(feed['timestamps'], dtype='<u4'),
+            'observed.tick_cumulative': np.array(
+                feed['tick_cumulatives'], dtype='<i8').reshape(-1, 2),
+            'observed.liquidity_cumulative': to_words(
+                liquidity, X128_WORDS).reshape(-1, 2, X128_WORDS)
+        }
+
+    return normalized
+
+
+def ingest(path):
+    '''
+    Normalizes the fixture at `path` into typed columns named as in the
+    `feeds/` pipeline.
+
+    Output:
+      [dict]: Feed name to columns; pool names for `MOCK_FEEDS`, the file
+              name otherwise
+    '''
+    fixture = detect_format(path)
+
+    if fixture == MOCK_FEEDS:
+        return ingest_mock_feeds(path)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    if fixture == TICK_PAIRS:
+        return {name: ingest_tick_pairs(path)}
+
+    return {name: ingest_tick_series(path)}
+
+
+def load_fixture(path, cache_dir=CACHE_DIR):
+    '''
+    Cached `ingest`: normalized columns are stored under the fixture's
+    content hash in `cache_dir` and memory mapped back on later loads.
+    '''
+    key = cache_key([file_digest(path)], INGEST_PARAMS)
+
+    columns = lookup(key, cache_dir)
+
+    if columns is None:
+        feeds = ingest(path)
+        store(key, {
+            '{}/{}'.format(feed, name): column
+            for feed, feed_columns in feeds.items()
+            for name, column in feed_columns.items()
+        }, cache_dir)
+        return feeds
+
+    feeds = {}
+    for name, column in columns.items():
+        if name == KEY_COLUMN:
+            continue
+        feed, name = name.rsplit('/', 1)
+        feeds.setdefault(feed, {})[name] = column
+
+    return feeds
+
+
+def main(*paths):
+
+    paths = paths or [
+        os.path.join(FIXTURES_DIR, name)
+        for name in sorted(os.listdir(FIXTURES_DIR))
+    ]
+
+    for path in paths:
+        for feed, columns in load_fixture(path).items():
+            print(feed, {name: c.shape for name, c in columns.items()})
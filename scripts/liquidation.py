@@ -0,0 +1,228 @@
+import numpy as np
+import typing as tp
+from scripts.fixed_point import \
+    ONE, \
+    as_array, \
+    div_down_array, \
+    div_up_array, \
+    mul_down_array, \
+    mul_up_array
+
+
+''' LIQUIDATION PARAMETERS '''
+TWO = 2 * ONE
+PRICE_FRAME_CAP = 5 * ONE
+MARGIN_MAINTENANCE = 6 * 10 ** 16
+MARGIN_REWARD_RATE = 5 * 10 ** 17
+SCREEN_TOLERANCE = 1e-9  # relative float error the screen allows for
+
+
+class Liquidations(tp.NamedTuple):
+    ids: np.ndarray  # indices of the liquidatable positions
+    values: np.ndarray  # value of each, as `liquidate` reads it
+    rewards: np.ndarray  # reward of the liquidator on each
+    prices: np.ndarray  # liquidation price of each
+
+
+def position_oi(oi_shares, total_oi, total_oi_shares):
+    '''
+    Vectorized `Position._oi`.
+    '''
+    return div_up_array(
+        mul_down_array(oi_shares, total_oi), total_oi_shares)
+
+
+def price_frames(is_long, entry_bid, entry_ask, exit_bid, exit_ask,
+                 price_frame_cap=PRICE_FRAME_CAP):
+    '''
+    Vectorized `OverlayV1Market.priceFrame`: longs exit on the bid having
+    entered on the ask, capped, shorts the other way round.
+    '''
+    is_long = np.asarray(is_long, dtype=np.bool_)
+    return np.where(
+        is_long,
+        np.minimum(div_down_array(exit_bid, entry_ask), price_frame_cap),
+        div_up_array(exit_ask, entry_bid)
+    )
+
+
+def values(is_long, oi, debt, price_frame):
+    '''
+    Vectorized `Position._value`, floored to zero.
+    '''
+    is_long = np.asarray(is_long, dtype=np.bool_)
+    debt = as_array(debt)
+
+    # oi * priceFrame - debt
+    long_value = mul_down_array(oi, price_frame)
+    long_value = long_value - np.minimum(long_value, debt)
+
+    # oi * (2 - priceFrame) - debt
+    short_value = mul_down_array(oi, TWO)
+    short_value = short_value - np.minimum(
+        short_value, debt + mul_down_array(oi, price_frame))
+
+    return np.where(is_long, long_value, short_value)
+
+
+def liquidation_prices(is_long, oi, debt, cost, price_entry,
+                       margin_maintenance=MARGIN_MAINTENANCE):
+    '''
+    Vectorized `Position._liquidationPrice`: the exit bid of longs, or ask
+    of shorts, below or above which the positions are liquidatable.
+
+    Shorts too indebted to have one, on which the library reverts, and
+    positions without open interest get 0.
+    '''
+    is_long = np.asarray(is_long, dtype=np.bool_)
+    oi, debt = as_array(oi), as_array(debt)
+
+    oi_frame = div_down_array(
+        mul_up_array(as_array(cost) + debt, margin_maintenance) + debt,
+        np.where(oi == 0, 1, oi)
+    )
+
+    prices = np.where(
+        is_long,
+        mul_up_array(price_entry, oi_frame),
+        mul_up_array(price_entry, TWO - np.minimum(oi_frame, TWO))
+    )
+
+    return np.where((oi == 0) | (~is_long & (oi_frame > TWO)), 0, prices)
+
+
+def _screen(is_long, oi_shares, debt, cost, entry_bid, entry_ask, exit_bid,
+            exit_ask, total_oi, total_oi_shares, margin_maintenance,
+            price_frame_cap):
+    '''
+    Float estimate of `Position._isLiquidatable`, erring towards
+    liquidatable by `SCREEN_TOLERANCE`.
+    '''
+    def f(values):
+        return np.asarray(values, dtype=np.float64)
+
+    oi = f(oi_shares) * f(total_oi) / f(total_oi_shares)
+    debt = f(debt)
+
+    frame = np.where(
+        is_long,
+        np.minimum(f(exit_bid) / f(entry_ask), price_frame_cap / ONE),
+        f(exit_ask) / f(entry_bid)
+    )
+    value = np.where(
+        is_long,
+        oi * frame - debt,
+        oi * (2 - frame) - debt
+    )
+    threshold = (f(cost) + debt) * (margin_maintenance / ONE)
+
+    return value < threshold + SCREEN_TOLERANCE * (oi * 2 + debt)
+
+
+def scan(
+    is_long,
+    price_point,
+    oi_shares,
+    debt,
+    cost,
+    bids,
+    asks,
+    exit_bid,
+    exit_ask,
+    oi,
+    oi_shares_total,
+    margin_maintenance=MARGIN_MAINTENANCE,
+    margin_reward_rate=MARGIN_REWARD_RATE,
+    price_frame_cap=PRICE_FRAME_CAP
+):
+    '''
+    Liquidatable positions at one price point, as
+    `OverlayV1OVLCollateral.liquidate` would find them one by one.
+
+    A float screen picks out candidates, which are then checked exactly on
+    fixed point arithmetic, so only positions near or past maintenance
+    cost more than a few float operations.
+
+    As in the contract, highly levered positions can be liquidatable while
+    still worth more than their cost, and `liquidate` reverts on those.
+
+    Inputs:
+      is_long         [np.ndarray]:  Sides of the positions
+      price_point     [np.ndarray]:  Entry price point indices
+      oi_shares       [np.ndarray]:  Open interest shares, 0 once exited
+      debt            [np.ndarray]:  Debts
+      cost            [np.ndarray]:  Costs
+      bids            [np.ndarray]:  Bid of each price point
+      asks            [np.ndarray]:  Ask of each price point
+      exit_bid        [int]:         Bid of the current price point
+      exit_ask        [int]:         Ask of the current price point
+      oi              [tuple]:       Long and short open interest
+      oi_shares_total [tuple]:       Long and short open interest shares
+      margin_maintenance [int]:      Maintenance margin of the market
+      margin_reward_rate [int]:      Share of value rewarded to liquidators
+      price_frame_cap    [int]:      Cap on the price frame of longs
+
+    Output:
+      [Liquidations]: Ids, values, rewards and liquidation prices of the
+                      liquidatable positions
+    '''
+    is_long = np.asarray(is_long, dtype=np.bool_)
+    price_point = np.asarray(price_point, dtype=np.int64)
+    oi_shares, debt, cost = as_array(oi_shares), as_array(debt), \
+        as_array(cost)
+    bids, asks = as_array(bids), as_array(asks)
+
+    ids = np.flatnonzero(as_array(oi_shares) > 0)
+    if len(ids) == 0:
+        return _empty()
+
+    sides = np.where(is_long[ids], 0, 1)  # long totals first, then short
+    total_oi = as_array(oi)[sides]
+    total_oi_shares = as_array(oi_shares_total)[sides]
+
+    entry_bid = bids[price_point[ids]]
+    entry_ask = asks[price_point[ids]]
+
+    candidates = _screen(
+        is_long[ids], oi_shares[ids], debt[ids], cost[ids], entry_bid,
+        entry_ask, exit_bid, exit_ask, total_oi, total_oi_shares,
+        margin_maintenance, price_frame_cap)
+
+    ids = ids[candidates]
+    if len(ids) == 0:
+        return _empty()
+
+    side = is_long[ids]
+    total_oi, total_oi_shares = \
+        total_oi[candidates], total_oi_shares[candidates]
+    entry_bid, entry_ask = entry_bid[candidates], entry_ask[candidates]
+    pos_debt, pos_cost = debt[ids], cost[ids]
+
+    pos_oi = position_oi(oi_shares[ids], total_oi, total_oi_shares)
+    frame = price_frames(
+        side, entry_bid, entry_ask, exit_bid, exit_ask, price_frame_cap)
+    value = values(side, pos_oi, pos_debt, frame)
+
+    # Position._isLiquidatable
+    liquidatable = value < mul_up_array(
+        pos_cost + pos_debt, margin_maintenance)
+
+    ids, side, value = ids[liquidatable], side[liquidatable], \
+        value[liquidatable]
+
+    prices = liquidation_prices(
+        side,
+        pos_oi[liquidatable],
+        pos_debt[liquidatable],
+        pos_cost[liquidatable],
+        np.where(side, entry_ask[liquidatable], entry_bid[liquidatable]),
+        margin_maintenance
+    )
+
+    return Liquidations(
+        ids, value, mul_up_array(value, margin_reward_rate), prices)
+
+
+def _empty():
+    empty = np.empty(0, dtype=object)
+    return Liquidations(np.empty(0, dtype=np.int64), empty, empty, empty)
@@ -0,0 +1,258 @@
+import os
+import csv
+import time
+import numpy as np
+import multiprocessing
+from scripts.sweep import DEFAULTS, FEEDS, SEED, feed_info, trade
+
+
+''' PATH PARAMETERS '''
+TICK_BASE = 1.0001  # price of a tick, as in `TickMath`
+MIN_TICK = -887272
+MAX_TICK = 887272
+SERIES = 'spot'  # reflected series calibrated from
+STEP = 60  # seconds each path tick holds for
+STEPS = 1440  # a day of steps
+PATHS = 1000
+LOOKBACK = 3600  # seconds of path before a market reads it, the macro window
+MAX_OBSERVATIONS = 65535  # observations a `UniswapV3OracleMock` can hold
+
+''' RESULT TABLE '''
+COLUMNS = [
+    'path', 'builds', 'rejected', 'unwinds', 'liquidations', 'inflation',
+    'brrrrd_max', 'utilization_mean', 'utilization_max', 'seconds'
+]
+
+
+def calibrate(reflected, shims, series=SERIES):
+    '''
+    Drift and volatility of the tick of a reflected feed, as arithmetic
+    Brownian motion of the tick, i.e. geometric of the price.
+
+    Inputs:
+      reflected [dict]:  Reflected series, as in `_reflected.json`
+      shims     [list]:  Shims of the framed feed, for its liquidity
+      series    [str]:   Reflected price series to calibrate from
+
+    Output:
+      [dict]: `tick` the first reflected tick, `drift` in ticks per second,
+              `volatility` in ticks per square root second and the median
+              `liquidity` of the feed
+    '''
+    times = np.asarray(reflected['timestamp'], dtype=np.float64)
+    ticks = np.log(np.asarray(reflected[series], dtype=np.float64)) \
+        / np.log(TICK_BASE)
+
+    dt = np.diff(times)
+    dx = np.diff(ticks)
+
+    drift = dx.sum() / dt.sum()
+    volatility = np.sqrt(np.mean((dx - drift * dt) ** 2 / dt))
+
+    return {
+        'tick': int(np.rint(ticks[0])),
+        'drift': float(drift),
+        'volatility': float(volatility),
+        'liquidity': int(np.median([int(s[1]) for s in shims]))
+    }
+
+
+def calibrate_feed(name, series=SERIES):
+    '''
+    Calibrations of the market and depth feeds of one of `FEEDS`.
+    '''
+    market_path, depth_path = FEEDS[name]
+    market_obs, market_shims, market_reflected = feed_info(market_path)
+    depth_obs, depth_shims, depth_reflected = feed_info(depth_path)
+
+    return (
+        calibrate(market_reflected, market_shims, series),
+        calibrate(depth_reflected, depth_shims, series)
+    )
+
+
+def tick_paths(n, steps, tick, drift, volatility, step=STEP, seed=SEED):
+    '''
+    Monte Carlo tick paths starting at `tick`, each tick holding for
+    `step` seconds.
+
+    Output:
+      [np.ndarray]: int64 ticks, `(n, steps)`
+    '''
+    rng = np.random.default_rng(seed)
+
+    moves = drift * step \
+        + volatility * np.sqrt(step) * rng.standard_normal((n, steps - 1))
+
+    paths = np.empty((n, steps))
+    paths[:, 0] = tick
+    paths[:, 1:] = tick + np.cumsum(moves, axis=1)
+
+    return np.clip(np.rint(paths), MIN_TICK, MAX_TICK).astype(np.int64)
+
+
+def cumulatives(ticks, step=STEP):
+    '''
+    Tick cumulatives at the start and end of every step of `ticks`, from
+    zero.
+
+    Output:
+      [np.ndarray]: int64 tick cumulatives, `(n, steps + 1)`
+    '''
+    ticks = np.atleast_2d(ticks)
+
+    result = np.zeros((ticks.shape[0], ticks.shape[1] + 1), dtype=np.int64)
+    np.cumsum(ticks * step, axis=1, out=result[:, 1:])
+
+    return result
+
+
+def path_feed(ticks, liquidity, start, step=STEP):
+    '''
+    Observations and shims of a single tick path, ready for
+    `UniswapV3OracleMock.loadObservations` and the offline feeds.
+
+    Each observation is written as its step begins, with the shim holding
+    the tick and liquidity of that step, so the mock extrapolates and
+    interpolates the same cumulatives.
+
+    Inputs:
+      ticks     [np.ndarray]:  Ticks of each step
+      liquidity [int]:         In range liquidity throughout
+      start     [int]:         Timestamp of the first observation
+      step      [int]:         Seconds each tick holds for
+
+    Outputs:
+      [list]: `[blockTimestamp, tickCumulative,
+              secondsPerLiquidityCumulativeX128, initialized]` observations
+      [list]: `[timestamp, liquidity, tick, cardinality]` shims
+    '''
+    ticks = np.asarray(ticks, dtype=np.int64)
+
+    if len(ticks) + 1 > MAX_OBSERVATIONS:
+        raise ValueError('path_feed: path exceeds mock cardinality')
+
+    times = (start + step * np.arange(len(ticks) + 1)).tolist()
+    tick_cumulatives = cumulatives(ticks, step)[0].tolist()
+    seconds_per_liquidity = (step << 128) // liquidity
+    ticks = ticks.tolist() + ticks[-1:].tolist()
+
+    observations = [
+        [times[i], tick_cumulatives[i], i * seconds_per_liquidity, True]
+        for i in range(len(times))
+    ]
+    shims = [
+        [times[i], liquidity, ticks[i], i + 1]
+        for i in range(len(times))
+    ]
+
+    return observations, shims
+
+
+def stress_worker(job):
+    i, params, market, depth, start, step, seed = job
+    end = start + step * (len(market[0]) - 1)
+
+    row = trade(
+        params,
+        path_feed(market[0], market[1], start, step),
+        path_feed(depth[0], depth[1], start, step),
+        start + LOOKBACK,
+        end,
+        seed,
+        step
+    )
+    row['path'] = i
+
+    return row
+
+
+def stress(
+    name='dai_weth',
+    n=PATHS,
+    steps=STEPS,
+    params=DEFAULTS,
+    workers=None,
+    seed=SEED,
+    step=STEP,
+    start=None
+):
+    '''
+    Trades a market over `n` Monte Carlo paths of its market and depth
+    feeds, calibrated from one of `FEEDS`, over a process pool. All paths
+    see the same order flow.
+
+    Inputs:
+      name    [str]:   One of `FEEDS` to calibrate from
+      n       [int]:   Number of paths
+      steps   [int]:   Steps of each path, the first `LOOKBACK` seconds
+                       only observed
+      params  [dict]:  Market parameters, keyed as in `sweep.DEFAULTS`
+      workers [int]:   Pool size, defaults to the CPU count
+      seed    [int]:   Seed of the paths and the order flow
+      step    [int]:   Seconds each path tick holds for
+      start   [int]:   Timestamp of the first observation, defaults to
+                       that of the feed calibrated from
+
+    Output:
+      [list]: Result rows in path order, keyed as in `COLUMNS`
+    '''
+    market, depth = calibrate_feed(name)
+
+    if start is None:
+        start = feed_info(FEEDS[name][0])[0][0][0]
+
+    market_ticks = tick_paths(n, steps, market['tick'], market['drift'],
+                              market['volatility'], step, seed)
+    depth_ticks = tick_paths(n, steps, depth['tick'], depth['drift'],
+                             depth['volatility'], step, seed + 1)
+
+    jobs = [
+        (
+            i,
+            params,
+            (market_ticks[i], market['liquidity']),
+            (depth_ticks[i], depth['liquidity']),
+            start,
+            step,
+            seed
+        )
+        for i in range(n)
+    ]
+    workers = min(workers or os.cpu_count(), len(jobs)) or 1
+
+    context = multiprocessing.get_context('spawn')
+
+    rows = []
+    with context.Pool(workers) as pool:
+        for i, row in enumerate(pool.imap_unordered(stress_worker, jobs)):
+            rows.append(row)
+            print("[{}/{}] path {} brrrrd {:.2f} {:.2f}s".format(
+                i + 1, len(jobs), row['path'], row['brrrrd_max'],
+                row['seconds']))
+
+    rows.sort(key=lambda row: row['path'])
+
+    return rows
+
+
+def main(name='dai_weth', n=PATHS, steps=STEPS, out='paths.csv', seed=SEED):
+    '''
+    Measures worst case brrrrd over Monte Carlo paths of a feed, e.g.
+
+        brownie run paths main dai_weth 1000 1440 paths.csv
+    '''
+    began = time.time()
+
+    rows = stress(name, int(n), int(steps), seed=int(seed))
+
+    with open(out, 'w', newline='') as f:
+        writer = csv.DictWriter(f, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    brrrrd = np.array([row['brrrrd_max'] for row in rows])
+
+    print("brrrrd over {} paths: max {:.2f} p99 {:.2f} mean {:.2f}".format(
+        len(rows), brrrrd.max(), np.percentile(brrrrd, 99), brrrrd.mean()))
+    print("stressed in {:.2f}s".format(time.time() - began))
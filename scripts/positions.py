@@ -0,0 +1,395 @@
+import numpy as np
+import typing as tp
+from scripts.fixed_point import Revert, as_array
+
+
+''' STORE PARAMETERS '''
+CAPACITY = 1 << 12  # rows allocated up front, doubled as needed
+NO_MARKET = -1  # market of the empty position 0 of `OverlayV1OVLCollateral`
+
+''' POSITION COLUMNS '''
+# `Position.Info` of `OverlayV1OVLCollateral`, markets as registry indices
+COLUMNS = {
+    'market': np.int32,
+    'is_long': np.bool_,
+    'leverage': np.int64,
+    'price_point': np.int64,  # index of the entry price point
+    'oi_shares': object,  # uint256 columns hold python integers
+    'debt': object,
+    'cost': object,
+}
+AMOUNTS = ('oi_shares', 'debt', 'cost')
+
+
+class Info(tp.NamedTuple):
+    market: tp.Any
+    is_long: bool
+    leverage: int
+    price_point: int
+    oi_shares: int
+    debt: int
+    cost: int
+
+
+def _grow(columns, size, n):
+    '''
+    Columns doubled in capacity until `size + n` rows fit, the first `size`
+    rows kept.
+    '''
+    capacity = len(next(iter(columns.values())))
+    if size + n <= capacity:
+        return columns
+
+    while capacity < size + n:
+        capacity *= 2
+
+    grown = {}
+    for name, column in columns.items():
+        grown[name] = np.zeros(capacity, dtype=column.dtype)
+        grown[name][:size] = column[:size]
+
+    return grown
+
+
+class Positions:
+    '''
+    `Position.Info[]` of `OverlayV1OVLCollateral` as a struct of arrays,
+    one column per field, so millions of positions stay cheap to hold, scan
+    and copy. Markets are stored as indices into `markets`.
+
+    Appends are amortized O(1). `add` and `sub` update many positions at
+    once, and `snapshot` and `restore` branch a simulation off a copy.
+    '''
+
+    def __init__(self, capacity=CAPACITY):
+        self.columns = {
+            name: np.zeros(capacity, dtype=dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        self.size = 0
+        self.markets = []
+        self.market_ids = {}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        '''
+        Column of every position appended so far, a view.
+        '''
+        return self.columns[name][:self.size]
+
+    def market_id(self, market):
+        '''
+        Index of `market` in the registry, added on first sight. `None` is
+        `NO_MARKET`.
+        '''
+        if market is None:
+            return NO_MARKET
+
+        if market not in self.market_ids:
+            self.market_ids[market] = len(self.markets)
+            self.markets.append(market)
+
+        return self.market_ids[market]
+
+    def info(self, position_id):
+        row = {name: self.columns[name][position_id] for name in COLUMNS}
+        market = int(row['market'])
+
+        return Info(
+            self.markets[market] if market != NO_MARKET else None,
+            bool(row['is_long']),
+            int(row['leverage']),
+            int(row['price_point']),
+            row['oi_shares'],
+            row['debt'],
+            row['cost']
+        )
+
+    def append(self, market, is_long, leverage, price_point, oi_shares=0,
+               debt=0, cost=0):
+        '''
+        Appends a position, returning its id.
+        '''
+        self.columns = _grow(self.columns, self.size, 1)
+
+        position_id = self.size
+        row = Info(self.market_id(market), is_long, leverage, price_point,
+                   oi_shares, debt, cost)
+        for name, value in zip(COLUMNS, row):
+            self.columns[name][position_id] = value
+
+        self.size += 1
+
+        return position_id
+
+    def extend(self, market, is_long, leverage, price_point, oi_shares=0,
+               debt=0, cost=0):
+        '''
+        Appends positions on one market from arrays of their fields,
+        returning their ids.
+        '''
+        is_long, leverage, price_point = np.broadcast_arrays(
+            np.asarray(is_long, dtype=np.bool_),
+            np.asarray(leverage, dtype=np.int64),
+            np.asarray(price_point, dtype=np.int64)
+        )
+        n = is_long.size
+
+        self.columns = _grow(self.columns, self.size, n)
+        rows = slice(self.size, self.size + n)
+
+        self.columns['market'][rows] = self.market_id(market)
+        self.columns['is_long'][rows] = is_long.ravel()
+        self.columns['leverage'][rows] = leverage.ravel()
+        self.columns['price_point'][rows] = price_point.ravel()
+        for name, values in zip(AMOUNTS, (oi_shares, debt, cost)):
+            self.columns[name][rows] = as_array(values)
+
+        ids = np.arange(self.size, self.size + n)
+        self.size += n
+
+        return ids
+
+    def of(self, market):
+        '''
+        Ids of the positions on `market`.
+        '''
+        return np.flatnonzero(self['market'] == self.market_ids.get(
+            market, NO_MARKET - 1))
+
+    def add(self, ids, oi_shares=0, debt=0, cost=0):
+        '''
+        Adds to the amounts of positions, as builds do. Repeated ids
+        accumulate.
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        for name, values in zip(AMOUNTS, (oi_shares, debt, cost)):
+            np.add.at(self.columns[name], ids,
+                      np.broadcast_to(as_array(values), ids.shape))
+
+    def sub(self, ids, oi_shares=0, debt=0, cost=0):
+        '''
+        Takes from the amounts of positions, as unwinds and liquidations do,
+        reverting with nothing taken if any would underflow.
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        deltas = [
+            np.broadcast_to(as_array(values), ids.shape)
+            for values in (oi_shares, debt, cost)
+        ]
+
+        for name, delta in zip(AMOUNTS, deltas):
+            np.subtract.at(self.columns[name], ids, delta)
+
+        if any(np.any(self.columns[name][ids] < 0) for name in AMOUNTS):
+            for name, delta in zip(AMOUNTS, deltas):
+                np.add.at(self.columns[name], ids, delta)
+            raise Revert("Integer overflow")
+
+    def snapshot(self):
+        '''
+        Copy of the store to `restore` later, e.g. before trying a branch
+        of a simulation.
+        '''
+        return (
+            {name: self[name].copy() for name in COLUMNS},
+            list(self.markets)
+        )
+
+    def restore(self, snapshot):
+        '''
+        Rolls the store back to `snapshot`, which stays valid to restore
+        again.
+        '''
+        columns, markets = snapshot
+        size = len(columns['market'])
+
+        self.columns = _grow(
+            {name: np.zeros(CAPACITY, dtype=d) for name, d in COLUMNS.items()},
+            0, size)
+        for name, column in columns.items():
+            self.columns[name][:size] = column
+        self.size = size
+
+        self.markets = list(markets)
+        self.market_ids = {market: i for i, market in enumerate(markets)}
+
+
+class Shares:
+    '''
+    Sparse ERC1155 ledger of position shares of `OverlayV1OVLCollateral`:
+    one row per account and position id ever minted to, in arrays, with a
+    dict from `(account, position_id)` to its row and the total supply of
+    each position id. Accounts are any hashable.
+    '''
+
+    def __init__(self, capacity=CAPACITY):
+        self.columns = {
+            'account': np.zeros(capacity, dtype=np.int64),
+            'position': np.zeros(capacity, dtype=np.int64),
+            'balance': np.zeros(capacity, dtype=object),
+        }
+        self.size = 0
+        self.rows = {}
+        self.accounts = []
+        self.account_ids = {}
+        self.supply = np.zeros(capacity, dtype=object)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self.columns[name][:self.size]
+
+    def _row(self, account, position_id):
+        key = (account, position_id)
+        row = self.rows.get(key)
+        if row is not None:
+            return row
+
+        if account not in self.account_ids:
+            self.account_ids[account] = len(self.accounts)
+            self.accounts.append(account)
+
+        self.columns = _grow(self.columns, self.size, 1)
+
+        row = self.size
+        self.columns['account'][row] = self.account_ids[account]
+        self.columns['position'][row] = position_id
+        self.rows[key] = row
+        self.size += 1
+
+        return row
+
+    def _supply(self, position_ids):
+        '''
+        Grows the total supply column to cover `position_ids`.
+        '''
+        needed = int(np.max(position_ids, initial=-1)) + 1
+        if needed > len(self.supply):
+            grown = np.zeros(max(needed, 2 * len(self.supply)), dtype=object)
+            grown[:len(self.supply)] = self.supply
+            self.supply = grown
+
+    def balance_of(self, account, position_id):
+        row = self.rows.get((account, position_id))
+        return 0 if row is None else self.columns['balance'][row]
+
+    def total_supply(self, position_id):
+        return self.supply[position_id] if position_id < len(self.supply) \
+            else 0
+
+    def balances_of(self, account):
+        '''
+        Position ids `account` holds shares of, with its balances.
+        '''
+        rows = np.flatnonzero(
+            (self['account'] == self.account_ids.get(account, -1))
+            & (self['balance'] > 0)
+        )
+        return self['position'][rows], self['balance'][rows]
+
+    def mint(self, accounts, position_ids, shares):
+        '''
+        Mints `shares` of `position_ids` to `accounts`, any of them arrays,
+        accounts as lists.
+        '''
+        accounts, position_ids, shares = self._broadcast(
+            accounts, position_ids, shares)
+
+        rows = [self._row(a, int(i)) for a, i in zip(accounts, position_ids)]
+        self._supply(position_ids)
+
+        np.add.at(self.columns['balance'], rows, shares)
+        np.add.at(self.supply, position_ids, shares)
+
+    def burn(self, accounts, position_ids, shares):
+        '''
+        Burns `shares` of `position_ids` from `accounts`, reverting with
+        nothing burnt if any balance falls short.
+        '''
+        accounts, position_ids, shares = self._broadcast(
+            accounts, position_ids, shares)
+
+        rows = [self.rows.get((a, int(i))) for a, i in
+                zip(accounts, position_ids)]
+        if None in rows:
+            raise Revert("ERC1155: burn amount exceeds balance")
+
+        balance = self.columns['balance']
+        np.subtract.at(balance, rows, shares)
+        if np.any(balance[rows] < 0):
+            np.add.at(balance, rows, shares)
+            raise Revert("ERC1155: burn amount exceeds balance")
+
+        np.subtract.at(self.supply, position_ids, shares)
+
+    def transfer(self, sender, recipient, position_ids, shares):
+        '''
+        Moves `shares` of `position_ids` from `sender` to `recipient`, as
+        `safeTransferFrom` does, reverting with nothing moved if the sender
+        falls short.
+        '''
+        _, position_ids, shares = self._broadcast(
+            sender, position_ids, shares)
+
+        rows = [self._row(sender, int(i)) for i in position_ids]
+        to_rows = [self._row(recipient, int(i)) for i in position_ids]
+
+        balance = self.columns['balance']
+        np.subtract.at(balance, rows, shares)
+        if np.any(balance[rows] < 0):
+            np.add.at(balance, rows, shares)
+            raise Revert("ERC1155: insufficient balance for transfer")
+
+        np.add.at(balance, to_rows, shares)
+
+    @staticmethod
+    def _broadcast(accounts, position_ids, shares):
+        position_ids = np.atleast_1d(np.asarray(position_ids, dtype=np.int64))
+        if isinstance(accounts, (list, np.ndarray)):  # tuples are accounts
+            accounts = list(accounts)
+        else:
+            accounts = [accounts] * len(position_ids)
+
+        n = max(len(accounts), len(position_ids))
+        if len(accounts) == 1:
+            accounts = accounts * n
+        position_ids = np.broadcast_to(position_ids, (n,))
+        shares = np.broadcast_to(as_array(shares), (n,))
+
+        return accounts, position_ids, shares
+
+    def snapshot(self):
+        '''
+        Copy of the ledger to `restore` later.
+        '''
+        return (
+            {name: self[name].copy() for name in self.columns},
+            dict(self.rows),
+            list(self.accounts),
+            self.supply.copy()
+        )
+
+    def restore(self, snapshot):
+        '''
+        Rolls the ledger back to `snapshot`, which stays valid to restore
+        again.
+        '''
+        columns, rows, accounts, supply = snapshot
+        size = len(columns['account'])
+
+        self.columns = _grow(
+            {name: np.zeros(CAPACITY, dtype=c.dtype)
+             for name, c in columns.items()},
+            0, size)
+        for name, column in columns.items():
+            self.columns[name][:size] = column
+        self.size = size
+
+        self.rows = dict(rows)
+        self.accounts = list(accounts)
+        self.account_ids = {a: i for i, a in enumerate(accounts)}
+        self.supply = supply.copy()
@@ -0,0 +1,145 @@
+import numpy as np
+from scripts.feeds import \
+    COLUMNS_EXT, \
+    load_current, \
+    load_feed
+
+
+''' PRICE SERIES '''
+# query names of the reflected series, as read by the market contracts
+SERIES = {
+    'micro': 'ten_min',
+    'macro': 'one_hr',
+    'spot': 'spot',
+    'bid': 'bids',
+    'ask': 'asks'
+}
+
+
+class PriceIndex:
+    '''
+    In memory index over a reflected feed answering which prices were in
+    effect at a time: those of the latest reflected point at or before it.
+
+    Lookups on a regular reflection grid are constant time, otherwise
+    logarithmic. Bulk lookups and range queries return numpy arrays, views
+    into the index where possible.
+    '''
+
+    def __init__(self, reflected):
+        '''
+        Inputs:
+          reflected [dict]:  Reflected series, as in `_reflected.json`,
+                             as lists or arrays
+        '''
+        self.timestamp = np.asarray(reflected['timestamp'], dtype=np.int64)
+        self.series = {
+            name: np.asarray(reflected[key], dtype=np.float64)
+            for name, key in SERIES.items()
+        }
+
+        if len(self.timestamp) == 0:
+            raise ValueError('PriceIndex: empty reflection')
+
+        steps = np.diff(self.timestamp)
+        if np.any(steps <= 0):
+            raise ValueError('PriceIndex: timestamps not ascending')
+
+        # step of a regular grid, None if irregular
+        self.step = int(steps[0]) \
+            if len(steps) > 0 and np.all(steps == steps[0]) else None
+
+        self.start = int(self.timestamp[0])
+        self.end = int(self.timestamp[-1]) + (self.step or 1)
+
+    @classmethod
+    def load(cls, prefix):
+        '''
+        Index over the reflected feed at `prefix`, memory mapped from
+        `<prefix>.cols` when it is up to date.
+        '''
+        columns = load_current(
+            prefix + COLUMNS_EXT,
+            prefix + '_raw_uni_framed.json',
+            prefix + '_reflected.json'
+        )
+
+        if columns is not None:
+            return cls({
+                name.split('.', 1)[1]: column
+                for name, column in columns.items()
+                if name.startswith('reflected.')
+            })
+
+        return cls(load_feed(prefix)[2])
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def index(self, times):
+        '''
+        Indices of the reflected points in effect at `times`.
+
+        Inputs:
+          times [int | np.ndarray]:  Timestamps within `[start, end)`
+
+        Output:
+          [int | np.ndarray]: Point indices, shaped as `times`
+        '''
+        times = np.asarray(times, dtype=np.int64)
+
+        if np.any(times < self.start) or np.any(times >= self.end):
+            raise ValueError('PriceIndex: time outside of reflection')
+
+        if self.step is not None:
+            ix = (times - self.start) // self.step
+        else:
+            ix = np.searchsorted(self.timestamp, times, side='right') - 1
+
+        return int(ix) if ix.ndim == 0 else ix
+
+    def at(self, time):
+        '''
+        Prices in effect at `time`.
+
+        Output:
+          [dict]: `timestamp` of the point read, and `micro`, `macro`,
+                  `spot`, `bid` and `ask` prices
+        '''
+        ix = self.index(time)
+
+        prices = {'timestamp': int(self.timestamp[ix])}
+        prices.update({
+            name: float(series[ix]) for name, series in self.series.items()
+        })
+
+        return prices
+
+    def lookup(self, times, name):
+        '''
+        Vectorized prices of one series in effect at each of `times`.
+
+        Inputs:
+          times [np.ndarray]:  Timestamps within `[start, end)`
+          name  [str]:         One of `micro`, `macro`, `spot`, `bid`, `ask`
+
+        Output:
+          [np.ndarray]: Prices, shaped as `times`
+        '''
+        return self.series[name][self.index(times)]
+
+    def between(self, start, end):
+        '''
+        Reflected points with timestamps in `[start, end)`.
+
+        Output:
+          [dict]: `timestamp` and price series arrays, views into the index
+        '''
+        lo, hi = np.searchsorted(self.timestamp, [start, end], side='left')
+
+        points = {'timestamp': self.timestamp[lo:hi]}
+        points.update({
+            name: series[lo:hi] for name, series in self.series.items()
+        })
+
+        return points
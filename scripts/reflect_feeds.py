@@ -1,121 +1,313 @@
-import math
 import os
-import json
+import time
 import brownie
+import numpy as np
+import multiprocessing
+from glob import glob
 from brownie import \
     chain, \
-    interface, \
     accounts
+from scripts.feeds import ONE_DAY, raw_feed, stream_feed
+from scripts.uploader import load_observations
+from scripts.reflection import \
+    REFLECTION_PARAMS, \
+    STEP, \
+    WINDOW_MACRO, \
+    WINDOW_MICRO, \
+    append_reflection, \
+    budget, \
+    connect_worker, \
+    frame_feed, \
+    reflect_prefix, \
+    reflect_worker, \
+    reflection_params, \
+    restore_reflection, \
+    tick_cumulatives
 
 START = chain.time()
-ONE_DAY = 86400
 
+''' REFLECTION MODES '''
+OFFLINE = 'offline'  # compute the reflection from the feed arrays
+CHAIN = 'chain'  # observe a mock on the dev chain once per step
+CHECK = 'check'  # run both and require identical tick cumulatives
 
-def reflect_feed(path):
-    base = os.path.dirname(os.path.abspath(__file__))
-    raw_uni_path = os.path.join(base, path + '_raw_uni.json')
-    with open(os.path.normpath(raw_uni_path)) as f:
-        feed = json.load(f)
-
-    feed.reverse()
-
-    chain.mine(timestamp=START)
-    now = chain.time()
-    earliest = feed[0]['observation'][0]
-
-    print("len feed", len(feed))
-
-    print("feed12", feed[311])
+''' BATCH PARAMETERS '''
+RAW_SUFFIX = '_raw_uni.json'
+CHAIN_PORT = 8545  # first worker dev chain port, one per worker after it
 
-    obs = []
-    shims = []
 
-    mock_start = now - 3600
+def observe_chain(obs, shims, timestamps, seconds_agos):
+    '''
+    Loads the framed feed into a `UniswapV3OracleMock` and observes it at
+    each timestamp by mining a block there.
 
-    for f in feed:
-        ob = f['observation']
-        shim = f['shim']
-        if earliest + ONE_DAY < ob[0]:
-            break
-        time_diff = ob[0] - earliest
-        ob[0] = shim[0] = mock_start + time_diff
-        obs.append(ob)
-        shims.append(shim)
+    Output:
+      [np.ndarray]: Tick cumulatives, one row per lookback
+    '''
+    project = brownie.project.get_loaded_projects()[0]
 
-    factory = accounts[6].deploy(getattr(brownie, 'UniswapV3FactoryMock'))
-
-    IUniswapV3OracleMock = getattr(interface, 'IUniswapV3OracleMock')
+    factory = accounts[6].deploy(project['UniswapV3FactoryMock'])
 
     zeroth = "0x0000000000000000000000000000000000000000"
     factory.createPool(zeroth, zeroth)
 
-    mock = IUniswapV3OracleMock(factory.allPools(0))
-
-    mock.loadObservations(obs, shims, {'from': accounts[0]})
-
-    breadth = obs[-1][0] - obs[0][0] - 3600
+    mock = project.interface.IUniswapV3OracleMock(factory.allPools(0))
 
-    timestamps = []
-    ten_mins = []
-    one_hrs = []
-    spots = []
-    bids = []
-    asks = []
+    load_observations(mock, obs, shims, accounts[0])
 
-    for x in range(0, breadth, 60):
+    cumulatives = []
 
-        time = START + x
+    for timestamp in timestamps:
 
-        print("time", time, "x", x, "breadth", breadth)
+        brownie.chain.mine(timestamp=timestamp)
 
-        brownie.chain.mine(timestamp=time)
+        ob = mock.observe(seconds_agos)
 
-        pbnj = .00573
+        cumulatives.append(ob[0])
 
-        ob = mock.observe([3600, 600, 1, 0])
+    return np.array(cumulatives, dtype=np.int64).T
 
-        ten_min = 1.0001 ** ((ob[0][3] - ob[0][1]) / 600)
-        one_hr = 1.0001 ** ((ob[0][3] - ob[0][0]) / 3600)
-        spot = 1.0001 ** ((ob[0][3] - ob[0][2]))
-        bid = min(ten_min, one_hr) * math.exp(-pbnj)
-        ask = max(ten_min, one_hr) * math.exp(pbnj)
 
-        timestamps.append(time)
-        ten_mins.append(ten_min)
-        one_hrs.append(one_hr)
-        spots.append(spot)
-        bids.append(bid)
-        asks.append(ask)
+def check_chain(obs, shims, timestamps, seconds_agos):
+    '''
+    Computes the offline reflection and requires the chain to observe
+    identical tick cumulatives.
+    '''
+    cumulatives = np.stack([
+        tick_cumulatives(obs, shims, timestamps, ago)
+        for ago in seconds_agos
+    ])
 
-    reflected = {
-        'timestamp': timestamps,
-        'one_hr': one_hrs,
-        'ten_min': ten_mins,
-        'spot': spots,
-        'bids': bids,
-        'asks': asks
-    }
+    observed = observe_chain(obs, shims, timestamps, seconds_agos)
+    mismatched = np.nonzero((observed != cumulatives).any(axis=0))[0]
+    assert len(mismatched) == 0, \
+        "offline reflection differs from chain at {}".format(
+            [timestamps[i] for i in mismatched[:10]])
 
-    mock = {
-        'observations': obs,
-        'shims': shims
-    }
+    return cumulatives
 
-    reflected_path = os.path.join(base, path + '_reflected.json')
-    with open(os.path.normpath(reflected_path), 'w+') as f:
-        json.dump(reflected, f)
-
-    raw_uni_framed_path = os.path.join(base, path + '_raw_uni_framed.json')
-    with open(os.path.normpath(raw_uni_framed_path), 'w+') as f:
-        json.dump(mock, f)
+
+def prefix_of(path):
+    base = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(base, path))
 
 
-def main():
+def estimate_feed(path, mode=OFFLINE, params=REFLECTION_PARAMS):
+    '''
+    Prints and returns the memory and runtime budget of reflecting the raw
+    feed at `path` anew, see `budget`.
+    '''
+    prefix = prefix_of(path)
+
+    obs, shims = frame_feed(
+        raw_feed(prefix, params['frame']), START, params)
+    estimate = budget(obs, shims, params, chain=mode != OFFLINE)
+
+    print("budget {}: {} points, {:.1f} MiB memory, {:.1f} MiB output, "
+          "{:.1f}s".format(
+              path,
+              estimate['points'],
+              estimate['memory'] / (1 << 20),
+              estimate['output'] / (1 << 20),
+              estimate['seconds']))
+
+    return estimate
+
+
+def reflect_feed(path, mode=OFFLINE, start=None, params=REFLECTION_PARAMS):
+    '''
+    Writes the `_reflected.json` and `_raw_uni_framed.json` files for the
+    raw feed at `path`. `CHECK` mode bypasses the reflection cache. The
+    budget of reflecting anew is printed before a run starts.
+
+    Inputs:
+      path   [str]:   Feed path prefix relative to this directory
+      mode   [str]:   One of `OFFLINE`, `CHAIN` or `CHECK`
+      start  [int]:   Timestamp of the first reflected point, defaults to
+                      `START`
+      params [dict]:  Reflection parameters, see `reflection_params`
+
+    Output:
+      [str]: Reflection status, see `reflect_prefix`
+    '''
+    observer = {CHAIN: observe_chain, CHECK: check_chain}.get(mode)
+    start = START if start is None else start
+
+    def started():
+        if observer is None:
+            return start
+        chain.mine(timestamp=start)
+        return chain.time()
+
+    prefix = prefix_of(path)
+
+    if mode != CHECK:
+        status = restore_reflection(prefix, start, params)
+        if status is not None:
+            return status
+
+    estimate_feed(path, mode, params)
+
+    return reflect_prefix(prefix, started(), observer, mode != CHECK, params)
+
+
+def append_feed(path, tail_path, params=REFLECTION_PARAMS):
+    '''
+    Appends the raw observations in `tail_path` newer than the reflected
+    feed at `path` and reflects only the new points.
+
+    Inputs:
+      path      [str]:  Feed path prefix relative to this directory
+      tail_path [str]:  Raw feed file with the new observations, in the
+                        format and either order of `_raw_uni.json`
+      params    [dict]: Reflection parameters of the reflected feed
+
+    Output:
+      [int]: Number of reflected points appended
+    '''
+    status, appended = append_reflection(
+        prefix_of(path),
+        stream_feed(prefix_of(tail_path), frame=None),
+        params
+    )
+
+    print("reflection", status, path, appended)
+
+    return appended
+
+
+def feed_prefixes(patterns):
+    '''
+    Expands glob patterns of feed path prefixes relative to this directory
+    into the absolute prefixes of the raw feeds they match, in order and
+    without duplicates.
+    '''
+    prefixes = []
+
+    for pattern in patterns:
+        for raw in sorted(glob(prefix_of(pattern) + RAW_SUFFIX)):
+            prefix = raw[:-len(RAW_SUFFIX)]
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+
+    return prefixes
+
+
+def reflect_batch(
+    patterns,
+    mode=OFFLINE,
+    workers=None,
+    start=None,
+    params=REFLECTION_PARAMS
+):
+    '''
+    Reflects every raw feed matching `patterns` over a process pool.
+
+    Offline workers only need numpy; chain workers each launch and connect
+    to a dev chain of their own. Outputs are written atomically, so
+    concurrent or interrupted runs never leave partial files behind.
+
+    Inputs:
+      patterns [list]:  Glob patterns of feed path prefixes relative to
+                        this directory, e.g. `../feeds/univ3_*`
+      mode     [str]:   One of `OFFLINE`, `CHAIN` or `CHECK`
+      workers  [int]:   Pool size, defaults to the CPU count
+      start    [int]:   Timestamp of the first reflected point of every
+                        feed, defaults to `START`
+      params   [dict]:  Reflection parameters, see `reflection_params`
+
+    Output:
+      [dict]: Feed prefix to `(status, seconds)`
+    '''
+    prefixes = feed_prefixes(patterns)
+    start = START if start is None else start
+    workers = min(workers or os.cpu_count(), len(prefixes)) or 1
+
+    context = multiprocessing.get_context('spawn')
+    manager = context.Manager() if mode != OFFLINE else None
+
+    initializer = None
+    initargs = ()
+    if manager is not None:
+        ports = manager.Queue()
+        for i in range(workers):
+            ports.put(CHAIN_PORT + 1 + i)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        initializer = connect_worker
+        initargs = (root, ports)
+
+    # offline jobs carry no mode so workers never need brownie
+    jobs = [
+        (prefix, None if mode == OFFLINE else mode, start, params)
+        for prefix in prefixes
+    ]
+    results = {}
+
+    began = time.time()
+
+    with context.Pool(workers, initializer, initargs) as pool:
+        for i, (prefix, status, seconds) in enumerate(
+                pool.imap_unordered(reflect_worker, jobs)):
+            results[prefix] = (status, seconds)
+            print("[{}/{}] {} {} {:.2f}s".format(
+                i + 1, len(jobs), os.path.basename(prefix), status, seconds))
+
+    if manager is not None:
+        manager.shutdown()
+
+    print("reflected {} feeds in {:.2f}s".format(
+        len(jobs), time.time() - began))
+
+    return results
+
+
+def batch(mode=OFFLINE, *patterns):
+    reflect_batch(patterns or ['../feeds/*'], mode)
+
+
+def cli_params(step, frame, macro, micro, windows):
+    '''
+    Reflection parameters from `brownie run` string arguments, `windows`
+    comma separated.
+    '''
+    return reflection_params(
+        step=int(step),
+        frame=int(frame),
+        macro=int(macro),
+        micro=int(micro),
+        windows=[int(w) for w in str(windows).split(',') if w]
+    )
+
+
+def estimate(
+    path,
+    mode=OFFLINE,
+    step=STEP,
+    frame=ONE_DAY,
+    macro=WINDOW_MACRO,
+    micro=WINDOW_MICRO,
+    windows=''
+):
+    estimate_feed(path, mode, cli_params(step, frame, macro, micro, windows))
+
+
+def main(
+    mode=OFFLINE,
+    step=STEP,
+    frame=ONE_DAY,
+    macro=WINDOW_MACRO,
+    micro=WINDOW_MICRO,
+    windows=''
+):
+
+    params = cli_params(step, frame, macro, micro, windows)
 
     axs_weth_path = '../feeds/univ3_axs_weth'
 
     dai_weth_path = '../feeds/univ3_dai_weth'
 
-    reflect_feed(dai_weth_path)
+    print("reflection", reflect_feed(dai_weth_path, mode, None, params),
+          dai_weth_path)
 
-    reflect_feed(axs_weth_path)
+    print("reflection", reflect_feed(axs_weth_path, mode, None, params),
+          axs_weth_path)
@@ -0,0 +1,739 @@
+import os
+import json
+import math
+import time
+import hashlib
+import numpy as np
+from scripts.cache import \
+    KEY_COLUMN, \
+    cache_key, \
+    column_key, \
+    key_column, \
+    lookup, \
+    store
+from scripts.feeds import \
+    ONE_DAY, \
+    COLUMNS_EXT, \
+    file_digest, \
+    framed_columns, \
+    framed_from_columns, \
+    load_columns, \
+    load_current, \
+    load_feed, \
+    raw_feed, \
+    source_columns, \
+    write_feed
+
+
+''' REFLECTION PARAMETERS '''
+PBNJ = .00573
+STEP = 60
+WINDOW_MACRO = 3600  # PRICE_WINDOW_MACRO of OverlayV1UniswapV3Market
+WINDOW_MICRO = 600  # PRICE_WINDOW_MICRO of OverlayV1UniswapV3Market
+
+# everything a reflection depends on besides the raw feed; the cache key
+# version is bumped whenever the reflection itself changes
+REFLECTION_PARAMS = {
+    'version': 2,
+    'macro': WINDOW_MACRO,  # lookback of `one_hr`
+    'micro': WINDOW_MICRO,  # lookback of `ten_min`
+    'windows': [],  # extra lookbacks, reflected as `twap_<seconds>`
+    'pbnj': PBNJ,
+    'frame': ONE_DAY,  # horizon of raw feed reflected
+    'step': STEP  # seconds between reflected points
+}
+
+''' BUDGET PARAMETERS '''
+# bytes per reflected point and series: array, python float and list slot
+POINT_BYTES = 8 + 24 + 8
+# bytes per reflected point and series in `_reflected.json`
+POINT_JSON_BYTES = 20
+# seconds per reflected point observed on a dev chain: one block mined and
+# one call per point
+CHAIN_POINT_SECONDS = .025
+# reflected points timed to calibrate offline throughput
+CALIBRATION_POINTS = 2000
+# bytes per second of outputs serialized and written
+OUTPUT_BYTES_PER_SECOND = 10 << 20
+
+''' REFLECTION STATUSES '''
+CURRENT = 'current'  # outputs already reflected under the same key
+CACHED = 'cached'  # outputs restored from the reflection cache
+REFLECTED = 'reflected'  # outputs reflected anew
+APPENDED = 'appended'  # new points appended to existing outputs
+
+
+def reflection_params(**overrides):
+    '''
+    Reflection parameters, `REFLECTION_PARAMS` with `overrides` applied.
+
+    Windows are validated against what the mock can observe: every lookback
+    must fit in the horizon, and the micro window within the macro one as
+    `OverlayV1UniswapV3Market` requires.
+
+    Inputs:
+      overrides [dict]:  Any of `macro`, `micro`, `windows`, `pbnj`,
+                         `frame` and `step`
+
+    Output:
+      [dict]: Reflection parameters
+    '''
+    unknown = set(overrides) - set(REFLECTION_PARAMS) - {'version'}
+    if unknown:
+        raise ValueError('reflection_params: unknown {}'.format(
+            sorted(unknown)))
+
+    params = dict(REFLECTION_PARAMS, **overrides)
+    params['windows'] = sorted(set(int(w) for w in params['windows']))
+
+    if params['step'] <= 0:
+        raise ValueError('reflection_params: step must be positive')
+    if not 1 < params['micro'] <= params['macro']:
+        raise ValueError('reflection_params: need 1 < micro <= macro')
+    if any(w <= 1 for w in params['windows']):
+        raise ValueError('reflection_params: windows must exceed 1 second')
+    if params['frame'] <= max(seconds_agos(params)):
+        raise ValueError('reflection_params: frame within longest window')
+
+    return params
+
+
+def seconds_agos(params=REFLECTION_PARAMS):
+    '''
+    Lookbacks observed at each reflected point: macro, micro, 1 and 0
+    seconds ago for the reflected prices, then any extra windows.
+    '''
+    return [params['macro'], params['micro'], 1, 0] + list(params['windows'])
+
+
+def lookback(params=REFLECTION_PARAMS):
+    '''
+    Longest lookback observed, i.e. the seconds of feed framed before the
+    first reflected point.
+    '''
+    return max(seconds_agos(params))
+
+
+SECONDS_AGOS = seconds_agos()
+
+
+def _shim_index(shim_times, time):
+    '''
+    Index of the shim `UniswapV3OracleMock.observe` reads its tick,
+    liquidity and cardinality from at block time `time`, i.e. the latest
+    shim written at or before `time`.
+
+    Inputs:
+      shim_times [np.ndarray]:  Ascending shim timestamps
+      time       [np.ndarray]:  Block timestamps to observe at
+
+    Output:
+      [np.ndarray]: Shim indices, one per element of `time`
+    '''
+    if np.any(time < shim_times[0]) or np.any(shim_times[-1] < time):
+        # the mock binary search never terminates outside of its shims
+        raise ValueError('observe: time outside of loaded shims')
+
+    return np.searchsorted(shim_times, time, side='right') - 1
+
+
+def _div(a, b):
+    '''
+    Solidity signed integer division, truncating toward zero.
+    '''
+    return np.where(a < 0, -((-a) // b), a // b)
+
+
+def observe(observations, shims, time, seconds_agos):
+    '''
+    Exact python port of `UniswapV3OracleMock.observe` over loaded
+    observations and shims, on arbitrary precision integers.
+
+    Inputs:
+      observations [list]:  `[blockTimestamp, tickCumulative,
+                             secondsPerLiquidityCumulativeX128,
+                             initialized]` entries as loaded into the mock
+      shims        [list]:  `[timestamp, liquidity, tick, cardinality]`
+                            entries as loaded into the mock
+      time         [int]:   Block timestamp of the call
+      seconds_agos [list]:  Seconds to look back from `time`
+
+    Outputs:
+      [list]: Tick cumulatives, one per element of `seconds_agos`
+      [list]: Seconds per liquidity cumulatives, one per element of
+              `seconds_agos`
+    '''
+    shim_times = np.array([s[0] for s in shims], dtype=np.int64)
+    shim = shims[int(_shim_index(shim_times, np.array([time]))[0])]
+
+    _, liquidity, tick, cardinality = shim
+    index = cardinality - 1
+    times = [ob[0] for ob in observations[:cardinality]]
+
+    def transform(last, target):
+        delta = target - last[0]
+        return (
+            last[1] + tick * delta,
+            last[2] + (delta << 128) // (liquidity if liquidity > 0 else 1)
+        )
+
+    tick_cumulatives = []
+    liquidity_cumulatives = []
+
+    for ago in seconds_agos:
+
+        target = time - ago
+        last = observations[index]
+
+        if last[0] <= target:
+
+            cumulative = (last[1], last[2]) if last[0] == target \
+                else transform(last, target)
+
+        else:
+
+            if target < times[0]:
+                raise ValueError('observe: OLD')
+
+            i = int(np.searchsorted(times, target, side='right')) - 1
+            before, after = observations[i], observations[i + 1]
+
+            if target == before[0]:
+                cumulative = (before[1], before[2])
+            else:
+                time_delta = after[0] - before[0]
+                target_delta = target - before[0]
+                tick_delta = after[1] - before[1]
+                tick_delta = -(-tick_delta // time_delta) if tick_delta < 0 \
+                    else tick_delta // time_delta
+                cumulative = (
+                    before[1] + tick_delta * target_delta,
+                    before[2] + (after[2] - before[2]) * target_delta
+                    // time_delta
+                )
+
+        tick_cumulatives.append(cumulative[0])
+        liquidity_cumulatives.append(cumulative[1])
+
+    return tick_cumulatives, liquidity_cumulatives
+
+
+def tick_cumulatives(observations, shims, times, seconds_ago):
+    '''
+    Vectorized `UniswapV3OracleMock.observe` tick cumulatives for a single
+    lookback over many block times. Matches `observe` exactly.
+
+    Inputs:
+      observations [list]:        Observations as loaded into the mock
+      shims        [list]:        Shims as loaded into the mock
+      times        [np.ndarray]:  Block timestamps to observe at
+      seconds_ago  [int]:         Seconds to look back from each time
+
+    Output:
+      [np.ndarray]: int64 tick cumulatives, one per element of `times`
+    '''
+    ob_times = np.array([ob[0] for ob in observations], dtype=np.int64)
+    ob_ticks = np.array([ob[1] for ob in observations], dtype=np.int64)
+    shim_times = np.array([s[0] for s in shims], dtype=np.int64)
+    shim_ticks = np.array([s[2] for s in shims], dtype=np.int64)
+    shim_cards = np.array([s[3] for s in shims], dtype=np.int64)
+
+    times = np.asarray(times, dtype=np.int64)
+
+    shim = _shim_index(shim_times, times)
+    index = shim_cards[shim] - 1
+    target = times - seconds_ago
+
+    if np.any(target < ob_times[0]):
+        raise ValueError('observe: OLD')
+
+    # target at or after the newest observation the mock can see:
+    # extrapolate it with the current tick
+    late = ob_times[index] <= target
+    cumulatives = ob_ticks[index] \
+        + shim_ticks[shim] * (target - ob_times[index])
+
+    # otherwise interpolate between the surrounding observations
+    early = ~late
+    t = target[early]
+    i = np.searchsorted(ob_times, t, side='right') - 1
+    j = np.minimum(i + 1, len(ob_times) - 1)
+    slope = _div(
+        ob_ticks[j] - ob_ticks[i],
+        np.maximum(ob_times[j] - ob_times[i], 1)
+    )
+    cumulatives[early] = np.where(
+        t == ob_times[i],
+        ob_ticks[i],
+        ob_ticks[i] + slope * (t - ob_times[i])
+    )
+
+    return cumulatives
+
+
+def prices(cumulatives, params=REFLECTION_PARAMS):
+    '''
+    Reflected prices from `observe(seconds_agos(params))` tick cumulatives.
+
+    Inputs:
+      cumulatives [np.ndarray]:  Tick cumulatives, one row per lookback of
+                                 `seconds_agos(params)`
+      params      [dict]:        Reflection parameters
+
+    Output:
+      [dict]: `one_hr`, `ten_min`, `spot`, `bids` and `asks` series, at
+              the macro and micro windows, and a `twap_<seconds>` series
+              per extra window
+    '''
+    cumulatives = np.asarray(cumulatives, dtype=np.int64)
+    now = cumulatives[3]
+    pbnj = params['pbnj']
+
+    ten_min = 1.0001 ** ((now - cumulatives[1]) / params['micro'])
+    one_hr = 1.0001 ** ((now - cumulatives[0]) / params['macro'])
+    spot = 1.0001 ** (now - cumulatives[2]).astype(np.float64)
+    bids = np.minimum(ten_min, one_hr) * math.exp(-pbnj)
+    asks = np.maximum(ten_min, one_hr) * math.exp(pbnj)
+
+    series = {
+        'one_hr': one_hr,
+        'ten_min': ten_min,
+        'spot': spot,
+        'bids': bids,
+        'asks': asks
+    }
+
+    for i, window in enumerate(params['windows']):
+        series['twap_{}'.format(window)] = \
+            1.0001 ** ((now - cumulatives[4 + i]) / window)
+
+    return series
+
+
+def reflect(observations, shims, timestamps, params=REFLECTION_PARAMS):
+    '''
+    Offline equivalent of mining to each timestamp and calling
+    `mock.observe(seconds_agos(params))` on a mock loaded with the given
+    observations and shims.
+
+    Inputs:
+      observations [list]:  Observations as loaded into the mock
+      shims        [list]:  Shims as loaded into the mock
+      timestamps   [list]:  Block timestamps to reflect at
+      params       [dict]:  Reflection parameters
+
+    Outputs:
+      [np.ndarray]: Tick cumulatives, one row per lookback
+      [dict]:       Reflected series, keyed as in `_reflected.json`
+    '''
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+
+    cumulatives = np.stack([
+        tick_cumulatives(observations, shims, timestamps, ago)
+        for ago in seconds_agos(params)
+    ])
+
+    reflected = {'timestamp': timestamps}
+    reflected.update(prices(cumulatives, params))
+
+    return cumulatives, reflected
+
+
+def reflection_times(start, observations, params=REFLECTION_PARAMS):
+    '''
+    Timestamps reflected from `start` on, every `step` seconds for as
+    long as the framed observations last.
+    '''
+    breadth = observations[-1][0] - observations[0][0] - lookback(params)
+    return [start + x for x in range(0, breadth, params['step'])]
+
+
+def budget(observations, shims, params=REFLECTION_PARAMS, chain=False):
+    '''
+    Memory and runtime estimate of reflecting framed observations, made
+    before committing to a run. Offline throughput is calibrated by
+    timing a reflection of a sample of the points.
+
+    Inputs:
+      observations [list]:  Framed observations
+      shims        [list]:  Framed shims
+      params       [dict]:  Reflection parameters
+      chain        [bool]:  Whether points are observed on a dev chain
+
+    Output:
+      [dict]: `points`, peak `memory` and `output` bytes and `seconds`
+    '''
+    start = observations[0][0] + lookback(params)
+    times = reflection_times(start, observations, params)
+    points = len(times)
+    series = 6 + len(params['windows'])
+    lookbacks = len(seconds_agos(params))
+
+    if chain:
+        seconds = points * CHAIN_POINT_SECONDS
+    elif points == 0:
+        seconds = 0.
+    else:
+        sample = times[::max(points // CALIBRATION_POINTS, 1)]
+        began = time.time()
+        reflect(observations, shims, sample, params)
+        seconds = (time.time() - began) * points / len(sample)
+
+    output = points * series * POINT_JSON_BYTES
+
+    return {
+        'points': points,
+        'memory': points * (series * POINT_BYTES + lookbacks * 8),
+        'output': output,
+        'seconds': seconds + output / OUTPUT_BYTES_PER_SECOND
+    }
+
+
+def frame_feed(feed, start, params=REFLECTION_PARAMS):
+    '''
+    Frames a feed so its reflection begins at `start`.
+
+    Inputs:
+      feed   [iterable]:  `(observation, shim)` pairs, oldest first
+      start  [int]:       Timestamp of the first reflected point
+      params [dict]:      Reflection parameters
+
+    Outputs:
+      [list]: Observations, timestamps shifted to the longest lookback
+              before `start`
+      [list]: Shims, timestamps shifted likewise
+    '''
+    obs = []
+    shims = []
+
+    mock_start = start - lookback(params)
+    earliest = None
+
+    for ob, shim in feed:
+        if earliest is None:
+            earliest = ob[0]
+        time_diff = ob[0] - earliest
+        ob[0] = shim[0] = mock_start + time_diff
+        obs.append(ob)
+        shims.append(shim)
+
+    return obs, shims
+
+
+def rebase(obs, shims, reflected, start):
+    '''
+    Shifts a framed and reflected feed in time so its reflection begins at
+    `start`. Reflections are invariant to the shift: every price depends on
+    time differences only.
+    '''
+    shift = start - reflected['timestamp'][0]
+
+    for ob, shim in zip(obs, shims):
+        ob[0] += shift
+        shim[0] += shift
+
+    reflected['timestamp'] = [t + shift for t in reflected['timestamp']]
+
+    return obs, shims, reflected
+
+
+def _write_json(path, data):
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def write_reflection(prefix, obs, shims, reflected, key):
+    '''
+    Atomically writes `<prefix>_reflected.json`,
+    `<prefix>_raw_uni_framed.json` and, last, their columnar equivalent
+    `<prefix>.cols` tagged with `key`.
+    '''
+    mock = {
+        'observations': obs,
+        'shims': shims
+    }
+
+    _write_json(prefix + '_reflected.json', reflected)
+    _write_json(prefix + '_raw_uni_framed.json', mock)
+
+    extra = source_columns(
+        prefix + '_raw_uni_framed.json', prefix + '_reflected.json')
+    extra[KEY_COLUMN] = key_column(key)
+
+    tmp = '{}.{}'.format(prefix, os.getpid())
+    write_feed(tmp, obs, shims, reflected, extra)
+    os.replace(tmp + COLUMNS_EXT, prefix + COLUMNS_EXT)
+
+
+def reflection_key(prefix, params=REFLECTION_PARAMS):
+    '''
+    Cache key of the reflection of the raw feed at `prefix`.
+    '''
+    return cache_key([file_digest(prefix + '_raw_uni.json')], params)
+
+
+def reflection_current(prefix, key, start):
+    '''
+    Whether the outputs at `prefix` were reflected under `key` and begin at
+    `start`.
+    '''
+    columns = load_current(
+        prefix + COLUMNS_EXT,
+        prefix + '_raw_uni_framed.json',
+        prefix + '_reflected.json'
+    )
+
+    if columns is None:
+        return False
+
+    return column_key(columns) == key \
+        and columns['reflected.timestamp'][0] == start
+
+
+def restore_reflection(prefix, start, params=REFLECTION_PARAMS):
+    '''
+    Serves the reflection of the raw feed at `prefix` without reflecting:
+    outputs already reflected under the same key from `start` are left
+    untouched, and otherwise a cached reflection is restored, shifted to
+    begin at `start` as `reflect_prefix` would have reflected it.
+
+    Inputs:
+      prefix [str]:   Absolute feed path prefix
+      start  [int]:   Timestamp of the first reflected point
+      params [dict]:  Reflection parameters
+
+    Output:
+      [str]: `CURRENT` or `CACHED`, None on a cache miss
+    '''
+    key = reflection_key(prefix, params)
+
+    if reflection_current(prefix, key, start):
+        return CURRENT
+
+    columns = lookup(key)
+
+    if columns is None:
+        return None
+
+    obs, shims, reflected = framed_from_columns(columns)
+    rebase(obs, shims, reflected, start)
+    write_reflection(prefix, obs, shims, reflected, key)
+
+    return CACHED
+
+
+def reflect_prefix(
+    prefix,
+    start,
+    observer=None,
+    cached=True,
+    params=REFLECTION_PARAMS
+):
+    '''
+    Reflects the raw feed at `prefix` anew and writes its
+    `_reflected.json`, `_raw_uni_framed.json` and `.cols` outputs.
+
+    Inputs:
+      prefix   [str]:       Absolute feed path prefix
+      start    [int]:       Timestamp of the first reflected point
+      observer [function]:  `(obs, shims, timestamps, seconds_agos)` to
+                            tick cumulatives, one row per lookback; the
+                            offline engine if None
+      cached   [bool]:      Whether to store the reflection in the cache
+      params   [dict]:      Reflection parameters
+
+    Output:
+      [str]: `REFLECTED`
+    '''
+    key = reflection_key(prefix, params)
+
+    obs, shims = frame_feed(
+        raw_feed(prefix, params['frame']), start, params)
+
+    timestamps = reflection_times(start, obs, params)
+
+    if observer is None:
+        cumulatives, _ = reflect(obs, shims, timestamps, params)
+    else:
+        cumulatives = observer(obs, shims, timestamps, seconds_agos(params))
+
+    reflected = {'timestamp': timestamps}
+    reflected.update({
+        k: v.tolist() for k, v in prices(cumulatives, params).items()
+    })
+
+    write_reflection(prefix, obs, shims, reflected, key)
+
+    if cached:
+        store(key, framed_columns(obs, shims, reflected))
+
+    return REFLECTED
+
+
+def lookback_window(observations, shims, since):
+    '''
+    The observations and shims a mock needs to be observed at or after
+    `since`: everything from the latest observation at or before `since`
+    on, with shim cardinalities rebased to the trimmed arrays.
+
+    Inputs:
+      observations [list]:  Observations as loaded into the mock
+      shims        [list]:  Shims as loaded into the mock
+      since        [int]:   Earliest time to be observed, lookback included
+
+    Outputs:
+      [list]: Trimmed observations
+      [list]: Trimmed shims
+    '''
+    times = np.array([ob[0] for ob in observations], dtype=np.int64)
+    first = max(int(np.searchsorted(times, since, side='right')) - 1, 0)
+
+    return observations[first:], [
+        shim[:3] + [shim[3] - first] for shim in shims[first:]
+    ]
+
+
+def append(
+    observations,
+    shims,
+    reflected,
+    tail,
+    shift=0,
+    params=REFLECTION_PARAMS
+):
+    '''
+    Extends a framed and reflected feed with a tail of newer raw
+    observations, reflecting only the points after the last reflected one.
+
+    Only the observations within the longest lookback of the first new
+    point are observed, so the cost scales with the tail, not the feed.
+
+    Inputs:
+      observations [list]:      Framed observations
+      shims        [list]:      Framed shims
+      reflected    [dict]:      Reflected series, as in `_reflected.json`
+      tail         [iterable]:  `(observation, shim)` raw pairs, oldest
+                                first; those not newer than the framed feed
+                                are skipped
+      shift        [int]:       Framed minus raw timestamps
+      params       [dict]:      Reflection parameters of `reflected`
+
+    Outputs:
+      [list]: Extended observations
+      [list]: Extended shims
+      [dict]: Extended reflected series
+      [int]:  Number of reflected points appended
+    '''
+    latest = observations[-1][0]
+
+    for ob, shim in tail:
+        if ob[0] + shift <= latest:
+            continue
+        latest = ob[0] = shim[0] = ob[0] + shift
+        observations.append(ob)
+        # the mock reads the newest observation at cardinality - 1
+        shim[3] = len(observations)
+        shims.append(shim)
+
+    step = params['step']
+    timestamps = list(range(reflected['timestamp'][-1] + step, latest, step))
+
+    if len(timestamps) == 0:
+        return observations, shims, reflected, 0
+
+    window = lookback_window(
+        observations, shims, timestamps[0] - lookback(params))
+    cumulatives, _ = reflect(*window, timestamps, params)
+
+    reflected['timestamp'] = list(reflected['timestamp']) + timestamps
+    for k, v in prices(cumulatives, params).items():
+        reflected[k] = list(reflected[k]) + v.tolist()
+
+    return observations, shims, reflected, len(timestamps)
+
+
+def append_reflection(prefix, tail, params=REFLECTION_PARAMS):
+    '''
+    Appends a tail of raw observations to the framed and reflected outputs
+    at `prefix` in place, reflecting only the new points.
+
+    The raw feed `<prefix>_raw_uni.json` fixes the framing shift. Appended
+    outputs are keyed on their previous key and the tail, so a later
+    `reflect_prefix` or `restore_reflection` replaces them with a full
+    reflection of the raw feed.
+
+    Inputs:
+      prefix [str]:       Absolute feed path prefix
+      tail   [iterable]:  `(observation, shim)` raw pairs, oldest first
+      params [dict]:      Reflection parameters of the outputs
+
+    Outputs:
+      [str]: `APPENDED`, or `CURRENT` if no new points were reflected
+      [int]: Number of reflected points appended
+    '''
+    obs, shims, reflected = load_feed(prefix)
+
+    earliest = next(raw_feed(prefix))[0]
+    shift = obs[0][0] - earliest[0]
+
+    tail = list(tail)
+    obs, shims, reflected, appended = append(
+        obs, shims, reflected, tail, shift, params)
+
+    if appended == 0:
+        return CURRENT, 0
+
+    columns_path = prefix + COLUMNS_EXT
+    previous = column_key(load_columns(columns_path)) \
+        if os.path.exists(columns_path) else None
+    digest = hashlib.sha256(json.dumps(tail).encode()).hexdigest()
+    key = cache_key([previous, digest], params)
+
+    write_reflection(prefix, obs, shims, reflected, key)
+
+    return APPENDED, appended
+
+
+def connect_worker(root, ports):
+    '''
+    Process pool initializer for chain reflections: loads the brownie
+    project at `root`, for `reflect_feed` to take its contracts from, and
+    connects the worker to a dev chain of its own, launched on the next port
+    from the `ports` queue.
+    '''
+    from brownie import network, project
+    from brownie._config import CONFIG
+
+    port = ports.get()
+
+    project.load(root).load_config()
+    # brownie has no public setting for it, its xdist workers set it so too
+    CONFIG.networks['development']['cmd_settings']['port'] = port
+    network.connect('development')
+
+
+def reflect_worker(job):
+    '''
+    Process pool task reflecting one feed. Offline jobs never import
+    brownie; chain jobs run in workers set up by `connect_worker`.
+
+    Inputs:
+      job [tuple]: `(prefix, mode, start, params)`
+
+    Output:
+      [tuple]: `(prefix, status, seconds)`
+    '''
+    prefix, mode, start, params = job
+
+    began = time.time()
+
+    if mode is None:
+        status = restore_reflection(prefix, start, params) or \
+            reflect_prefix(prefix, start, params=params)
+    else:
+        from scripts.reflect_feeds import reflect_feed
+        status = reflect_feed(prefix, mode, start, params)
+
+    return prefix, status, time.time() - began
@@ -0,0 +1,1182 @@
+"""
+Offline model of the Overlay V1 market contracts.
+
+Mirrors `OverlayV1UniswapV3Market` (with the `OverlayV1OI`,
+`OverlayV1Comptroller` and `OverlayV1PricePoint` accounting it inherits),
+`OverlayV1OVLCollateral`, `OverlayV1Mothership` and `OverlayToken` on
+arbitrary precision integers, so trades can be simulated without a chain.
+Reverts raise `Revert` carrying the contract's revert string.
+"""
+import typing as tp
+from contextlib import contextmanager
+from functools import lru_cache
+
+import numpy as np
+
+from scripts import fixed_point
+from scripts.fixed_point import \
+    Revert, \
+    div_down, \
+    div_up, \
+    mul_down, \
+    mul_up, \
+    sub
+from scripts.comptroller import Comptroller, Roller, Rollers  # noqa: F401
+from scripts.funding import compute_funding
+from scripts.liquidation import Liquidations, scan
+from scripts.positions import Positions, Shares
+from scripts.reflection import observe
+
+
+''' FIXED POINT '''
+ONE = 10 ** 18
+TWO = 2 * ONE
+E = 0x25B946EBC0B36351
+INVERSE_E = 0x51AF86713316A9A
+CACHE_SIZE = 1 << 16  # memoized powers and tick prices
+
+''' UNISWAP V3 '''
+MIN_TICK = -887272
+MAX_TICK = 887272
+X96 = 1 << 96
+UINT128_MAX = (1 << 128) - 1
+UINT256_MAX = (1 << 256) - 1
+
+''' MARKET PARAMETERS '''
+# defaults of the markets under test, see `tests/markets/conftest.py`
+CHORD = 60
+MIN_COLLAT = 10 ** 14
+BASE_AMOUNT = ONE
+MACRO_WINDOW = 3600
+MICRO_WINDOW = 600
+PRICE_FRAME_CAP = 5 * ONE
+K = 343454218783234
+PBNJ = 573 * 10 ** 13
+COMPOUNDING_PERIOD = 600
+LMBDA = 0
+STATIC_CAP = 800000 * ONE
+BRRRRD_EXPECTED = 26320 * ONE
+BRRRRD_WINDOW_MACRO = 2592000
+BRRRRD_WINDOW_MICRO = 86400
+
+''' MOTHERSHIP PARAMETERS '''
+FEE = 15 * 10 ** 14  # 15 bps
+FEE_BURN_RATE = 5 * 10 ** 17
+MARGIN_BURN_RATE = 5 * 10 ** 17
+
+''' COLLATERAL PARAMETERS '''
+MARGIN_MAINTENANCE = 6 * 10 ** 16
+MARGIN_REWARD_RATE = 5 * 10 ** 17
+MAX_LEVERAGE = 100
+
+
+def require(condition: bool, revert_msg: str) -> None:
+    if not condition:
+        raise Revert(revert_msg)
+
+
+def checked_sub(a: int, b: int) -> int:
+    """
+    Checked uint256 subtraction, reverting on underflow as solidity does.
+    """
+    require(b <= a, "Integer overflow")
+    return a - b
+
+
+# `FixedPoint.powUp` of the spread and funding factors recurs every call
+pow_up = lru_cache(maxsize=CACHE_SIZE)(fixed_point.pow_up)
+
+
+''' TICK MATH '''
+_SQRT_RATIO_FACTORS = [
+    0xfff97272373d413259a46990580e213a,
+    0xfff2e50f5f656932ef12357cf3c7fdcc,
+    0xffe5caca7e10e4e61c3624eaa0941cd0,
+    0xffcb9843d60f6159c9db58835c926644,
+    0xff973b41fa98c081472e6896dfb254c0,
+    0xff2ea16466c96a3843ec78b326b52861,
+    0xfe5dee046a99a2a811c461f1969c3053,
+    0xfcbe86c7900a88aedcffc83b479aa3a4,
+    0xf987a7253ac413176f2b074cf7815e54,
+    0xf3392b0822b70005940c7a398e4b70f3,
+    0xe7159475a2c29b7443b29c7fa6e889d9,
+    0xd097f3bdfd2022b8845ad8f792aa5825,
+    0xa9f746462d870fdf8a65dc1f90e061e5,
+    0x70d869a156d2a1b890bb3df62baf32f7,
+    0x31be135f97d08fd981231505542fcfa6,
+    0x9aa508b5b7a84e1c677de54f3e99bc9,
+    0x5d6af8dedb81196699c329225ee604,
+    0x2216e584f5fa1ea926041bedfe98,
+    0x48a170391f7dc42444e8fa2,
+]
+
+
+def get_sqrt_ratio_at_tick(tick: int) -> int:
+    """
+    `TickMath.getSqrtRatioAtTick`: sqrt(1.0001^tick) as a Q64.96.
+    """
+    abs_tick = abs(tick)
+    require(abs_tick <= MAX_TICK, "T")
+
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 \
+        else 0x100000000000000000000000000000000
+
+    for i, factor in enumerate(_SQRT_RATIO_FACTORS):
+        if abs_tick & (0x2 << i):
+            ratio = (ratio * factor) >> 128
+
+    if tick > 0:
+        ratio = UINT256_MAX // ratio
+
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def mul_div(a: int, b: int, denominator: int) -> int:
+    """
+    `FullMath.mulDiv`: floor(a * b / denominator) at full precision.
+    """
+    result = a * b // denominator
+    require(result <= UINT256_MAX, "")
+    return result
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def quote_at_tick(tick: int, base_amount: int, base_lt_quote: bool) -> int:
+    """
+    `OracleLibraryV2.getQuoteAtTick`, also the market's `_tickToPrice`.
+
+    Inputs:
+      tick          [int]:   Tick of the price
+      base_amount   [int]:   Amount of the base token to quote
+      base_lt_quote [bool]:  Whether the base token address sorts below
+                             the quote token address
+
+    Output:
+      [int]: Amount of the quote token for `base_amount` of the base token
+    """
+    sqrt_ratio = get_sqrt_ratio_at_tick(tick)
+
+    if sqrt_ratio <= UINT128_MAX:
+        ratio = sqrt_ratio * sqrt_ratio
+        return mul_div(ratio, base_amount, 1 << 192) if base_lt_quote \
+            else mul_div(1 << 192, base_amount, ratio)
+
+    ratio = mul_div(sqrt_ratio, sqrt_ratio, 1 << 64)
+    return mul_div(ratio, base_amount, 1 << 128) if base_lt_quote \
+        else mul_div(1 << 128, base_amount, ratio)
+
+
+def _tick(tick_delta: int, window: int) -> int:
+    """
+    Time weighted tick, truncated toward zero as solidity divides.
+    """
+    return -(-tick_delta // window) if tick_delta < 0 \
+        else tick_delta // window
+
+
+''' FEEDS '''
+
+
+class StaticFeed:
+    """
+    Feed with constant ticks and liquidity, for simulations that drive
+    prices directly by setting `micro_tick` and `macro_tick`.
+    """
+
+    def __init__(
+        self,
+        tick: int,
+        market_liquidity: int = 0,
+        ovl_price: int = ONE,
+        base_amount: int = BASE_AMOUNT,
+        base_lt_quote: bool = True
+    ):
+        self.micro_tick = tick
+        self.macro_tick = tick
+        self.market_liquidity = market_liquidity
+        self.ovl_price = ovl_price
+        self.base_amount = base_amount
+        self.base_lt_quote = base_lt_quote
+
+    def consult(self, now: int) -> int:
+        return self.macro_tick
+
+    def fetch(self, now: int) -> tp.Tuple[int, int, int, int]:
+        return (
+            self.micro_tick,
+            self.macro_tick,
+            self.market_liquidity,
+            self.ovl_price
+        )
+
+
+class UniswapV3Feed:
+    """
+    Feed reading market and depth `UniswapV3OracleMock` observations as
+    loaded on chain, e.g. from `feeds.load_feed`, exactly as
+    `OverlayV1UniswapV3Market.fetchPricePoint` observes the mocks.
+    """
+
+    def __init__(
+        self,
+        market_info: tp.Tuple[list, list],
+        depth_info: tp.Tuple[list, list],
+        macro_window: int = MACRO_WINDOW,
+        micro_window: int = MICRO_WINDOW,
+        base_amount: int = BASE_AMOUNT,
+        base_lt_quote: bool = True,
+        eth_is0: bool = False,
+        ovl_lt_eth: bool = True
+    ):
+        """
+        Inputs:
+          market_info   [tuple]:  Market feed observations and shims
+          depth_info    [tuple]:  OVL/ETH feed observations and shims
+          macro_window  [int]:    Macro TWAP window
+          micro_window  [int]:    Micro TWAP window
+          base_amount   [int]:    Amount of the base token to price
+          base_lt_quote [bool]:   Whether the market base token address
+                                  sorts below its quote token address
+          eth_is0       [bool]:   Whether ETH is token0 of the depth feed
+          ovl_lt_eth    [bool]:   Whether the OVL address sorts below ETH
+        """
+        self.market_obs, self.market_shims = market_info[:2]
+        self.depth_obs, self.depth_shims = depth_info[:2]
+        self.macro_window = macro_window
+        self.micro_window = micro_window
+        self.base_amount = base_amount
+        self.base_lt_quote = base_lt_quote
+        self.eth_is0 = eth_is0
+        self.ovl_lt_eth = ovl_lt_eth
+        self._fetched: tp.Dict[int, tp.Tuple[int, int, int, int]] = {}
+
+    def consult(self, now: int) -> int:
+        """
+        `OracleLibraryV2.consult` of the market feed over the macro window,
+        rounded to negative infinity.
+        """
+        ticks, _ = observe(
+            self.market_obs, self.market_shims, now, [self.macro_window, 0])
+        delta = ticks[1] - ticks[0]
+        tick = _tick(delta, self.macro_window)
+        return tick - 1 if delta < 0 and delta % self.macro_window else tick
+
+    def fetch(self, now: int) -> tp.Tuple[int, int, int, int]:
+        """
+        Micro and macro ticks, market liquidity in ETH terms and the OVL
+        price in ETH at block time `now`.
+        """
+        if now in self._fetched:
+            return self._fetched[now]
+
+        ticks, liqs = observe(
+            self.market_obs,
+            self.market_shims,
+            now,
+            [0, self.micro_window, self.macro_window]
+        )
+
+        macro_tick = _tick(ticks[0] - ticks[2], self.macro_window)
+        micro_tick = _tick(ticks[0] - ticks[1], self.micro_window)
+
+        sqrt_price = get_sqrt_ratio_at_tick(micro_tick)
+        liquidity = (self.micro_window << 128) // (liqs[0] - liqs[1])
+
+        market_liquidity = (liquidity << 96) // sqrt_price if self.eth_is0 \
+            else mul_div(liquidity, sqrt_price, X96)
+
+        ticks, _ = observe(
+            self.depth_obs, self.depth_shims, now, [0, self.macro_window])
+
+        ovl_price = quote_at_tick(
+            _tick(ticks[0] - ticks[1], self.macro_window),
+            ONE,
+            self.ovl_lt_eth
+        )
+
+        fetched = (micro_tick, macro_tick, market_liquidity, ovl_price)
+        self._fetched[now] = fetched
+
+        return fetched
+
+
+''' CHAIN '''
+
+
+class Chain:
+    """
+    Block clock shared by the simulated contracts, after brownie's `chain`.
+    """
+
+    def __init__(self, time: int):
+        self._time = time
+
+    def time(self) -> int:
+        return self._time
+
+    def sleep(self, seconds: int) -> None:
+        self._time += seconds
+
+    def mine(self, timedelta: int = None, timestamp: int = None) -> int:
+        if timestamp is not None:
+            self._time = timestamp
+        elif timedelta is not None:
+            self._time += timedelta
+        return self._time
+
+
+''' TOKEN '''
+
+
+class OverlayToken:
+    """
+    Python model of OVL balances, with the transfer-and-burn/mint calls the
+    collateral managers make.
+    """
+
+    def __init__(self):
+        self.balances: tp.Dict[tp.Any, int] = {}
+        self.total_supply = 0
+
+    def balance_of(self, account) -> int:
+        return self.balances.get(account, 0)
+
+    def snapshot(self) -> tp.Tuple[tp.Dict[tp.Any, int], int]:
+        return dict(self.balances), self.total_supply
+
+    def restore(self, snapshot: tp.Tuple[tp.Dict[tp.Any, int], int]) -> None:
+        balances, self.total_supply = snapshot
+        self.balances = dict(balances)
+
+    def mint(self, account, amount: int) -> None:
+        self.balances[account] = self.balance_of(account) + amount
+        self.total_supply += amount
+
+    def burn(self, account, amount: int) -> None:
+        balance = self.balance_of(account)
+        require(balance >= amount, "ERC20: burn amount exceeds balance")
+        self.balances[account] = balance - amount
+        self.total_supply -= amount
+
+    def transfer(self, sender, recipient, amount: int) -> None:
+        self.transfer_mint(sender, recipient, amount, 0)
+
+    def transfer_burn(self, sender, recipient, amount: int,
+                      burnt: int) -> None:
+        balance = self.balance_of(sender)
+        require(balance >= amount + burnt, "OVL:balance<amount+burnt")
+        self.balances[sender] = balance - amount - burnt
+        self.balances[recipient] = self.balance_of(recipient) + amount
+        self.total_supply -= burnt
+
+    # allowances are not modeled, so a transfer from is a transfer
+    transfer_from_burn = transfer_burn
+
+    def transfer_mint(self, sender, recipient, amount: int,
+                      minted: int) -> None:
+        balance = self.balance_of(sender)
+        require(balance >= amount, "ERC20: transfer amount exceeds balance")
+        self.balances[sender] = balance - amount
+        self.balances[recipient] = self.balance_of(recipient) + amount \
+            + minted
+        self.total_supply += minted
+
+
+class Mothership:
+    """
+    Python model of the `OverlayV1Mothership` parameters markets and
+    collateral managers read.
+    """
+
+    def __init__(
+        self,
+        ovl: OverlayToken = None,
+        fee: int = FEE,
+        fee_burn_rate: int = FEE_BURN_RATE,
+        margin_burn_rate: int = MARGIN_BURN_RATE,
+        fee_to='fees'
+    ):
+        self.ovl = OverlayToken() if ovl is None else ovl
+        self.fee = fee
+        self.fee_burn_rate = fee_burn_rate
+        self.margin_burn_rate = margin_burn_rate
+        self.fee_to = fee_to
+        self.markets: tp.Set['Market'] = set()
+
+    def initialize_market(self, market: 'Market') -> None:
+        require(market not in self.markets, "OVLV1:!!initialized")
+        self.markets.add(market)
+
+    def market_active(self, market: 'Market') -> bool:
+        return market in self.markets
+
+
+''' MARKET '''
+
+
+class Market:
+    """
+    Python model of Overlay V1 market accounting for pooled funds.
+
+    Required invariants:
+        nl + ns = const
+
+    FP evolution:
+        oil(t) = oil(t-1) - fp(t-1)
+        ois(t) = ois(t-1) + fp(t-1)
+        fp(t) = k * ( oil(t) - ois(t) )
+
+    With `zero_lambda_shim` the cap is the static cap whenever lambda is
+    zero, as for `OverlayV1UniswapV3MarketZeroLambdaShim` under test.
+    """
+
+    def __init__(
+        self,
+        chain: Chain,
+        mothership: Mothership,
+        feed: tp.Union[StaticFeed, UniswapV3Feed],
+        price_frame_cap: int = PRICE_FRAME_CAP,
+        k: int = K,
+        pbnj: int = PBNJ,
+        compounding_period: int = COMPOUNDING_PERIOD,
+        lmbda: int = LMBDA,
+        static_cap: int = STATIC_CAP,
+        brrrrd_expected: int = BRRRRD_EXPECTED,
+        brrrrd_window_macro: int = BRRRRD_WINDOW_MACRO,
+        brrrrd_window_micro: int = BRRRRD_WINDOW_MICRO,
+        impact_window: int = MICRO_WINDOW,
+        zero_lambda_shim: bool = True
+    ):
+        require(ONE <= price_frame_cap, "OVLV1:!priceFrame")
+
+        now = chain.time()
+
+        self.chain = chain
+        self.mothership = mothership
+        self.feed = feed
+
+        self.price_frame_cap = price_frame_cap
+        self.k = k
+        self.pbnj = pbnj
+        self.compounding_period = compounding_period
+        self.zero_lambda_shim = zero_lambda_shim
+
+        self.oi_long = 0  # total long open interest
+        self.oi_short = 0  # total short open interest
+        self.oi_long_shares = 0
+        self.oi_short_shares = 0
+
+        self.updated = now
+        self.compounded = now
+
+        self.comptroller = Comptroller(
+            now,
+            lmbda,
+            static_cap,
+            brrrrd_expected,
+            brrrrd_window_macro,
+            brrrrd_window_micro,
+            impact_window
+        )
+
+        # price points as (macro tick, micro tick, depth)
+        tick = feed.consult(now)
+        self.price_points: tp.List[tp.Tuple[int, int, int]] = [
+            (tick, tick, 0)]
+
+    def snapshot(self) -> tp.Tuple:
+        """
+        State a call may change, to `restore` when it reverts. Price points
+        are only ever appended, so their count is enough.
+        """
+        return (
+            self.oi_long,
+            self.oi_short,
+            self.oi_long_shares,
+            self.oi_short_shares,
+            self.updated,
+            self.compounded,
+            len(self.price_points),
+            self.comptroller.copy()
+        )
+
+    def restore(self, snapshot: tp.Tuple) -> None:
+        (self.oi_long, self.oi_short, self.oi_long_shares,
+         self.oi_short_shares, self.updated, self.compounded, price_points,
+         comptroller) = snapshot
+        del self.price_points[price_points:]
+        self.comptroller = comptroller.copy()
+
+    ''' price points '''
+
+    def tick_to_price(self, tick: int) -> int:
+        return quote_at_tick(
+            tick, self.feed.base_amount, self.feed.base_lt_quote)
+
+    def compute_depth(self, market_liquidity: int, ovl_price: int) -> int:
+        return div_down(
+            mul_up(market_liquidity * ONE // ovl_price, self.lmbda), TWO)
+
+    def fetch_price_point(self) -> tp.Tuple[int, int, int]:
+        micro_tick, macro_tick, market_liquidity, ovl_price = \
+            self.feed.fetch(self.chain.time())
+        return (
+            macro_tick,
+            micro_tick,
+            self.compute_depth(market_liquidity, ovl_price)
+        )
+
+    def read_price_point(
+        self,
+        price_point: tp.Union[int, tp.Tuple[int, int, int]]
+    ) -> tp.Tuple[int, int, int]:
+        """
+        Bid, ask and depth of a price point or price point index.
+        """
+        if isinstance(price_point, int):
+            price_point = self.price_points[price_point]
+
+        macro_tick, micro_tick, depth = price_point
+
+        macro_price = self.tick_to_price(macro_tick)
+        micro_price = self.tick_to_price(micro_tick)
+
+        ask = mul_up(max(macro_price, micro_price), pow_up(E, self.pbnj))
+        bid = mul_down(
+            min(macro_price, micro_price), pow_up(INVERSE_E, self.pbnj))
+
+        return bid, ask, depth
+
+    def price_point_current(self) -> tp.Tuple[int, int, int]:
+        if self.chain.time() != self.updated:
+            return self.read_price_point(self.fetch_price_point())
+        return self.read_price_point(len(self.price_points) - 1)
+
+    def depth(self) -> int:
+        return self.price_point_current()[2]
+
+    def price_frame(self, is_long: bool, price_point: int) -> int:
+        entry_bid, entry_ask, _ = self.read_price_point(price_point)
+        exit_bid, exit_ask, _ = self.price_point_current()
+
+        return min(div_down(exit_bid, entry_ask), self.price_frame_cap) \
+            if is_long else div_up(exit_ask, entry_bid)
+
+    ''' open interest '''
+
+    def epochs(self, now: int, compounded: int) -> tp.Tuple[int, int]:
+        compoundings = (now - compounded) // self.compounding_period
+        return compoundings, compounded + compoundings * \
+            self.compounding_period
+
+    def pay_funding(self, k: int, epochs: int) -> int:
+        self.oi_long, self.oi_short, funding_paid = compute_funding(
+            self.oi_long, self.oi_short, epochs, k)
+        return funding_paid
+
+    def add_oi(self, is_long: bool, oi: int, cap: int) -> None:
+        if is_long:
+            self.oi_long_shares += oi
+            require(self.oi_long + oi <= cap, "OVLV1:>cap")
+            self.oi_long += oi
+        else:
+            self.oi_short_shares += oi
+            require(self.oi_short + oi <= cap, "OVLV1:>cap")
+            self.oi_short += oi
+
+    def oi(self) -> tp.Tuple[int, int, int, int]:
+        """
+        Long and short open interest with funding paid up to now, and their
+        shares, without updating the market.
+        """
+        compoundings, _ = self.epochs(self.chain.time(), self.compounded)
+        oi_long, oi_short, _ = compute_funding(
+            self.oi_long, self.oi_short, compoundings, self.k)
+        return oi_long, oi_short, self.oi_long_shares, self.oi_short_shares
+
+    ''' comptroller '''
+
+    @property
+    def lmbda(self) -> int:
+        return self.comptroller.lmbda
+
+    @property
+    def static_cap(self) -> int:
+        return self.comptroller.static_cap
+
+    @property
+    def impact_rollers(self) -> Rollers:
+        return self.comptroller.impact_rollers
+
+    @property
+    def brrrrd_rollers(self) -> Rollers:
+        return self.comptroller.brrrrd_rollers
+
+    def brrrr(self, brrrr: int, anti_brrrr: int) -> None:
+        self.comptroller.brrrr(self.chain.time(), brrrr, anti_brrrr)
+
+    def get_brrrrd(self) -> tp.Tuple[int, int]:
+        return self.comptroller.get_brrrrd(self.chain.time())
+
+    def oi_cap(self) -> int:
+        if self.zero_lambda_shim and self.lmbda == 0:
+            return self.static_cap
+        return self.comptroller.oi_cap(self.chain.time(), self.depth())
+
+    def pressure(self, is_long: bool, oi: int, cap: int) -> int:
+        return self.comptroller.pressure(self.chain.time(), is_long, oi, cap)
+
+    def impact(self, is_long: bool, oi: int, cap: int) -> int:
+        """
+        Market impact of a build of `oi` on one side, without taking it.
+        """
+        return self.comptroller.impact(self.chain.time(), is_long, oi, cap)
+
+    def intake(self, is_long: bool, oi: int, cap: int) -> int:
+        """
+        Rolls the pressure of a build of `oi` into the impact rollers and
+        returns its market impact, registered as burnt.
+        """
+        return self.comptroller.intake(self.chain.time(), is_long, oi, cap)
+
+    ''' market '''
+
+    def update(self) -> int:
+        """
+        Fetches the price point of a new block and pays funding for the
+        compounding periods elapsed.
+
+        Output:
+          [int]: Open interest cap
+        """
+        now = self.chain.time()
+
+        if now != self.updated:
+            self.price_points.append(self.fetch_price_point())
+            self.updated = now
+
+        compoundings, t_compounding = self.epochs(now, self.compounded)
+
+        if compoundings > 0:
+            self.pay_funding(self.k, compoundings)
+            self.compounded = t_compounding
+
+        return self.oi_cap()
+
+    def enter_oi(
+        self,
+        is_long: bool,
+        collateral: int,
+        leverage: int
+    ) -> tp.Tuple[int, int, int, int, int, int]:
+        """
+        Adds open interest for a build of `collateral` at `leverage`.
+
+        Output:
+          [int]: Open interest after impact and fees
+          [int]: Collateral after impact and fees
+          [int]: Debt after impact and fees
+          [int]: Fee
+          [int]: Market impact
+          [int]: Index of the price point of the position
+        """
+        cap = self.update()
+
+        price_point_next = len(self.price_points) - 1
+
+        oi = collateral * leverage
+
+        impact = self.intake(is_long, oi, cap)
+
+        fee = mul_down(oi, self.mothership.fee)
+
+        require(collateral >= MIN_COLLAT + impact + fee, "OVLV1:collat<min")
+
+        collateral_adjusted = collateral - impact - fee
+        oi_adjusted = collateral_adjusted * leverage
+        debt_adjusted = oi_adjusted - collateral_adjusted
+
+        self.add_oi(is_long, oi_adjusted, cap)
+
+        return (
+            oi_adjusted,
+            collateral_adjusted,
+            debt_adjusted,
+            fee,
+            impact,
+            price_point_next
+        )
+
+    def exit_data(
+        self,
+        is_long: bool,
+        price_point: int
+    ) -> tp.Tuple[int, int, int]:
+        """
+        Updates the market and returns the open interest and shares of a
+        side with the price frame of a position entered at `price_point`.
+        """
+        self.update()
+
+        if is_long:
+            oi, oi_shares = self.oi_long, self.oi_long_shares
+        else:
+            oi, oi_shares = self.oi_short, self.oi_short_shares
+
+        return oi, oi_shares, self.price_frame(is_long, price_point)
+
+    def exit_oi(
+        self,
+        is_long: bool,
+        oi: int,
+        oi_shares: int,
+        brrrr: int,
+        anti_brrrr: int
+    ) -> None:
+        self.brrrr(brrrr, anti_brrrr)
+
+        if is_long:
+            self.oi_long = checked_sub(self.oi_long, oi)
+            self.oi_long_shares = checked_sub(self.oi_long_shares, oi_shares)
+        else:
+            self.oi_short = checked_sub(self.oi_short, oi)
+            self.oi_short_shares = checked_sub(self.oi_short_shares, oi_shares)
+
+    def position_info(
+        self,
+        is_long: bool,
+        price_entry: int
+    ) -> tp.Tuple[int, int, int]:
+        oi_long, oi_short, oi_long_shares, oi_short_shares = self.oi()
+
+        if is_long:
+            oi, oi_shares = oi_long, oi_long_shares
+        else:
+            oi, oi_shares = oi_short, oi_short_shares
+
+        return oi, oi_shares, self.price_frame(is_long, price_entry)
+
+
+''' COLLATERAL '''
+
+
+class Position:
+    """
+    Python model of Overlay position, `Position.Info` with the position
+    library's views.
+    """
+    __slots__ = ('market', 'is_long', 'leverage', 'price_point',
+                 'oi_shares', 'debt', 'cost')
+
+    def __init__(
+        self,
+        market: tp.Optional[Market],
+        is_long: bool,
+        leverage: int,
+        price_point: int,
+        oi_shares: int = 0,
+        debt: int = 0,
+        cost: int = 0
+    ):
+        self.market = market  # market of this position
+        self.is_long = is_long  # side of this position
+        self.leverage = leverage  # base leverage of this position
+        self.price_point = price_point  # index of the entry price point
+        self.oi_shares = oi_shares  # shares of the side's open interest
+        self.debt = debt  # total debt associated with this position
+        self.cost = cost  # total collateral initially locked
+
+    def initial_oi(self) -> int:
+        return self.cost + self.debt
+
+    def oi(self, total_oi: int, total_oi_shares: int) -> int:
+        return div_up(mul_down(self.oi_shares, total_oi), total_oi_shares)
+
+    def value(self, total_oi: int, total_oi_shares: int,
+              price_frame: int) -> int:
+        oi = self.oi(total_oi, total_oi_shares)
+
+        if self.is_long:  # oi * priceFrame - debt
+            value = mul_down(oi, price_frame)
+            return value - min(value, self.debt)
+
+        # oi * (2 - priceFrame) - debt
+        value = mul_down(oi, TWO)
+        return value - min(value, self.debt + mul_down(oi, price_frame))
+
+    def is_underwater(self, total_oi: int, total_oi_shares: int,
+                      price_frame: int) -> bool:
+        oi = self.oi(total_oi, total_oi_shares)
+
+        if self.is_long:
+            return mul_down(oi, price_frame) < self.debt
+        return mul_down(oi, price_frame) + self.debt < oi * 2
+
+    def notional(self, total_oi: int, total_oi_shares: int,
+                 price_frame: int) -> int:
+        return self.value(total_oi, total_oi_shares, price_frame) \
+            + self.debt
+
+    def open_leverage(self, total_oi: int, total_oi_shares: int,
+                      price_frame: int) -> int:
+        value = self.value(total_oi, total_oi_shares, price_frame)
+        if value == 0:
+            return UINT256_MAX
+        return div_down(
+            self.notional(total_oi, total_oi_shares, price_frame), value)
+
+    def open_margin(self, total_oi: int, total_oi_shares: int,
+                    price_frame: int) -> int:
+        notional = self.notional(total_oi, total_oi_shares, price_frame)
+        if notional == 0:
+            return 0
+        return div_down(
+            self.value(total_oi, total_oi_shares, price_frame), notional)
+
+    def is_liquidatable(self, total_oi: int, total_oi_shares: int,
+                        price_frame: int, margin_maintenance: int) -> bool:
+        return self.value(total_oi, total_oi_shares, price_frame) \
+            < mul_up(self.initial_oi(), margin_maintenance)
+
+    def liquidation_price(self, total_oi: int, total_oi_shares: int,
+                          price_entry: int, margin_maintenance: int) -> int:
+        oi_frame = div_down(
+            mul_up(self.initial_oi(), margin_maintenance) + self.debt,
+            self.oi(total_oi, total_oi_shares)
+        )
+
+        if self.is_long:
+            return mul_up(price_entry, oi_frame)
+        return mul_up(price_entry, sub(TWO, oi_frame))
+
+
+class MarketInfo(tp.NamedTuple):
+    margin_maintenance: int = MARGIN_MAINTENANCE
+    margin_reward_rate: int = MARGIN_REWARD_RATE
+    max_leverage: int = MAX_LEVERAGE
+
+
+class OVLCollateral:
+    """
+    Python model of `OverlayV1OVLCollateral`: positions as ERC1155 shares,
+    built and unwound on markets against OVL. Accounts are any hashable,
+    the collateral manager holds OVL as itself.
+
+    Positions and shares are held in the arrays of `Positions` and `Shares`,
+    read a position at a time through `position`.
+    """
+
+    def __init__(self, mothership: Mothership):
+        self.mothership = mothership
+        self.ovl = mothership.ovl
+
+        self.positions = Positions()
+        self.positions.append(None, False, 0, 0)
+        self.market_info: tp.Dict[Market, MarketInfo] = {}
+        self.current_block_positions: tp.Dict[
+            tp.Tuple[Market, bool, int], int] = {}
+
+        self.fees = 0
+        self.liquidations = 0
+
+        self.shares = Shares()
+
+    def set_market_info(
+        self,
+        market: Market,
+        margin_maintenance: int = MARGIN_MAINTENANCE,
+        margin_reward_rate: int = MARGIN_REWARD_RATE,
+        max_leverage: int = MAX_LEVERAGE
+    ) -> None:
+        self.market_info[market] = MarketInfo(
+            margin_maintenance, margin_reward_rate, max_leverage)
+
+    def position(self, position_id: int) -> Position:
+        return Position(*self.positions.info(position_id))
+
+    def balance_of(self, account, position_id: int) -> int:
+        return self.shares.balance_of(account, position_id)
+
+    def total_supply(self, position_id: int) -> int:
+        return self.shares.total_supply(position_id)
+
+    def safe_transfer_from(self, sender, recipient, position_id: int,
+                           shares: int) -> None:
+        """
+        `ERC1155.safeTransferFrom` of position shares by their holder.
+        """
+        self.shares.transfer(sender, recipient, position_id, shares)
+
+    def snapshot(self) -> tp.Tuple:
+        """
+        Copy of the positions, shares and accrued fees, to `restore` when
+        branching a simulation. Markets and OVL balances are not included.
+        """
+        return (
+            self.positions.snapshot(),
+            self.shares.snapshot(),
+            dict(self.current_block_positions),
+            self.fees,
+            self.liquidations
+        )
+
+    def restore(self, snapshot: tp.Tuple) -> None:
+        (positions, shares, current_block_positions, self.fees,
+         self.liquidations) = snapshot
+        self.positions.restore(positions)
+        self.shares.restore(shares)
+        self.current_block_positions = dict(current_block_positions)
+
+    def disburse(self) -> None:
+        fee_burn = mul_up(self.fees, self.mothership.fee_burn_rate)
+        fee_forward = self.fees - fee_burn
+
+        liquidation_burn = mul_up(
+            self.liquidations, self.mothership.margin_burn_rate)
+        liquidation_forward = self.liquidations - liquidation_burn
+
+        self.fees = 0
+        self.liquidations = 0
+
+        self.ovl.burn(self, fee_burn + liquidation_burn)
+        self.ovl.transfer(
+            self, self.mothership.fee_to, fee_forward + liquidation_forward)
+
+    @contextmanager
+    def _transaction(self, market: Market) -> tp.Iterator[None]:
+        """
+        Rolls `market` and OVL back if the call reverts, as the chain would.
+        Calls change this contract's own state last, once nothing else can
+        revert.
+        """
+        snapshot = market.snapshot(), self.ovl.snapshot()
+        try:
+            yield
+        except Revert:
+            market.restore(snapshot[0])
+            self.ovl.restore(snapshot[1])
+            raise
+
+    def current_block_position_id(
+        self,
+        market: Market,
+        is_long: bool,
+        leverage: int,
+        price_point_next: int
+    ) -> int:
+        key = (market, is_long, leverage)
+        position_id = self.current_block_positions.get(key, 0)
+
+        if self.positions['price_point'][position_id] < price_point_next:
+            position_id = self.positions.append(
+                market, is_long, leverage, price_point_next)
+            self.current_block_positions[key] = position_id
+
+        return position_id
+
+    def build(
+        self,
+        sender,
+        market: Market,
+        collateral: int,
+        leverage: int,
+        is_long: bool,
+        oi_minimum: int = 0
+    ) -> int:
+        """
+        Builds a position of `collateral` at `leverage` for `sender`.
+
+        Output:
+          [int]: Id of the position the shares are minted on
+        """
+        require(self.mothership.market_active(market), "OVLV1:!market")
+        info = self.market_info.get(market, MarketInfo(0, 0, 0))
+        require(leverage <= info.max_leverage, "OVLV1:lev>max")
+
+        with self._transaction(market):
+            (oi_adjusted,
+             collateral_adjusted,
+             debt_adjusted,
+             fee,
+             impact,
+             price_point_next) = market.enter_oi(is_long, collateral, leverage)
+
+            require(oi_adjusted >= oi_minimum, "OVLV1:oi<min")
+
+            self.ovl.transfer_from_burn(
+                sender, self, collateral_adjusted + fee, impact)
+
+        position_id = self.current_block_position_id(
+            market, is_long, leverage, price_point_next)
+
+        self.positions.add(position_id, oi_shares=oi_adjusted,
+                           debt=debt_adjusted, cost=collateral_adjusted)
+
+        self.fees += fee
+
+        self.shares.mint(sender, position_id, oi_adjusted)
+
+        return position_id
+
+    def unwind(self, sender, position_id: int, shares: int) -> None:
+        """
+        Unwinds `shares` of a position held by `sender`, paying out its
+        value net of fees and debt.
+        """
+        require(0 < shares <= self.balance_of(sender, position_id),
+                "OVLV1:!shares")
+
+        pos = self.position(position_id)
+
+        require(0 < pos.oi_shares, "OVLV1:liquidated")
+
+        with self._transaction(pos.market):
+            self._unwind(sender, position_id, pos, shares)
+
+    def _unwind(self, sender, position_id: int, pos: Position,
+                shares: int) -> None:
+        oi, oi_shares, price_frame = pos.market.exit_data(
+            pos.is_long, pos.price_point)
+
+        total_pos_shares = self.total_supply(position_id)
+
+        user_oi_shares = shares
+        user_notional = shares * pos.notional(oi, oi_shares, price_frame) \
+            // total_pos_shares
+        user_debt = shares * pos.debt // total_pos_shares
+        user_cost = shares * pos.cost // total_pos_shares
+        user_oi = shares * pos.oi(oi, oi_shares) // total_pos_shares
+
+        fee = mul_up(user_notional, self.mothership.fee)
+
+        user_value_adjusted = checked_sub(user_notional, fee)
+        user_value_adjusted = user_value_adjusted - user_debt \
+            if user_value_adjusted > user_debt else 0
+
+        if user_cost < user_value_adjusted:
+            self.ovl.transfer_mint(
+                self, sender, user_cost, user_value_adjusted - user_cost)
+        else:
+            self.ovl.transfer_burn(
+                self, sender, user_value_adjusted,
+                user_cost - user_value_adjusted)
+
+        pos.market.exit_oi(
+            pos.is_long,
+            user_oi,
+            user_oi_shares,
+            max(user_value_adjusted - user_cost, 0),
+            max(user_cost - user_value_adjusted, 0)
+        )
+
+        self.positions.sub(position_id, oi_shares=user_oi_shares,
+                           debt=user_debt, cost=user_cost)
+
+        self.fees += fee
+
+        self.shares.burn(sender, position_id, shares)
+
+    def liquidate(self, position_id: int, rewards_to) -> None:
+        """
+        Liquidates a position below maintenance margin, rewarding
+        `rewards_to` with part of its remaining value.
+        """
+        pos = self.position(position_id)
+
+        require(0 < pos.oi_shares, "OVLV1:liquidated")
+
+        with self._transaction(pos.market):
+            self._liquidate(position_id, pos, rewards_to)
+
+    def _liquidate(self, position_id: int, pos: Position,
+                   rewards_to) -> None:
+        oi, oi_shares, price_frame = pos.market.exit_data(
+            pos.is_long, pos.price_point)
+
+        info = self.market_info.get(pos.market, MarketInfo(0, 0, 0))
+
+        require(pos.is_liquidatable(
+            oi, oi_shares, price_frame, info.margin_maintenance
+        ), "OVLV1:!liquidatable")
+
+        value = pos.value(oi, oi_shares, price_frame)
+
+        pos.market.exit_oi(
+            pos.is_long,
+            pos.oi(oi, oi_shares),
+            pos.oi_shares,
+            0,
+            checked_sub(pos.cost, value)
+        )
+
+        reward = mul_up(value, info.margin_reward_rate)
+
+        self.ovl.transfer_burn(
+            self, rewards_to, reward, checked_sub(pos.cost, value))
+
+        self.positions.sub(position_id, oi_shares=pos.oi_shares,
+                           debt=pos.debt)
+
+        self.liquidations += value - reward
+
+    def value(self, position_id: int) -> int:
+        pos = self.position(position_id)
+        oi, oi_shares, price_frame = pos.market.position_info(
+            pos.is_long, pos.price_point)
+        return pos.value(oi, oi_shares, price_frame)
+
+    def liquidatable(self, market: Market) -> Liquidations:
+        """
+        Positions on `market` that `liquidate` would take at the current
+        block, found in one vectorized scan.
+        """
+        ids = self.positions.of(market)
+        price_points = self.positions['price_point'][ids]
+
+        bids = [0] * len(market.price_points)
+        asks = [0] * len(market.price_points)
+        for price_point in np.unique(price_points).tolist():
+            bids[price_point], asks[price_point], _ = \
+                market.read_price_point(price_point)
+
+        exit_bid, exit_ask, _ = market.price_point_current()
+        oi_long, oi_short, oi_long_shares, oi_short_shares = market.oi()
+        info = self.market_info.get(market, MarketInfo(0, 0, 0))
+
+        found = scan(
+            self.positions['is_long'][ids],
+            price_points,
+            self.positions['oi_shares'][ids],
+            self.positions['debt'][ids],
+            self.positions['cost'][ids],
+            bids,
+            asks,
+            exit_bid,
+            exit_ask,
+            (oi_long, oi_short),
+            (oi_long_shares, oi_short_shares),
+            info.margin_maintenance,
+            info.margin_reward_rate,
+            market.price_frame_cap
+        )
+
+        return found._replace(ids=ids[found.ids])
+
+
+def deploy(
+    chain: Chain,
+    feed: tp.Union[StaticFeed, UniswapV3Feed],
+    **market_params
+) -> tp.Tuple[Mothership, Market, OVLCollateral]:
+    """
+    Sets up a mothership, market and OVL collateral manager the way the
+    market tests' `create_mothership` fixture does.
+    """
+    mothership = Mothership()
+    market = Market(chain, mothership, feed, **market_params)
+    mothership.initialize_market(market)
+
+    collateral = OVLCollateral(mothership)
+    collateral.set_market_info(market)
+
+    return mothership, market, collateral
@@ -0,0 +1,310 @@
+"""
+Storage access profiling: SLOADs and SSTOREs of transactions attributed to
+the functions making them and the state variables they touch.
+
+Storage layouts come from compiling the project's sources again with
+`storageLayout` selected, which brownie's public compile path leaves out.
+That goes through brownie internals: the project's `_compiler_config`,
+`_sources` and `_path`, and `generate_input_json` and
+`compile_from_input_json` of `brownie.project.compiler`. They are those of
+the eth-brownie release pinned in requirements.txt, and need checking
+against any other before the pin moves.
+"""
+import os
+import sys
+import bisect
+import typing as tp
+from eth_utils import keccak
+from hexbytes import HexBytes
+from brownie import chain, project as projects
+from brownie.project import compiler
+
+
+''' PROFILE PARAMETERS '''
+HASH_OPS = ('SHA3', 'KECCAK256')
+STORAGE_OPS = ('SLOAD', 'SSTORE')
+HASHED_ENCODINGS = ('dynamic_array', 'bytes')  # data at keccak(slot) + i
+SLOT_SPAN = 1 << 32  # furthest a slot is from the hashed base it belongs to
+MAX_NESTING = 8  # hashed bases resolved through, e.g. mapping of arrays
+COUNTS = ('sload_cold', 'sload_warm', 'sstore_cold', 'sstore_warm')
+TOTAL = '(all)'  # pseudo function summing the profile over functions
+
+# storage layouts by contract name, compiled once per session
+_layouts = {}
+
+
+class Access(tp.NamedTuple):
+    fn: str        # innermost function accessing the slot
+    contract: str  # contract whose storage is accessed
+    variable: str  # state variable the slot belongs to
+    op: str        # SLOAD or SSTORE
+    cold: bool     # first access of the slot in the transaction
+    gas: int
+
+
+class Layout:
+    '''
+    Slots of the state variables of a contract, from its solc storage
+    layout. Variables packed into one slot share it, labelled together.
+    '''
+
+    def __init__(self, layout):
+        types = layout.get('types') or {}
+        self.slots = {}
+        self.hashed = {}
+
+        for var in layout['storage']:
+            slot, info = int(var['slot']), types[var['type']]
+            size = -(-int(info['numberOfBytes']) // 32)
+
+            for s in range(slot, slot + max(size, 1)):
+                label = self.slots.get(s)
+                self.slots[s] = var['label'] if label is None \
+                    or label == var['label'] \
+                    else '{}/{}'.format(label, var['label'])
+
+            # the base of arrays the optimizer may hash at compile time
+            if info['encoding'] in HASHED_ENCODINGS:
+                base = int.from_bytes(keccak(slot.to_bytes(32, 'big')), 'big')
+                self.hashed[base] = slot.to_bytes(32, 'big')
+
+
+def storage_layouts(names, project=None):
+    '''
+    Compiles the sources of contracts `names` for their storage layouts.
+
+    Brownie leaves `storageLayout` out of the output it selects from solc,
+    whatever brownie-config.yaml asks for, so the sources are compiled again
+    here with the project's compiler settings and the selection from its
+    config, adding `storageLayout` if it is missing.
+
+    Inputs:
+      names   [list]:     Names of the project's contracts
+      project [Project]:  Project the contracts are in, the loaded one if
+                          none
+
+    Output:
+      [dict]: Storage layouts by contract name, of `names` and of every
+              contract they inherit or import
+    '''
+    names = [n for n in names if n not in _layouts]
+    if not names:
+        return _layouts
+
+    project = project or projects.get_loaded_projects()[0]
+    config = project._compiler_config
+    solc = config['solc']
+
+    sources = {}
+    for name in names:
+        path = project._sources.get_source_path(name)
+        sources[path] = project._sources.get(path)
+
+    compiler.set_solc_version(solc['version'])
+    input_json = compiler.generate_input_json(
+        sources,
+        evm_version=config['evm_version'],
+        remappings=solc.get('remappings'),
+        optimizer=solc.get('optimizer'),
+    )
+
+    selection = input_json['settings']['outputSelection']
+    requested = solc.get('outputSelection') or {'*': {'*': []}}
+    for files, contracts in requested.items():
+        for contract, outputs in contracts.items():
+            selected = selection.setdefault(files, {}).setdefault(contract, [])
+            selected.extend(
+                o for o in list(outputs) + ['storageLayout']
+                if o not in selected)
+
+    cwd = os.getcwd()
+    os.chdir(project._path)
+    try:
+        output = compiler.compile_from_input_json(
+            input_json, silent=True, allow_paths=project._path.as_posix())
+    finally:
+        os.chdir(cwd)
+
+    for contracts in output['contracts'].values():
+        for name, data in contracts.items():
+            if 'storageLayout' in data:
+                _layouts[name] = data['storageLayout']
+
+    return _layouts
+
+
+def preimages(trace):
+    '''
+    Inputs hashed by a transaction, by their hash, from the KECCAK256 steps
+    of its trace: mapping keys with the slot of their mapping, and the slots
+    of dynamic arrays.
+    '''
+    hashed = {}
+
+    for i, step in enumerate(trace[:-1]):
+        if step['op'] not in HASH_OPS:
+            continue
+
+        stack = step['stack']
+        offset, length = int(stack[-1], 16), int(stack[-2], 16)
+        memory = HexBytes(''.join(step['memory']))
+
+        result = int(trace[i + 1]['stack'][-1], 16)
+        hashed[result] = bytes(memory[offset:offset + length])
+
+    return hashed
+
+
+def variable(layout, hashed, bases, slot):
+    '''
+    Label of the state variable `slot` belongs to.
+
+    Slots outside the static layout are followed back through the hashes
+    they were derived from: the nearest hash below a slot is the base it is
+    offset from, whose preimage is the slot of a dynamic array, or a key
+    followed by the slot of a mapping. Slots with no known derivation are
+    labelled by their hex value.
+
+    Inputs:
+      layout [Layout]:  Storage layout of the contract accessed
+      hashed [dict]:    Preimages by hash, from `preimages` and the layout
+      bases  [list]:    Hashes of `hashed`, sorted
+      slot   [int]:     Storage slot accessed
+
+    Output:
+      [str]: Label of the variable
+    '''
+    key = slot
+
+    for _ in range(MAX_NESTING):
+        if key in layout.slots:
+            return layout.slots[key]
+
+        i = bisect.bisect_right(bases, key) - 1
+        if i < 0 or key - bases[i] >= SLOT_SPAN:
+            break
+
+        preimage = hashed[bases[i]]
+        if len(preimage) not in (32, 64):
+            break
+
+        key = int.from_bytes(preimage[-32:], 'big')
+
+    return hex(slot)
+
+
+def accesses(tx, layouts=None):
+    '''
+    Storage accesses of a transaction, attributed to the function making
+    them and to the state variable accessed.
+
+    A slot is cold the first time a transaction reads or writes it and warm
+    after, whichever contract is running, as EIP-2929 prices them from
+    Berlin on. Gas is that of the SLOAD or SSTORE step, surcharge for a
+    cold slot included; chains before Berlin charge both temperatures alike.
+
+    Inputs:
+      tx      [TransactionReceipt]:  Confirmed transaction
+      layouts [dict]:                Storage layouts by contract name, those
+                                     of the contracts in the trace compiled
+                                     if none
+
+    Output:
+      [list]: Accesses, in the order the transaction made them
+    '''
+    trace = tx.trace
+
+    if layouts is None:
+        names = {s['contractName'] for s in trace if s['contractName']}
+        layouts = storage_layouts(sorted(n for n in names if n in
+                                         projects.get_loaded_projects()[0]))
+
+    parsed = {name: Layout(layout) for name, layout in layouts.items()}
+    hashed = preimages(trace)
+    for layout in parsed.values():
+        hashed.update(layout.hashed)
+    bases = sorted(hashed)
+
+    touched = set()
+    result = []
+
+    for step in trace:
+        if step['op'] not in STORAGE_OPS:
+            continue
+
+        slot = int(step['stack'][-1], 16)
+        contract = step['contractName']
+        layout = parsed.get(contract)
+        label = hex(slot) if layout is None \
+            else variable(layout, hashed, bases, slot)
+
+        key = (step['address'], slot)
+        cold = key not in touched
+        touched.add(key)
+
+        result.append(Access(step['fn'], contract, label, step['op'], cold,
+                             step['gasCost']))
+
+    return result
+
+
+def profile(accesses):
+    '''
+    Storage accesses counted and their gas summed by variable by function,
+    and over all functions under `TOTAL`.
+
+    Inputs:
+      accesses [list]:  Accesses, of one or more transactions
+
+    Output:
+      [dict]: Cold and warm SLOAD and SSTORE counts, and gas, by variable by
+              function
+    '''
+    result = {}
+
+    for access in accesses:
+        count = '{}_{}'.format(access.op.lower(),
+                               'cold' if access.cold else 'warm')
+        for fn in (access.fn, TOTAL):
+            row = result.setdefault(fn, {}).setdefault(
+                access.variable, dict({c: 0 for c in COUNTS}, gas=0))
+            row[count] += 1
+            row['gas'] += access.gas
+
+    return result
+
+
+def format_profile(profile):
+    '''
+    Table of a storage profile, functions and their variables in descending
+    order of gas.
+    '''
+    def gas(rows):
+        return sum(row['gas'] for row in rows.values())
+
+    row_format = '  {:<28}{:>12}{:>12}{:>13}{:>13}{:>9}'
+    header = row_format.format('variable', *COUNTS, 'gas')
+    lines = []
+
+    for fn, rows in sorted(profile.items(), key=lambda p: -gas(p[1])):
+        lines.extend(['{}  {} gas'.format(fn, gas(rows)), header])
+        for label, row in sorted(rows.items(), key=lambda r: -r[1]['gas']):
+            lines.append(row_format.format(
+                label, *(row[c] for c in COUNTS), row['gas']))
+
+    return '\n'.join(lines)
+
+
+def main(*txids):
+    '''
+    Prints the storage profile of transactions on the connected chain, by
+    hash.
+    '''
+    if not txids:
+        sys.exit('usage: brownie run scripts/storage.py main <txid> ...')
+
+    result = []
+    for txid in txids:
+        result.extend(accesses(chain.get_transaction(txid)))
+
+    print(format_profile(profile(result)))
@@ -0,0 +1,395 @@
+import os
+import csv
+import time
+import itertools
+import numpy as np
+import multiprocessing
+from functools import lru_cache
+from scripts.feeds import load_feed
+from scripts.fixed_point import Revert
+from scripts.simulation import \
+    Chain, \
+    Market, \
+    Mothership, \
+    OVLCollateral, \
+    UniswapV3Feed
+
+
+''' MARKET PARAMETERS '''
+# risk parameters of `scripts/deploy.py`, the point every sweep varies from
+DEFAULTS = {
+    'K': 343454218783234,
+    'PRICE_FRAME_CAP': 5 * 10 ** 18,
+    'SPREAD': 573 * 10 ** 13,
+    'COMPOUND_PERIOD': 600,
+    'IMPACT_WINDOW': 600,
+    'LAMBDA': 6 * 10 ** 17,
+    'STATIC_CAP': 370400 * 10 ** 18,
+    'BRRRR_EXPECTED': 26320 * 10 ** 18,
+    'BRRRR_WINDOW_MACRO': 2592000,
+    'BRRRR_WINDOW_MICRO': 86400,
+    'MARGIN_MAINTENANCE': 6 * 10 ** 16,
+    'MARGIN_REWARD_RATE': 5 * 10 ** 17,
+    'MAX_LEVERAGE': 100,
+    'FEE': 15 * 10 ** 14,
+    'FEE_BURN_RATE': 5 * 10 ** 17,
+    'MARGIN_BURN_RATE': 5 * 10 ** 17
+}
+
+''' FEEDS '''
+# market feed and OVL/ETH depth feed of each swept market
+FEEDS = {
+    'dai_weth': ('../feeds/univ3_dai_weth', '../feeds/univ3_axs_weth'),
+    'axs_weth': ('../feeds/univ3_axs_weth', '../feeds/univ3_axs_weth')
+}
+
+''' TRADER PARAMETERS '''
+TOKEN_TOTAL_SUPPLY = 8000000 * 10 ** 18
+STEP = 60  # seconds between blocks of the scenario
+BUILDS_PER_STEP = .5  # mean of the Poisson number of builds per block
+COLLATERAL_MEDIAN = 1000  # OVL, log normally distributed
+COLLATERAL_SIGMA = 1.
+HOLD_MEAN = 4 * 3600  # seconds, exponentially distributed
+SEED = 0
+
+''' RESULT TABLE '''
+COLUMNS = [
+    'point', 'feed', 'builds', 'rejected', 'unwinds', 'liquidations',
+    'inflation', 'brrrrd_max', 'utilization_mean', 'utilization_max',
+    'seconds'
+]
+
+
+def grid(**axes):
+    '''
+    Every combination of the values given for each parameter, the others
+    at their defaults.
+
+    Output:
+      [list]: Parameter dicts, one per sample point
+    '''
+    names = list(axes)
+    return [
+        dict(DEFAULTS, **dict(zip(names, values)))
+        for values in itertools.product(*(axes[name] for name in names))
+    ]
+
+
+def random_points(n, seed=SEED, **ranges):
+    '''
+    `n` points drawn uniformly from `(low, high)` ranges of each parameter,
+    the others at their defaults.
+    '''
+    rng = np.random.default_rng(seed)
+    return [
+        dict(DEFAULTS, **{
+            name: int(rng.uniform(low, high))
+            for name, (low, high) in ranges.items()
+        })
+        for _ in range(n)
+    ]
+
+
+@lru_cache(maxsize=None)
+def feed_info(path):
+    '''
+    Framed and reflected feed at `path` relative to this directory, loaded
+    once per worker.
+    '''
+    base = os.path.dirname(os.path.abspath(__file__))
+    return load_feed(os.path.normpath(os.path.join(base, path)))
+
+
+def deploy(chain, feed, params):
+    '''
+    Offline mothership, market and OVL collateral manager set up with
+    `params`, as `scripts/deploy.py` sets them on chain.
+    '''
+    mothership = Mothership(
+        fee=params['FEE'],
+        fee_burn_rate=params['FEE_BURN_RATE'],
+        margin_burn_rate=params['MARGIN_BURN_RATE']
+    )
+
+    market = Market(
+        chain,
+        mothership,
+        feed,
+        price_frame_cap=params['PRICE_FRAME_CAP'],
+        k=params['K'],
+        pbnj=params['SPREAD'],
+        compounding_period=params['COMPOUND_PERIOD'],
+        lmbda=params['LAMBDA'],
+        static_cap=params['STATIC_CAP'],
+        brrrrd_expected=params['BRRRR_EXPECTED'],
+        brrrrd_window_macro=params['BRRRR_WINDOW_MACRO'],
+        brrrrd_window_micro=params['BRRRR_WINDOW_MICRO'],
+        impact_window=params['IMPACT_WINDOW'],
+        zero_lambda_shim=False
+    )
+    mothership.initialize_market(market)
+
+    collateral = OVLCollateral(mothership)
+    collateral.set_market_info(
+        market,
+        params['MARGIN_MAINTENANCE'],
+        params['MARGIN_REWARD_RATE'],
+        params['MAX_LEVERAGE']
+    )
+
+    return mothership, market, collateral
+
+
+def trade(params, market_info, depth_info, start, end, seed=SEED,
+          step=STEP):
+    '''
+    Trades a market set up with `params` over market and depth feeds from
+    `start` to `end`.
+
+    A trader builds positions of random size, side and leverage, holding
+    each for a random time, and a keeper liquidates every position it
+    can after each block. The trades drawn depend only on `seed`, so all
+    points of a sweep see the same order flow.
+
+    Inflation is the net OVL minted over the run. The fee pot is left
+    undisbursed: the collateral manager burns unwind fees with the losses
+    it burns, so the pot can exceed what it holds.
+
+    Inputs:
+      params      [dict]:   Market parameters, keyed as in `DEFAULTS`
+      market_info [tuple]:  Market feed observations and shims
+      depth_info  [tuple]:  OVL/ETH feed observations and shims
+      start       [int]:    Time the market is deployed at
+      end         [int]:    Time every position left is unwound at
+      seed        [int]:    Order flow seed
+      step        [int]:    Seconds between blocks
+
+    Output:
+      [dict]: Result row, keyed as in `COLUMNS` but for `point` and `feed`
+    '''
+    began = time.time()
+
+    chain = Chain(start)
+    feed = UniswapV3Feed(market_info, depth_info)
+    mothership, market, collateral = deploy(chain, feed, params)
+    ovl = mothership.ovl
+
+    ovl.mint('trader', TOKEN_TOTAL_SUPPLY)
+    supply = ovl.total_supply
+
+    rng = np.random.default_rng(seed)
+    max_leverage = params['MAX_LEVERAGE']
+    margin_maintenance = params['MARGIN_MAINTENANCE']
+
+    lots = []  # open (position id, shares, time due)
+    builds = rejected = unwinds = liquidations = 0
+    utilizations = []
+    brrrrds = []  # net OVL minted over the brrrrd window
+
+    for now in range(start + step, end + 1, step):
+        chain.mine(timestamp=now)
+
+        for _ in range(rng.poisson(BUILDS_PER_STEP)):
+            amount = int(COLLATERAL_MEDIAN * np.exp(
+                rng.normal(0, COLLATERAL_SIGMA)) * 10 ** 18)
+            leverage = int(np.exp(rng.uniform(0, np.log(max_leverage + 1))))
+            is_long = bool(rng.random() < .5)
+            due = now + int(rng.exponential(HOLD_MEAN))
+
+            builds += 1
+            try:
+                pid = collateral.build(
+                    'trader', market, amount, min(leverage, max_leverage),
+                    is_long)
+            except Revert:
+                rejected += 1
+                continue
+
+            # builds of a block on the same side and leverage share an id
+            shares = collateral.balance_of('trader', pid) \
+                - sum(lot[1] for lot in lots if lot[0] == pid)
+            lots.append((pid, shares, due))
+
+        open_lots = []
+        for pid, shares, due in lots:
+            pos = collateral.position(pid)
+            if pos.oi_shares == 0:
+                continue
+            if due <= now or now + step > end:
+                collateral.unwind('trader', pid, shares)
+                unwinds += 1
+                continue
+            oi, oi_shares, price_frame = market.position_info(
+                pos.is_long, pos.price_point)
+            if pos.is_liquidatable(oi, oi_shares, price_frame,
+                                   margin_maintenance):
+                collateral.liquidate(pid, 'keeper')
+                liquidations += 1
+                continue
+            open_lots.append((pid, shares, due))
+        lots = open_lots
+
+        oi_long, oi_short, _, _ = market.oi()
+        try:
+            cap = market.oi_cap()
+            brrrrd, anti_brrrrd = market.get_brrrrd()
+        except Revert:
+            continue
+        brrrrds.append(brrrrd - anti_brrrrd)
+        utilizations.append(max(oi_long, oi_short) / cap if cap else 1.)
+
+    return {
+        'builds': builds,
+        'rejected': rejected,
+        'unwinds': unwinds,
+        'liquidations': liquidations,
+        'inflation': (ovl.total_supply - supply) / supply,
+        'brrrrd_max': max(brrrrds, default=0) / 10 ** 18,
+        'utilization_mean': float(np.mean(utilizations))
+        if utilizations else 0.,
+        'utilization_max': max(utilizations, default=0.),
+        'seconds': time.time() - began
+    }
+
+
+def run_point(params, feed_name, seed=SEED, step=STEP, horizon=None):
+    '''
+    Trades a market set up with `params` over a reflected feed, see
+    `trade`.
+
+    Inputs:
+      params    [dict]:  Market parameters, keyed as in `DEFAULTS`
+      feed_name [str]:   One of `FEEDS`
+      seed      [int]:   Order flow seed
+      step      [int]:   Seconds between blocks
+      horizon   [int]:   Seconds to trade for, defaults to the whole feed
+
+    Output:
+      [dict]: Result row, keyed as in `COLUMNS`
+    '''
+    market_path, depth_path = FEEDS[feed_name]
+    market_info, depth_info = feed_info(market_path), feed_info(depth_path)
+    timestamps = market_info[2]['timestamp']
+
+    start = timestamps[0]
+    end = timestamps[-1] if horizon is None \
+        else min(timestamps[-1], start + horizon)
+
+    row = trade(params, market_info, depth_info, start, end, seed, step)
+    row.update(point=None, feed=feed_name)
+
+    return row
+
+
+def sweep_worker(job):
+    point, params, feed_name, seed, step, horizon = job
+    row = run_point(params, feed_name, seed, step, horizon)
+    row['point'] = point
+    return row
+
+
+def sweep(
+    points,
+    feeds=tuple(FEEDS),
+    workers=None,
+    seed=SEED,
+    step=STEP,
+    horizon=None
+):
+    '''
+    Runs every sample point on every feed over a process pool.
+
+    Inputs:
+      points  [list]:  Parameter dicts, e.g. from `grid` or `random_points`
+      feeds   [list]:  Names of the feeds to trade, see `FEEDS`
+      workers [int]:   Pool size, defaults to the CPU count
+      seed    [int]:   Order flow seed shared by all points
+      step    [int]:   Seconds between blocks
+      horizon [int]:   Seconds to trade for, defaults to the whole feed
+
+    Output:
+      [list]: Result rows in point then feed order, keyed as in `COLUMNS`
+              followed by the parameters of the point
+    '''
+    jobs = [
+        (i, params, feed_name, seed, step, horizon)
+        for i, params in enumerate(points)
+        for feed_name in feeds
+    ]
+    workers = min(workers or os.cpu_count(), len(jobs)) or 1
+
+    context = multiprocessing.get_context('spawn')
+
+    rows = []
+    with context.Pool(workers) as pool:
+        for i, row in enumerate(pool.imap_unordered(sweep_worker, jobs)):
+            rows.append(row)
+            print("[{}/{}] point {} {} {:.2f}s".format(
+                i + 1, len(jobs), row['point'], row['feed'], row['seconds']))
+
+    rows.sort(key=lambda row: (row['point'], feeds.index(row['feed'])))
+    for row in rows:
+        row.update(points[row['point']])
+
+    return rows
+
+
+def write_table(path, rows):
+    '''
+    Writes result rows as CSV, the swept parameters after the results.
+    '''
+    names = COLUMNS + [name for name in DEFAULTS if name in rows[0]]
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, names, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_table(rows, swept):
+    '''
+    Compact text table of the results and the `swept` parameters.
+    '''
+    names = COLUMNS[:-1] + list(swept)
+    cells = [names] + [
+        ['{:.4g}'.format(row[name]) if isinstance(row[name], float)
+         else str(row[name]) for name in names]
+        for row in rows
+    ]
+    widths = [max(len(line[i]) for line in cells) for i in range(len(names))]
+    return '\n'.join(
+        '  '.join(cell.rjust(width) for cell, width in zip(line, widths))
+        for line in cells
+    )
+
+
+def parse_axis(axis):
+    '''
+    `NAME=v1,v2,...` grid values or `NAME=low:high` sampling range from a
+    `brownie run` string argument, values in scientific notation allowed.
+    '''
+    name, values = axis.split('=', 1)
+    if name not in DEFAULTS:
+        raise ValueError('sweep: unknown parameter {}'.format(name))
+    if ':' in values:
+        return name, tuple(int(float(v)) for v in values.split(':', 1))
+    return name, [int(float(v)) for v in values.split(',')]
+
+
+def main(samples=0, out='sweep.csv', *axes):
+    '''
+    Sweeps the grid of `axes`, or `samples` random points over their
+    ranges when `samples` is positive, e.g.
+
+        brownie run sweep main 0 sweep.csv LAMBDA=.3e18,.6e18,1e18
+        brownie run sweep main 64 sweep.csv LAMBDA=.1e18:2e18 K=1e14:1e15
+    '''
+    axes = dict(parse_axis(axis) for axis in axes)
+
+    points = random_points(int(samples), **axes) if int(samples) > 0 \
+        else grid(**axes)
+
+    rows = sweep(points)
+
+    write_table(out, rows)
+
+    print(format_table(rows, axes))
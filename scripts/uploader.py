@@ -0,0 +1,154 @@
+from brownie import chain
+from brownie.exceptions import VirtualMachineError
+
+
+''' UPLOAD PARAMETERS '''
+GAS_MARGIN = .8  # share of the block gas limit a chunk may use
+GAS_BUFFER = 1.2  # gas limit of a chunk over its estimate
+PROBE_SIZE = 16  # observations in the chunk measuring gas per observation
+MAX_CHUNK = 1000  # observations per chunk whatever the gas limit
+PIPELINE_DEPTH = 4  # chunks submitted ahead of the oldest unconfirmed one
+RETRIES = 3  # resumptions from `cardinality` after a failed chunk
+MAX_CARDINALITY = 65535  # observations a `UniswapV3OracleMock` can hold
+
+
+def measure_gas(mock, observations, shims, sender):
+    '''
+    Measures the gas of `loadObservations` as a fixed cost plus a cost per
+    observation, from estimates of a one observation and a `PROBE_SIZE`
+    observation chunk of the feed.
+
+    Inputs:
+      mock         [Contract]:  UniswapV3OracleMock contract instance
+      observations [list]:      Observations yet to be loaded
+      shims        [list]:      Shims yet to be loaded
+      sender       [Account]:   Account loading the observations
+
+    Outputs:
+      [int]: Fixed gas per `loadObservations` transaction
+      [int]: Gas per observation
+    '''
+    probe = min(PROBE_SIZE, len(observations))
+
+    one = mock.loadObservations.estimate_gas(
+        observations[:1], shims[:1], {'from': sender})
+
+    if probe < 2:
+        return 0, one
+
+    many = mock.loadObservations.estimate_gas(
+        observations[:probe], shims[:probe], {'from': sender})
+
+    per_observation = -(-(many - one) // (probe - 1))
+
+    return max(one - per_observation, 0), per_observation
+
+
+def chunk_size(fixed_gas, observation_gas, gas_limit, margin=GAS_MARGIN):
+    '''
+    Observations per `loadObservations` chunk that fit in `margin` of the
+    block gas limit, buffered by `GAS_BUFFER` and capped at `MAX_CHUNK`.
+    '''
+    budget = int(gas_limit * margin / GAS_BUFFER) - fixed_gas
+    return max(min(budget // max(observation_gas, 1), MAX_CHUNK), 1)
+
+
+def loaded(mock, observations):
+    '''
+    Observations already loaded into `mock`, checked against the feed
+    being loaded.
+    '''
+    cardinality = mock.cardinality()
+
+    if cardinality > len(observations):
+        raise ValueError('load_observations: mock holds a longer feed')
+
+    if cardinality > 0:
+        last = mock.observations(cardinality - 1)
+        if last[0] != observations[cardinality - 1][0]:
+            raise ValueError(
+                'load_observations: mock holds a different feed at {}'.format(
+                    cardinality - 1))
+
+    return cardinality
+
+
+def _submit(mock, observations, shims, sender, size, gas, start):
+    '''
+    Submits `loadObservations` chunks from `start` on, keeping up to
+    `PIPELINE_DEPTH` unconfirmed at once, until the feed is submitted or a
+    chunk fails.
+    '''
+    pending = []
+
+    for i in range(start, len(observations), size):
+
+        tx = mock.loadObservations(
+            observations[i:i + size],
+            shims[i:i + size],
+            {'from': sender, 'gas_limit': gas, 'required_confs': 0}
+        )
+        pending.append(tx)
+
+        if len(pending) > PIPELINE_DEPTH:
+            tx = pending.pop(0)
+            tx.wait(1)
+            if tx.status != 1:
+                break
+
+    for tx in pending:
+        tx.wait(1)
+
+
+def load_observations(mock, observations, shims, sender, gas_limit=None):
+    '''
+    Loads a feed into a `UniswapV3OracleMock` in chunks sized to the block
+    gas limit, submitted ahead of confirmation.
+
+    Loading resumes from the mock's `cardinality`, so it picks up after a
+    failed chunk, within this call up to `RETRIES` times or in a later call
+    with the same feed. Chunks are given `GAS_BUFFER` over their estimate
+    since a chunk failing behind confirmed ones leaves them loaded out of
+    place, which raises rather than resumes.
+
+    Inputs:
+      mock         [Contract]:  UniswapV3OracleMock contract instance
+      observations [list]:      Observations, as in `_raw_uni_framed.json`
+      shims        [list]:      Shims, as in `_raw_uni_framed.json`
+      sender       [Account]:   Account loading the observations
+      gas_limit    [int]:       Block gas limit, the chain's if None
+
+    Output:
+      [int]: Number of observations loaded by this call
+    '''
+    if len(observations) > MAX_CARDINALITY:
+        raise ValueError('load_observations: feed exceeds mock cardinality')
+
+    start = first = loaded(mock, observations)
+
+    if start == len(observations):
+        return 0
+
+    fixed_gas, observation_gas = measure_gas(
+        mock, observations[start:], shims[start:], sender)
+
+    gas_limit = chain.block_gas_limit if gas_limit is None else gas_limit
+    size = chunk_size(fixed_gas, observation_gas, gas_limit)
+    gas = int((fixed_gas + observation_gas * size) * GAS_BUFFER)
+
+    for _ in range(RETRIES + 1):
+
+        try:
+            _submit(mock, observations, shims, sender, size, gas, start)
+        except VirtualMachineError:
+            pass
+
+        # chunks confirmed behind a failed one load out of place, which
+        # `loaded` catches by checking the newest loaded observation
+        start = loaded(mock, observations)
+
+        if start == len(observations):
+            return start - first
+
+    raise RuntimeError('load_observations: failed at cardinality {}'.format(
+        start))
@@ -0,0 +1,59 @@
+import os
+import pytest
+from scripts.feeds import load_feed
+
+
+@pytest.hookimpl(tryfirst=True, optionalhook=True)
+def pytest_xdist_make_scheduler(config, log):
+    '''
+    Hands tests out to `brownie test -n` workers one at a time, rather than
+    a module at a time as brownie does, so the long hypothesis modules of
+    the market tests spread over every worker. Each worker runs its own
+    dev chain, on the development port plus its worker number, and deploys
+    the market stack once, so any test can run on any worker.
+
+    `--update` keeps brownie's module scheduling, as the results it caches
+    for it are stored per module by whichever worker ran the module.
+    '''
+    if config.getoption('update', False):
+        return None
+
+    from xdist.scheduler import LoadScheduling
+
+    return LoadScheduling(config, log)
+
+
+@pytest.fixture(scope="module")
+def xdist_isolation():
+    '''
+    Isolation for test directories that must not have brownie reset the
+    chain around each module, as its `module_isolation` does. Brownie's
+    xdist workers only run tests that request a fixture of that name, so
+    those directories override `module_isolation` with one requesting this
+    rather than drop it, adding only what they set up in its place.
+    '''
+    yield
+
+
+@pytest.fixture(scope="session")
+def feed_infos():
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    market_path = '../feeds/univ3_dai_weth'
+    depth_path = '../feeds/univ3_axs_weth'
+
+    market_info = load_feed(os.path.normpath(os.path.join(base, market_path)))
+    depth_info = load_feed(os.path.normpath(os.path.join(base, depth_path)))
+
+    class FeedSmuggler:
+        def __init__(self, market_info, depth_info):
+            self.market_info = market_info
+            self.depth_info = depth_info
+
+        def market_info(self):
+            return self.market_info
+
+        def depth_info(self):
+            return self.depth_info
+
+    yield FeedSmuggler(market_info, depth_info)
@@ -0,0 +1,405 @@
+"""
+Differential fuzzing of the offline model against the deployed contracts.
+
+Random sequences of builds, unwinds, liquidations, share transfers and
+block mining run on `scripts/simulation.py` in bulk, where each costs
+milliseconds. A sampled few, and any that break the model's own
+invariants, are replayed op by op on the contracts with the model in
+lockstep at the same block times. Failing sequences are shrunk to a minimal
+trace by delta debugging.
+
+Both sides are driven through the same stack interface: `build`, `unwind`,
+`liquidate`, `transfer`, `mine`, `balance_of` and `observe`, reverting with
+`Revert`. `ModelStack` is the offline one, the contract one lives with the
+tests that deploy it.
+"""
+import math
+import random
+import typing as tp
+
+import numpy as np
+
+from tests.simulation import Chain, Revert, UniswapV3Feed, deploy
+
+
+''' SEQUENCE PARAMETERS '''
+ACTORS = 2  # traders, holding OVL and shares
+LENGTH = 30  # ops per sequence
+HORIZON = 6 * 3600  # seconds a sequence mines at most
+SEQUENCES = 500
+SAMPLE = .02  # share of sequences replayed on chain
+SEED = 0
+
+KINDS = ('build',) * 4 + ('unwind',) * 3 + ('liquidate', 'transfer') \
+    + ('mine',) * 3
+SLEEPS = (1, 13, 60, 600, 3600)
+COLLATERAL_EXPONENTS = (14, 22)  # collateral from 1e14 to 1e22 OVL wei
+MAX_LEVERAGE = 101  # one past the markets under test, to hit the revert
+FRACTIONS = (1, 250, 500, 1000)  # per mille of the balance unwound or sent
+POSITIONS = 1 << 16  # position references, taken modulo positions built
+
+
+class Op(tp.NamedTuple):
+    kind: str  # build, unwind, liquidate, transfer or mine
+    actor: int  # index of the trader sending it
+    args: tp.Tuple  # see `generate`
+
+
+class Outcome(tp.NamedTuple):
+    result: tp.Optional[int]  # position id of a build
+    revert: tp.Optional[str]  # revert string, if reverted
+    state: tp.Tuple[int, ...]  # observation after the op, see `observe`
+    error: tp.Optional[str] = None  # exception other than `Revert` raised
+
+
+class Mismatch(tp.NamedTuple):
+    ops: tp.List[Op]  # sequence up to and including the divergent op
+    expected: Outcome  # of the contracts
+    actual: Outcome  # of the model
+
+
+class Report(tp.NamedTuple):
+    sequences: int
+    replayed: int
+    anomalies: tp.List[tp.Tuple[tp.List[Op], str]]
+    mismatches: tp.List[Mismatch]
+
+
+def generate(
+    rng: random.Random,
+    length: int = LENGTH,
+    actors: int = ACTORS,
+    horizon: int = HORIZON
+) -> tp.List[Op]:
+    """
+    Random op sequence. Args of each kind are
+
+        build      (collateral, leverage, is_long)
+        unwind     (position, fraction)
+        liquidate  (position,)
+        transfer   (position, recipient, fraction)
+        mine       (seconds,)
+
+    with `position` a reference to the positions built so far, resolved by
+    each stack against its own, and `fraction` per mille of the sender's
+    balance of it. Consecutive ops without a mine between them share a
+    block time on the model.
+    """
+    ops = []
+    elapsed = 0
+
+    for _ in range(length):
+        kind = rng.choice(KINDS)
+        actor = rng.randrange(actors)
+
+        if kind == 'build':
+            args = (
+                int(10 ** rng.uniform(*COLLATERAL_EXPONENTS)),
+                rng.randint(1, MAX_LEVERAGE),
+                rng.random() < .5
+            )
+        elif kind == 'unwind':
+            args = (rng.randrange(POSITIONS), rng.choice(FRACTIONS))
+        elif kind == 'liquidate':
+            args = (rng.randrange(POSITIONS),)
+        elif kind == 'transfer':
+            args = (rng.randrange(POSITIONS), rng.randrange(actors),
+                    rng.choice(FRACTIONS))
+        else:
+            seconds = min(rng.choice(SLEEPS), horizon - elapsed)
+            elapsed += seconds
+            args = (seconds,)
+
+        ops.append(Op(kind, actor, args))
+
+    return ops
+
+
+def _position(built: tp.List[int], reference: int) -> int:
+    return built[reference % len(built)] if built else 0
+
+
+def apply(stack, op: Op, built: tp.List[int]) -> Outcome:
+    """
+    Applies `op` to `stack`, appending new position ids to `built`.
+    """
+    kind, actor, args = op
+    result = revert = pid = None
+
+    try:
+        if kind == 'mine':
+            stack.mine(*args)
+        elif kind == 'build':
+            result = pid = int(stack.build(actor, *args))
+            if pid not in built:
+                built.append(pid)
+        else:
+            pid = _position(built, args[0])
+            if kind == 'unwind':
+                shares = stack.balance_of(actor, pid) * args[1] // 1000
+                stack.unwind(actor, pid, shares)
+            elif kind == 'liquidate':
+                stack.liquidate(actor, pid)
+            else:
+                shares = stack.balance_of(actor, pid) * args[2] // 1000
+                stack.transfer(actor, args[1], pid, shares)
+    except Revert as e:
+        revert = e.revert_msg
+
+    return Outcome(result, revert, stack.observe(pid))
+
+
+def check(stack: 'ModelStack',
+          ops: tp.List[Op]) -> tp.Optional[tp.Tuple[int, str]]:
+    """
+    Runs `ops` on the model alone, returning the index and description of
+    the first op that breaks an invariant or raises other than `Revert`.
+    """
+    built = []
+    for i, op in enumerate(ops):
+        try:
+            apply(stack, op, built)
+        except Exception as e:
+            return i, "{}: {}".format(type(e).__name__, e)
+
+        anomaly = stack.anomaly()
+        if anomaly:
+            return i, anomaly
+
+    return None
+
+
+def lockstep(chain, model: 'ModelStack',
+             ops: tp.List[Op]) -> tp.Optional[Mismatch]:
+    """
+    Replays `ops` on the contracts, applying each to the model at the block
+    time the contracts saw it, and returns the first op on which they
+    differ. An op the model raises on other than with `Revert` differs,
+    with the exception as its outcome.
+    """
+    chain_built, model_built = [], []
+
+    for i, op in enumerate(ops):
+        expected = apply(chain, op, chain_built)
+
+        model.at(chain.timestamp)
+        try:
+            actual = apply(
+                model,
+                op._replace(args=(0,)) if op.kind == 'mine' else op,
+                model_built
+            )
+        except Exception as e:
+            actual = Outcome(None, None, (),
+                             "{}: {}".format(type(e).__name__, e))
+
+        if expected != actual:
+            return Mismatch(ops[:i + 1], expected, actual)
+
+    return None
+
+
+def shrink(
+    ops: tp.List[Op],
+    failing: tp.Callable[[tp.List[Op]], bool]
+) -> tp.List[Op]:
+    """
+    Subsequence of `ops` still `failing` from which no single chunk can be
+    dropped, by delta debugging: chunks are dropped while the failure
+    persists, halving in size once none can be.
+    """
+    n = 2
+    while len(ops) >= 2:
+        chunk = math.ceil(len(ops) / n)
+
+        for start in range(0, len(ops), chunk):
+            candidate = ops[:start] + ops[start + chunk:]
+            if failing(candidate):
+                ops = candidate
+                n = max(n - 1, 2)
+                break
+        else:
+            if chunk == 1:
+                break
+            n = min(2 * n, len(ops))
+
+    return ops
+
+
+def format_trace(ops: tp.List[Op],
+                 mismatch: tp.Optional[Mismatch] = None) -> str:
+    """
+    One op per line, with the contract and model outcomes of the last op of
+    a mismatch.
+    """
+    lines = [
+        "{:>4} {:<9} actor {} {}".format(i, op.kind, op.actor, op.args)
+        for i, op in enumerate(ops)
+    ]
+
+    if mismatch is not None:
+        lines.append("  contracts: {}".format(mismatch.expected))
+        lines.append("  model:     {}".format(mismatch.actual))
+
+    return "\n".join(lines)
+
+
+def fuzz(
+    make_model: tp.Callable[[], 'ModelStack'],
+    replay: tp.Callable[[tp.List[Op]], tp.Optional[Mismatch]],
+    sequences: int = SEQUENCES,
+    length: int = LENGTH,
+    sample: float = SAMPLE,
+    seed: int = SEED,
+    horizon: int = HORIZON
+) -> Report:
+    """
+    Fuzzes `sequences` random op sequences on fresh models from
+    `make_model`, replaying a `sample` of them and every one breaking a
+    model invariant through `replay`, which runs `lockstep` on freshly
+    reverted contracts. Anomalies and mismatches come back shrunk.
+    """
+    rng = random.Random(seed)
+
+    replayed = 0
+    anomalies = []
+    mismatches = []
+
+    for _ in range(sequences):
+        ops = generate(rng, length, horizon=horizon)
+        sampled = rng.random() < sample
+
+        anomaly = check(make_model(), ops)
+        if anomaly:
+            shrunk = shrink(
+                ops[:anomaly[0] + 1],
+                lambda o: check(make_model(), o) is not None
+            )
+            anomalies.append((shrunk, check(make_model(), shrunk)[1]))
+
+        if not (sampled or anomaly):
+            continue
+
+        replayed += 1
+        mismatch = replay(ops)
+        if mismatch:
+            shrunk = shrink(mismatch.ops, lambda o: replay(o) is not None)
+            mismatches.append(replay(shrunk))
+
+    return Report(sequences, replayed, anomalies, mismatches)
+
+
+class ModelStack:
+    """
+    The offline model behind the stack interface, traders as their indices.
+    """
+
+    def __init__(
+        self,
+        market_info: tp.Tuple[list, list],
+        depth_info: tp.Tuple[list, list],
+        deployed: int,
+        balances: tp.List[int],
+        **feed_params
+    ):
+        """
+        Inputs:
+          market_info [tuple]:  Market feed observations and shims
+          depth_info  [tuple]:  OVL/ETH feed observations and shims
+          deployed    [int]:    Deployment time of the market
+          balances    [list]:   OVL balance of each trader
+          feed_params [dict]:   Further `UniswapV3Feed` parameters
+        """
+        self.chain = Chain(deployed)
+        self.mothership, self.market, self.collateral = deploy(
+            self.chain, UniswapV3Feed(market_info, depth_info, **feed_params))
+        self.ovl = self.mothership.ovl
+        self.actors = list(range(len(balances)))
+
+        for actor, balance in enumerate(balances):
+            self.ovl.mint(actor, balance)
+
+    @property
+    def timestamp(self) -> int:
+        return self.chain.time()
+
+    def at(self, timestamp: int) -> 'ModelStack':
+        self.chain.mine(timestamp=timestamp)
+        return self
+
+    def mine(self, seconds: int) -> None:
+        self.chain.sleep(seconds)
+
+    def build(self, actor: int, collateral: int, leverage: int,
+              is_long: bool) -> int:
+        return self.collateral.build(
+            actor, self.market, collateral, leverage, is_long)
+
+    def unwind(self, actor: int, position_id: int, shares: int) -> None:
+        self.collateral.unwind(actor, position_id, shares)
+
+    def liquidate(self, actor: int, position_id: int) -> None:
+        self.collateral.liquidate(position_id, actor)
+
+    def transfer(self, actor: int, recipient: int, position_id: int,
+                 shares: int) -> None:
+        self.collateral.safe_transfer_from(
+            actor, recipient, position_id, shares)
+
+    def balance_of(self, actor: int, position_id: int) -> int:
+        return self.collateral.balance_of(actor, position_id)
+
+    def observe(self, position_id: tp.Optional[int]) -> tp.Tuple[int, ...]:
+        """
+        Fields but the market of the position, its total supply and the
+        traders' shares of it, then the OVL of the traders and collateral
+        manager, its fees and liquidations and the market's open interest
+        shares. Open interest itself is left out, as its views pay funding
+        up to the time of the call.
+        """
+        collateral = self.collateral
+
+        position = ()
+        if position_id is not None:
+            position = tuple(collateral.positions.info(position_id))[1:] \
+                + (collateral.total_supply(position_id),) \
+                + tuple(collateral.balance_of(a, position_id)
+                        for a in self.actors)
+
+        return tuple(int(v) for v in position + tuple(
+            self.ovl.balance_of(a) for a in self.actors
+        ) + (
+            self.ovl.balance_of(collateral),
+            collateral.fees,
+            collateral.liquidations,
+            self.market.oi_long_shares,
+            self.market.oi_short_shares
+        ))
+
+    def anomaly(self) -> tp.Optional[str]:
+        """
+        Description of a broken invariant: open interest shares of the
+        market's positions summing to the market's on each side, and share
+        balances summing to each position's total supply.
+        """
+        positions, shares = self.collateral.positions, self.collateral.shares
+        ids = positions.of(self.market)
+        is_long = positions['is_long'][ids]
+        oi_shares = positions['oi_shares'][ids]
+
+        if sum(oi_shares[is_long]) != self.market.oi_long_shares:
+            return "long oi shares of positions != market's"
+        if sum(oi_shares[~is_long]) != self.market.oi_short_shares:
+            return "short oi shares of positions != market's"
+
+        held = np.zeros(len(positions), dtype=object)
+        np.add.at(held, shares['position'], shares['balance'])
+        supply = np.zeros(len(positions), dtype=object)
+        n = min(len(shares.supply), len(positions))
+        supply[:n] = shares.supply[:n]
+
+        for position_id in np.flatnonzero(held != supply).tolist():
+            return "shares of position {} != total supply".format(
+                position_id)
+
+        return None
@@ -0,0 +1,122 @@
+import brownie
+from brownie import chain
+
+from tests.differential import ModelStack, format_trace, fuzz, lockstep
+from tests.simulation import Revert
+
+
+SEQUENCES = 500
+SAMPLE = .02
+SEED = 0
+START = 200  # seconds after deployment sequences start at
+
+
+class ChainStack:
+    '''
+    The deployed collateral manager and market behind the stack interface
+    of `tests.differential`, traders as indices into `actors`.
+    '''
+
+    def __init__(self, ovl_collateral, market, token, actors):
+        self.collateral = ovl_collateral
+        self.market = market
+        self.token = token
+        self.actors = actors
+        self.timestamp = chain[-1].timestamp
+
+    def at(self, timestamp):
+        chain.mine(timestamp=timestamp)
+        self.timestamp = timestamp
+        return self
+
+    def mine(self, seconds):
+        if seconds:
+            self.at(self.timestamp + seconds)
+
+    def _send(self, fn, actor, *args):
+        try:
+            tx = fn(*args, {'from': self.actors[actor]})
+        except brownie.exceptions.VirtualMachineError as e:
+            self.timestamp = chain[-1].timestamp
+            raise Revert(e.revert_msg)
+
+        self.timestamp = tx.timestamp
+        return tx
+
+    def build(self, actor, collateral, leverage, is_long):
+        tx = self._send(self.collateral.build, actor, self.market,
+                        collateral, leverage, is_long, 0)
+        return tx.events['Build']['positionId']
+
+    def unwind(self, actor, position_id, shares):
+        self._send(self.collateral.unwind, actor, position_id, shares)
+
+    def liquidate(self, actor, position_id):
+        self._send(self.collateral.liquidate, actor, position_id,
+                   self.actors[actor])
+
+    def transfer(self, actor, recipient, position_id, shares):
+        self._send(self.collateral.safeTransferFrom, actor,
+                   self.actors[actor], self.actors[recipient], position_id,
+                   shares, '')
+
+    def balance_of(self, actor, position_id):
+        return self.collateral.balanceOf(self.actors[actor], position_id)
+
+    def observe(self, position_id):
+        collateral = self.collateral
+
+        position = ()
+        if position_id is not None:
+            position = tuple(collateral.positions(position_id))[1:] \
+                + (collateral.totalSupply(position_id),) \
+                + tuple(collateral.balanceOf(a, position_id)
+                        for a in self.actors)
+
+        return tuple(int(v) for v in position + tuple(
+            self.token.balanceOf(a) for a in self.actors
+        ) + (
+            self.token.balanceOf(collateral),
+            collateral.fees(),
+            collateral.liquidations(),
+            self.market.oiLongShares(),
+            self.market.oiShortShares()
+        ))
+
+
+def test_model_matches_contracts(stack, feed_infos, token, market,
+                                 ovl_collateral, alice, bob):
+    '''
+    Test that random build, unwind, liquidate and transfer sequences leave
+    the contracts and the offline model in the same state op by op,
+    fuzzing the model in bulk and replaying a sample on chain.
+    '''
+    actors = [alice, bob]
+
+    # the market has not updated since it was deployed
+    assert market.pricePointNextIndex() == 1
+    deployed = market.updated()
+    balances = [token.balanceOf(a) for a in actors]
+
+    def make_model():
+        model = ModelStack(feed_infos.market_info, feed_infos.depth_info,
+                           deployed, balances)
+        return model.at(deployed + START)
+
+    assert make_model().market.read_price_point(0) \
+        == tuple(market.pricePoints(0))
+
+    def replay(ops):
+        stack.restore()
+        contracts = ChainStack(ovl_collateral, market, token, actors)
+        return lockstep(contracts.at(deployed + START), make_model(), ops)
+
+    report = fuzz(make_model, replay, SEQUENCES, sample=SAMPLE, seed=SEED)
+
+    assert report.replayed > 0
+    assert not report.anomalies, "\n\n".join(
+        "{}\n{}".format(message, format_trace(ops))
+        for ops, message in report.anomalies)
+    assert not report.mismatches, "\n\n".join(
+        format_trace(mismatch.ops, mismatch)
+        for mismatch in report.mismatches)
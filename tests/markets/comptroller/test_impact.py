@@ -4,6 +4,16 @@ from brownie import chain
 from brownie.test import given, strategy
 from decimal import Decimal
 from pytest import approx
+from scripts.comptroller import CHORD, Comptroller
+from scripts.fixed_point import \
+    ONE, \
+    div_down, \
+    mul_down, \
+    pow_up, \
+    pow_up_array, \
+    sub
+
+INVERSE_E = 0x51AF86713316A9A
 
 ONE_BLOCK = 13
 
@@ -149,6 +159,23 @@ def test_impact_pressure(comptroller, entry):
     assert abs(expected - impact) < 1e6
 
 
+@given(entry=strategy('uint256', min_value=1, max_value=1e24))
+def test_impact_matches_fixed_point(comptroller, entry):
+
+    chain.mine(timedelta=ONE_BLOCK)
+
+    cap = comptroller.oiCap()
+
+    _lambda = comptroller.lmbda()
+
+    impact = comptroller.viewImpact(True, entry)
+
+    power = mul_down(_lambda, div_down(entry, cap))
+
+    assert impact == sub(ONE, pow_up(INVERSE_E, power))
+    assert pow_up_array([INVERSE_E], [power])[0] == pow_up(INVERSE_E, power)
+
+
 @given(
     entry=strategy('uint256', min_value=1, max_value=.370400e6),
     rand=strategy('int', min_value=100, max_value=1000))
@@ -169,6 +196,42 @@ def test_impact_pressure_full_cooldown_entry_within_cap(comptroller, entry, rand
     assert impact == 0
 
 
+def test_impact_matches_replay(comptroller):
+
+    replay = Comptroller(
+        comptroller.impactRollers(0)[0],
+        comptroller.lmbda(),
+        comptroller.oiCap(),
+        comptroller.brrrrdExpected(),
+        comptroller.brrrrdWindowMacro(),
+        comptroller.brrrrdWindowMicro(),
+        comptroller.impactWindow()
+    )
+
+    times, is_long, entries = [], [], []
+
+    # enough blocks to wrap the rollers around past the impact window
+    for i in range(CHORD + 10):
+        chain.mine(timedelta=ONE_BLOCK * (1 + i % 3))
+        batch_is_long = [i % 2 == 0, True]
+        batch_entries = [(i + 1) * 1e18, 2e18]
+        tx = comptroller.impactBatch(batch_is_long, batch_entries)
+
+        times += [tx.timestamp] * len(batch_is_long)
+        is_long += batch_is_long
+        entries += [int(entry) for entry in batch_entries]
+
+    impacts = replay.replay_intake(times, is_long, entries)
+
+    assert impacts[-1] == tx.return_value
+    assert replay.impact_rollers.cycloid == comptroller.impactCycloid()
+    assert replay.impact_rollers.rollers == [
+        tuple(comptroller.impactRollers(i)) for i in range(CHORD)]
+    assert replay.brrrrd_accumulator == [
+        comptroller.brrrrdAccumulator(0), comptroller.brrrrdAccumulator(1)]
+    assert replay.brrrrd_filing == comptroller.brrrrdFiling()
+
+
 def test_impact_when_earliest_roller_is_more_contemporary_than_impact_window(comptroller):  # noqa: E501
     pass
 
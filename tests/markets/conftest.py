@@ -1,7 +1,5 @@
 import pytest
 import brownie
-import os
-import json
 from brownie import (
     OverlayTokenNew,
     ComptrollerShim,
@@ -9,6 +7,7 @@ from brownie import (
     interface,
     UniTest
 )
+from scripts.uploader import load_observations
 
 TOKEN_DECIMALS = 18
 TOKEN_TOTAL_SUPPLY = 8000000e18
@@ -33,12 +32,7 @@ BRRRR_WINDOW_MICRO = 86400
 WRAPPED_ETH_ADDR = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
 
 
-@pytest.fixture(autouse=True)
-def isolation(fn_isolation):
-    pass
-
-
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def gov(accounts):
     '''
     Input:
@@ -50,7 +44,7 @@ def gov(accounts):
     yield accounts[0]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def rewards(accounts):
     '''
     Input:
@@ -62,7 +56,7 @@ def rewards(accounts):
     yield accounts[1]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def alice(accounts):
     '''
     Input:
@@ -74,7 +68,7 @@ def alice(accounts):
     yield accounts[2]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def bob(accounts):
     '''
     Input:
@@ -86,7 +80,7 @@ def bob(accounts):
     yield accounts[3]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def fees(accounts):
     '''
     Input:
@@ -98,7 +92,7 @@ def fees(accounts):
     yield accounts[4]
 
 
-@pytest.fixture(scope="module", params=["IOverlayV1Market"])
+@pytest.fixture(scope="session", params=["IOverlayV1Market"])
 def notamarket(accounts):
     '''
     We need this because we cannot mutate the market object in tests (mutated
@@ -116,7 +110,7 @@ def notamarket(accounts):
     yield accounts[5]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def feed_owner(accounts):
     '''
     Input:
@@ -128,7 +122,7 @@ def feed_owner(accounts):
     yield accounts[6]
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def create_token(gov, alice, bob):
     '''
     Instantiates an OverlyTokenNew token contract.
@@ -152,53 +146,6 @@ def create_token(gov, alice, bob):
     yield create_token
 
 
-@pytest.fixture(scope="module")
-def token(create_token):
-    yield create_token()
-
-
-@pytest.fixture(scope="module")
-def feed_infos():
-
-    base = os.path.dirname(os.path.abspath(__file__))
-    market_path = '../../feeds/univ3_dai_weth'
-    depth_path = '../../feeds/univ3_axs_weth'
-
-    raw_uni_framed_market_path = os.path.join(base,
-                                              market_path +
-                                              '_raw_uni_framed.json')
-    reflected_market_path = os.path.join(base, market_path + '_reflected.json')
-    raw_uni_framed_depth_path = os.path.join(base,
-                                             depth_path +
-                                             '_raw_uni_framed.json')
-    reflected_depth_path = os.path.join(base, depth_path + '_reflected.json')
-
-    with open(os.path.normpath(raw_uni_framed_market_path)) as f:
-        market_mock = json.load(f)
-    with open(os.path.normpath(reflected_market_path)) as f:
-        market_reflection = json.load(f)
-    with open(os.path.normpath(raw_uni_framed_depth_path)) as f:
-        depth_mock = json.load(f)
-    with open(os.path.normpath(reflected_depth_path)) as f:
-        depth_reflection = json.load(f)
-
-    class FeedSmuggler:
-        def __init__(self, market_info, depth_info):
-            self.market_info = market_info
-            self.depth_info = depth_info
-
-        def market_info(self):
-            return self.market_info
-
-        def depth_info(self):
-            return self.depth_info
-
-    yield FeedSmuggler(
-        (market_mock['observations'], market_mock['shims'], market_reflection),
-        (depth_mock['observations'], depth_mock['shims'], depth_reflection)
-    )
-
-
 def get_uni_feeds(feed_owner, feed_info):
 
     market_obs = feed_info.market_info[0]
@@ -223,32 +170,32 @@ def get_uni_feeds(feed_owner, feed_info):
     market_mock = IUniswapV3OracleMock(uniswapv3_factory.allPools(0))
     depth_mock = IUniswapV3OracleMock(uniswapv3_factory.allPools(1))
 
-    market_mock.loadObservations(
-        market_obs, market_shims, {'from': feed_owner})
-
-    depth_mock.loadObservations(depth_obs, depth_shims, {'from': feed_owner})
+    load_observations(market_mock, market_obs, market_shims, feed_owner)
+    load_observations(depth_mock, depth_obs, depth_shims, feed_owner)
 
     chain.mine(timestamp=feed_info.market_info[2]['timestamp'][0])
 
     return uniswapv3_factory.address, market_mock.address, depth_mock.address, market_token1   # noqa: E501
 
 
-@pytest.fixture(scope="module")
-def comptroller(gov, feed_infos, token, feed_owner):
+@pytest.fixture(scope="session")
+def create_comptroller(gov, feed_infos, feed_owner):
 
-    _, marketFeed, depthFeed, quote = get_uni_feeds(feed_owner, feed_infos)
+    def create_comptroller(tok):
+        _, marketFeed, depthFeed, quote = get_uni_feeds(feed_owner,
+                                                        feed_infos)
 
-    comptroller = gov.deploy(ComptrollerShim, LAMBDA, STATIC_CAP,
-                             BRRRR_EXPECTED, BRRRR_WINDOW_MACRO,
-                             BRRRR_WINDOW_MICRO, PRICE_WINDOW_MACRO,
-                             PRICE_WINDOW_MICRO, marketFeed, depthFeed,
-                             token.address, WRAPPED_ETH_ADDR)
+        return gov.deploy(ComptrollerShim, LAMBDA, STATIC_CAP,
+                          BRRRR_EXPECTED, BRRRR_WINDOW_MACRO,
+                          BRRRR_WINDOW_MICRO, PRICE_WINDOW_MACRO,
+                          PRICE_WINDOW_MICRO, marketFeed, depthFeed,
+                          tok.address, WRAPPED_ETH_ADDR)
 
-    yield comptroller
+    yield create_comptroller
 
 
 @pytest.fixture(
-    scope="module",
+    scope="session",
     params=[
         ("OverlayV1Mothership", [
             .0015e18,      # fee
@@ -277,14 +224,13 @@ def comptroller(gov, feed_infos, token, feed_owner):
          get_uni_feeds,
         ),
     ])
-def create_mothership(token, feed_infos, fees, alice, bob, gov, feed_owner,
+def create_mothership(feed_infos, fees, alice, bob, gov, feed_owner,
                       request):
     '''
     Deploys and sets up OverlayV1Mothership contract for the market related
     tests.
 
     Inputs:
-      token       [ProjectContract]: OverlayToken contract instance
       feed_infos  []:                TODO
       alice       [EthAddress]:      Alice's account
       bob         [EthAddress]:      Bob's account
@@ -321,7 +267,7 @@ def create_mothership(token, feed_infos, fees, alice, bob, gov, feed_owner,
 
     Output:
       create_mothership generator produces an instantiated Mothership contract
-      when called
+      on the OVL token `tok` when called
     '''
     # Set OverlayV1Mothership, OverlayV1UniswapV3Market, and
     # OverlayV1OVLCollateral contract constructor arguments from pytest fixture
@@ -335,7 +281,7 @@ def create_mothership(token, feed_infos, fees, alice, bob, gov, feed_owner,
     ovlms_args_w_feeto = [fees] + ovlms_args
 
     def create_mothership(
-        tok=token,
+        tok,
         ovlms_type=ovlms,
         ovlms_args=ovlms_args_w_feeto,
         ovlm_type=ovlm,
@@ -412,8 +358,120 @@ def create_mothership(token, feed_infos, fees, alice, bob, gov, feed_owner,
     yield create_mothership
 
 
+class Deployment:
+    '''
+    Token, comptroller and market stack deployed once and held in a chain
+    snapshot, which `restore` reverts to in milliseconds rather than
+    deploying it all again.
+    '''
+
+    def __init__(self, deploy):
+        self.deploy = deploy
+        self.token = self.comptroller = self.mothership = None
+        self.snap()
+
+    def snap(self):
+        '''
+        Deploys the stack on a reset chain, so always to the same addresses,
+        and snapshots the chain.
+        '''
+        chain.reset()
+        token, comptroller, mothership = self.deploy()
+
+        if self.mothership is not None:
+            assert [c.address for c in (token, comptroller, mothership)] == \
+                [c.address for c in (self.token, self.comptroller,
+                                     self.mothership)], \
+                "redeployed market stack moved address"
+
+        self.token = token
+        self.comptroller = comptroller
+        self.mothership = mothership
+
+        chain.snapshot()
+        self.block = chain[-1].hash
+        self.timestamp = chain[-1].timestamp
+
+    def restore(self):
+        '''
+        Reverts the chain to the deployed stack with the clock back at the
+        deployment, so tests see the same chain however late in the session
+        they run. Redeploys if the snapshot is gone, e.g. after another test
+        directory's `module_isolation` reset the chain.
+        '''
+        try:
+            chain.revert()
+        except ValueError:  # no snapshot since a chain reset
+            pass
+
+        if len(chain) == 0 or chain[-1].hash != self.block:
+            self.snap()
+
+        chain.mine(timestamp=self.timestamp)
+
+
+@pytest.fixture(scope="session")
+def deployment(create_token, create_comptroller, create_mothership):
+    '''
+    Deploys the stack the market tests share once per session, instead of
+    once per module under brownie's `module_isolation`.
+
+    Inputs:
+      create_token       [function]: Deploys the OVL token
+      create_comptroller [function]: Deploys a ComptrollerShim on a token
+      create_mothership  [function]: Deploys a mothership, market and
+                                     collateral manager on a token
+
+    Output:
+      [Deployment]: Deployed stack and the snapshot to revert to
+    '''
+    def deploy():
+        token = create_token()
+        mothership = create_mothership(token)
+        comptroller = create_comptroller(token)
+        return token, comptroller, mothership
+
+    yield Deployment(deploy)
+
+
 @pytest.fixture(scope="module")
-def start_time():
+def stack(deployment):
+    '''
+    The session deployment, reverted to at the start of each module.
+    '''
+    deployment.restore()
+    yield deployment
+
+
+@pytest.fixture(scope="module")
+def module_isolation(xdist_isolation, stack):
+    '''
+    Deploys the stack the session shares, which a chain reset would lose.
+    '''
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolation(module_isolation, stack):
+    '''
+    Reverts the chain to the deployed stack after each test.
+    '''
+    yield
+    stack.restore()
+
+
+@pytest.fixture(scope="session")
+def token(deployment):
+    yield deployment.token
+
+
+@pytest.fixture(scope="session")
+def comptroller(deployment):
+    yield deployment.comptroller
+
+
+@pytest.fixture(scope="module")
+def start_time(stack):
     '''
     Output:
         [int]: current chain time from brownie plus 200 seconds
@@ -421,12 +479,12 @@ def start_time():
     return chain.time() + 200
 
 
-@pytest.fixture(scope="module")
-def mothership(create_mothership):
-    yield create_mothership()
+@pytest.fixture(scope="session")
+def mothership(deployment):
+    yield deployment.mothership
 
 
-@pytest.fixture(scope="module", params=['IOverlayV1OVLCollateral'])
+@pytest.fixture(scope="session", params=['IOverlayV1OVLCollateral'])
 def ovl_collateral(mothership, request):
     '''
     Gets the IOverlayV1OVLCollateral contract address for 0th collateral index
@@ -446,7 +504,7 @@ def ovl_collateral(mothership, request):
     yield ovl_collateral
 
 
-@pytest.fixture(scope="module", params=["IOverlayV1Market"])
+@pytest.fixture(scope="session", params=["IOverlayV1Market"])
 def market(mothership, request):
     '''
     Gets the IOverlayV1Market contract address for 0th market index stored in
@@ -466,7 +524,7 @@ def market(mothership, request):
     yield market
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture
 def uni_test(gov, rewards, accounts):
 
     #  dai_eth = "0xc2e9f25be6257c210d7adf0d4cd6e3e881ba25f8"
@@ -2,6 +2,7 @@ import brownie
 from brownie import chain
 from brownie.test import given, strategy
 from pytest import approx
+from scripts.funding import compute_funding_array
 
 
 @given(
@@ -50,3 +51,35 @@ def test_funding_total_imbalance(bob, market, oi, ovl_collateral, start_time,
 
     assert oi_after_payment == approx(
             expected_oi_after_payment, rel=1e-04), 'oi after funding payment different than expected'  # noqa: E501
+
+
+@given(
+  oi_long=strategy('uint256', min_value=1, max_value=10000),
+  oi_short=strategy('uint256', min_value=0, max_value=10000))
+def test_funding_matches_batched(bob, market, ovl_collateral, start_time,
+                                 oi_long, oi_short):
+
+    brownie.chain.mine(timestamp=start_time)
+
+    ovl_collateral.build(market, oi_long * 1e16, 1, True, 0, {'from': bob})
+    if oi_short > 0:
+        ovl_collateral.build(market, oi_short * 1e16, 1, False, 0,
+                             {'from': bob})
+
+    market.update({'from': bob})
+
+    COMPOUND_PERIOD = market.compoundingPeriod()
+    epochs = [1, 2, 3, 5, 8, 13, 21]
+
+    expected_long, expected_short, _ = compute_funding_array(
+        market.oiLong(), market.oiShort(), epochs, market.k())
+
+    elapsed = 0
+    for i, epoch in enumerate(epochs):
+        chain.mine(timedelta=COMPOUND_PERIOD * (epoch - elapsed))
+        elapsed = epoch
+
+        oi_long_now, oi_short_now, _, _ = market.oi()
+
+        assert oi_long_now == expected_long[i]
+        assert oi_short_now == expected_short[i]
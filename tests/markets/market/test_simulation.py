@@ -0,0 +1,58 @@
+import brownie
+from brownie import chain
+from brownie.test import given, strategy
+
+from tests.simulation import Chain, UniswapV3Feed, deploy
+
+
+WRAPPED_ETH_ADDR = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+
+
+@given(
+    collateral=strategy('uint256', min_value=1e18, max_value=1e21),
+    leverage=strategy('uint8', min_value=1, max_value=100),
+    is_long=strategy('bool'),
+    hold=strategy('uint256', min_value=1, max_value=7200))
+def test_simulation_matches_market(ovl_collateral, token, market, bob,
+                                   feed_infos, start_time, collateral,
+                                   leverage, is_long, hold):
+    '''
+    Test that the offline model builds and unwinds a position to the same
+    open interest, fees and balances as the market and collateral manager.
+    '''
+    feed = UniswapV3Feed(
+        feed_infos.market_info,
+        feed_infos.depth_info,
+        ovl_lt_eth=int(token.address, 16) < int(WRAPPED_ETH_ADDR, 16)
+    )
+
+    sim_chain = Chain(market.compounded())
+    sim_mothership, sim_market, sim_collateral = deploy(sim_chain, feed)
+    sim_mothership.ovl.mint(bob, token.balanceOf(bob))
+
+    brownie.chain.mine(timestamp=start_time)
+
+    tx = ovl_collateral.build(market, collateral, leverage, is_long, 0,
+                              {'from': bob})
+    pid = tx.events['Build']['positionId']
+
+    sim_chain.mine(timestamp=tx.timestamp)
+    sim_pid = sim_collateral.build(bob, sim_market, collateral, leverage,
+                                   is_long)
+
+    assert sim_collateral.balance_of(bob, sim_pid) \
+        == ovl_collateral.balanceOf(bob, pid)
+    assert sim_market.oi()[:2] == (market.oiLong(), market.oiShort())
+
+    chain.mine(timedelta=hold)
+
+    tx = ovl_collateral.unwind(pid, ovl_collateral.balanceOf(bob, pid),
+                               {'from': bob})
+
+    sim_chain.mine(timestamp=tx.timestamp)
+    sim_collateral.unwind(bob, sim_pid,
+                          sim_collateral.balance_of(bob, sim_pid))
+
+    assert sim_market.oi() == tuple(market.oi())
+    assert sim_collateral.fees == ovl_collateral.fees()
+    assert sim_mothership.ovl.balance_of(bob) == token.balanceOf(bob)
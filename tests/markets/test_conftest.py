@@ -1,3 +1,4 @@
+from brownie import chain
 from brownie.convert import EthAddress
 from brownie.network.account import Account
 
@@ -87,3 +88,22 @@ def test_create_mothership(mothership, gov):
     #  assert 3 == 3
     #  assert 5 == 5
     #  assert 5 == 5
+
+
+def test_stack_restores_deployment(stack, token, mothership, alice, bob):
+    '''
+    Test that restoring the session deployment reverts what a test did and
+    puts the clock back, leaving the same contracts deployed.
+    '''
+    balance = token.balanceOf(alice)
+    markets = mothership.totalMarkets()
+
+    token.transfer(bob, balance // 2, {"from": alice})
+    chain.mine(timedelta=86400)
+    assert token.balanceOf(alice) == balance - balance // 2
+
+    stack.restore()
+
+    assert token.balanceOf(alice) == balance
+    assert mothership.totalMarkets() == markets
+    assert chain[-1].timestamp == stack.timestamp
@@ -0,0 +1,124 @@
+import pytest
+from brownie import chain
+from scripts.gas import \
+    BASELINE_PATH, \
+    compare, \
+    format_report, \
+    in_one_block, \
+    load_report, \
+    record, \
+    write_report
+
+
+START = 200  # seconds after deployment scenarios start at
+COLLATERAL = 1e18
+LEVERAGE = 1
+FUNDING_EPOCHS = [0, 1, 10, 100]
+ROLLER_FILLS = [0, 30, 60]  # builds before the measured one
+ROLLER_SPACING = 20  # seconds between builds filling the rollers
+LIQUIDATION = {  # a long liquidatable without funding, as in test_liquidate
+    'entry': 1633504052,
+    'liquidation': 1633512812,
+    'collateral': 10e18,
+    'leverage': 10,
+}
+
+
+def sender(account, fn, *args):
+    '''
+    Function sending `fn(*args)` from `account` with the transaction
+    parameters it is given, for `in_one_block`.
+    '''
+    def send(params):
+        return fn(*args, dict(params, **{'from': account}))
+    return send
+
+
+def test_gas_benchmarks(stack, market, ovl_collateral, alice, bob, gov):
+    '''
+    Records the gas of the hot contract paths under controlled scenarios to
+    `scripts.gas.REPORT_PATH` and fails on regressions over the baseline in
+    `tests/markets/gas_baseline.json`. Skips once the report is written if
+    there is no baseline, which `brownie run gas main accept` makes of it.
+    '''
+    report = {}
+    deployed = market.updated()
+
+    def start():
+        stack.restore()
+        chain.mine(timestamp=deployed + START)
+
+    def build(trader, collateral=COLLATERAL, leverage=LEVERAGE,
+              is_long=True):
+        return ovl_collateral.build(market, collateral, leverage, is_long, 0,
+                                    {'from': trader})
+
+    # a price point fetched cold, then read warm in the same block
+    start()
+    cold, warm = in_one_block(
+        sender(gov, market.update), sender(gov, market.update))
+    record(report, 'update.cold', cold)
+    record(report, 'update.warm', warm)
+
+    assert 'fetchPricePoint' in report['update.cold']
+    assert 'fetchPricePoint' not in report['update.warm']
+
+    # first and subsequent builds in a block
+    start()
+    first, second = in_one_block(
+        sender(alice, ovl_collateral.build, market, COLLATERAL, LEVERAGE,
+               True, 0),
+        sender(bob, ovl_collateral.build, market, COLLATERAL, LEVERAGE,
+               False, 0))
+    record(report, 'build.first_in_block', first)
+    record(report, 'build.second_in_block', second)
+
+    # funding paid over a number of compounding epochs
+    period = market.compoundingPeriod()
+    for epochs in FUNDING_EPOCHS:
+        start()
+        tx = build(alice)
+        compounded = market.compounded()
+
+        chain.mine(timestamp=tx.timestamp + epochs * period + 10)
+        tx = market.update({'from': gov})
+
+        assert (market.compounded() - compounded) // period == epochs
+        record(report, 'update.epochs_{}'.format(epochs), tx)
+
+    # builds reading and rolling a roller buffer filled to different depths
+    for fill in ROLLER_FILLS:
+        start()
+        for _ in range(fill):
+            build(alice)
+            chain.sleep(ROLLER_SPACING)
+        record(report, 'build.rollers_{}'.format(fill), build(bob))
+
+    # unwinding a whole position an epoch on
+    start()
+    position = build(alice).events['Build']['positionId']
+    chain.sleep(period)
+    record(report, 'unwind', ovl_collateral.unwind(
+        position, ovl_collateral.balanceOf(alice, position), {'from': alice}))
+
+    # liquidating a position
+    start()
+    market.setK(0, {'from': gov})
+    chain.mine(timestamp=LIQUIDATION['entry'])
+    position = build(bob, LIQUIDATION['collateral'],
+                     LIQUIDATION['leverage']).events['Build']['positionId']
+    chain.mine(timestamp=LIQUIDATION['liquidation'])
+    record(report, 'liquidate', ovl_collateral.liquidate(
+        position, alice, {'from': alice}))
+
+    write_report(report)
+
+    baseline = load_report(BASELINE_PATH)
+    if baseline is None:
+        pytest.skip('no gas baseline at {}, run `brownie run gas main '
+                    'accept` to make one of the report'.format(BASELINE_PATH))
+
+    regressions = compare(report, baseline)
+    assert not regressions, "\n".join(
+        "{}.{}: {} -> {} gas".format(*r) for r in regressions) \
+        + "\n\n" + format_report(report, baseline)
@@ -0,0 +1,47 @@
+from brownie import chain, interface, UniswapV3FactoryMock
+from scripts.paths import \
+    calibrate, \
+    cumulatives, \
+    path_feed, \
+    tick_paths
+from scripts.reflection import SECONDS_AGOS, observe, tick_cumulatives
+from scripts.uploader import load_observations
+
+
+def test_path_feed_observes_path_cumulatives(feed_infos, feed_owner):
+    '''
+    Test that a path loaded into `UniswapV3OracleMock` observes the same
+    tick cumulatives as the path arrays and the offline engine.
+    '''
+    _, shims, reflected = feed_infos.market_info
+    params = calibrate(reflected, shims)
+
+    ticks = tick_paths(1, 180, params['tick'], params['drift'],
+                       params['volatility'], step=60, seed=2)
+    expected = cumulatives(ticks, 60)[0]
+
+    start = chain[-1].timestamp
+    obs, shims = path_feed(ticks[0], params['liquidity'], start, 60)
+
+    factory = feed_owner.deploy(UniswapV3FactoryMock)
+    factory.createPool(
+        "0x6B175474E89094C44Da98b954EedeAC495271d0F",
+        "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    )
+    mock = interface.IUniswapV3OracleMock(factory.allPools(0))
+    load_observations(mock, obs, shims, feed_owner)
+
+    for elapsed in [3600, 3601, 5000, 7777, 10799]:
+
+        chain.mine(timestamp=start + elapsed)
+        now = chain[-1].timestamp
+
+        actual, _ = mock.observe(SECONDS_AGOS)
+
+        assert list(actual) == observe(obs, shims, now, SECONDS_AGOS)[0]
+
+        for i, ago in enumerate(SECONDS_AGOS):
+            at = now - ago - start
+            assert actual[i] == expected[at // 60] \
+                + ticks[0][at // 60] * (at % 60)
+            assert actual[i] == tick_cumulatives(obs, shims, [now], ago)[0]
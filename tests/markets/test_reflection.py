@@ -0,0 +1,37 @@
+from brownie import chain, interface, UniswapV3FactoryMock
+from scripts.reflection import \
+    SECONDS_AGOS, \
+    observe, \
+    tick_cumulatives
+from scripts.uploader import load_observations
+
+
+def test_offline_observe_matches_mock(feed_infos, feed_owner):
+    '''
+    Test that the offline reflection engine reproduces
+    `UniswapV3OracleMock.observe` exactly across the framed market feed.
+    '''
+    obs, shims, reflection = feed_infos.market_info
+
+    factory = feed_owner.deploy(UniswapV3FactoryMock)
+    factory.createPool(
+        "0x6B175474E89094C44Da98b954EedeAC495271d0F",
+        "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    )
+    mock = interface.IUniswapV3OracleMock(factory.allPools(0))
+    load_observations(mock, obs, shims, feed_owner)
+
+    for timestamp in reflection['timestamp'][::97]:
+
+        chain.mine(timestamp=timestamp)
+        now = chain[-1].timestamp
+
+        expect_ticks, expect_liqs = mock.observe(SECONDS_AGOS)
+        actual_ticks, actual_liqs = observe(obs, shims, now, SECONDS_AGOS)
+
+        assert list(expect_ticks) == actual_ticks
+        assert list(expect_liqs) == actual_liqs
+
+        for i, ago in enumerate(SECONDS_AGOS):
+            actual = tick_cumulatives(obs, shims, [now], ago)
+            assert expect_ticks[i] == actual[0]
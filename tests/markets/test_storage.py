@@ -0,0 +1,84 @@
+from brownie import chain
+from scripts.storage import TOTAL, accesses, format_profile, profile
+
+
+START = 200  # seconds after deployment transactions are profiled at
+COLLATERAL = 1e18
+LEVERAGE = 1
+
+# gas of storage accesses by the hardfork of the dev chain: SLOADs by
+# temperature, and SSTOREs by temperature over the no-op, reset and set
+# costs of EIP-2200. Temperatures cost alike until EIP-2929 in Berlin
+SLOAD_GAS = {
+    'istanbul': {True: 800, False: 800},
+    'berlin': {True: 2100, False: 100},
+}
+SSTORE_GAS = {
+    'istanbul': {True: {800, 5000, 20000}, False: {800, 5000, 20000}},
+    'berlin': {True: {2200, 5000, 22100}, False: {100, 2900, 20000}},
+}
+
+
+def hardfork(touched):
+    '''
+    Hardfork of the storage gas a transaction was charged, told by the
+    first slot it loaded, which is cold under any of them.
+    '''
+    first = next(a for a in touched if a.op == 'SLOAD')
+    forks = [f for f, gas in SLOAD_GAS.items() if gas[True] == first.gas]
+    assert forks, \
+        'no hardfork charges {} gas for {}'.format(first.gas, first)
+    return forks[0]
+
+
+def test_storage_profile(stack, market, ovl_collateral, alice, gov,
+                         request):
+    '''
+    Test that the storage accesses of build, unwind and update are
+    attributed to the state variables they touch, and that the accesses
+    counted cold and warm cost what the chain's hardfork charges for them.
+    Prints the profile of each by function when run verbose.
+    '''
+    chain.mine(timestamp=market.updated() + START)
+    period = market.compoundingPeriod()
+
+    build = ovl_collateral.build(market, COLLATERAL, LEVERAGE, True, 0,
+                                 {'from': alice})
+    position = build.events['Build']['positionId']
+
+    chain.sleep(period)
+    unwind = ovl_collateral.unwind(
+        position, ovl_collateral.balanceOf(alice, position), {'from': alice})
+
+    chain.sleep(period)
+    update = market.update({'from': gov})
+
+    contracts = {market._name, ovl_collateral._name}
+    expected = {
+        'build': (build, {'positions', '_balances', '_pricePoints',
+                          'impactRollers', '__oiLong__'}),
+        'unwind': (unwind, {'positions', '_balances', '__oiLong__'}),
+        'update': (update, {'_pricePoints', '__oiLong__'}),
+    }
+
+    kinds = set()
+
+    for name, (tx, variables) in expected.items():
+        touched = accesses(tx)
+        kinds.update((a.op, a.cold) for a in touched)
+        result = profile(touched)
+        if request.config.getoption('verbose') > 0:
+            print('{}\n{}\n'.format(name, format_profile(result)))
+
+        assert variables <= set(result[TOTAL])
+        assert not [a for a in touched if a.variable.startswith('0x')
+                    and a.contract in contracts]
+
+        fork = hardfork(touched)
+        for access in touched:
+            if access.op == 'SLOAD':
+                assert access.gas == SLOAD_GAS[fork][access.cold], access
+            else:
+                assert access.gas in SSTORE_GAS[fork][access.cold], access
+
+    assert {('SLOAD', True), ('SLOAD', False), ('SSTORE', True)} <= kinds
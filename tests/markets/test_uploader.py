@@ -0,0 +1,59 @@
+import pytest
+from brownie import interface, UniswapV3FactoryMock
+from scripts.uploader import \
+    GAS_BUFFER, \
+    GAS_MARGIN, \
+    load_observations, \
+    measure_gas
+
+
+def deploy_mock(feed_owner):
+    factory = feed_owner.deploy(UniswapV3FactoryMock)
+    factory.createPool(
+        "0x6B175474E89094C44Da98b954EedeAC495271d0F",
+        "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    )
+    return interface.IUniswapV3OracleMock(factory.allPools(0))
+
+
+def test_load_observations_in_chunks(feed_infos, feed_owner):
+    '''
+    Test that a gas limit fitting 25 observations per chunk loads the whole
+    market feed in order.
+    '''
+    obs, shims, _ = feed_infos.market_info
+
+    mock = deploy_mock(feed_owner)
+
+    fixed_gas, observation_gas = measure_gas(mock, obs, shims, feed_owner)
+    gas_limit = int(
+        (fixed_gas + observation_gas * 25) * GAS_BUFFER / GAS_MARGIN) + 1
+
+    assert load_observations(mock, obs, shims, feed_owner, gas_limit) \
+        == len(obs)
+
+    assert mock.cardinality() == len(obs)
+    for i in range(0, len(obs), 37):
+        assert list(mock.observations(i)) == list(obs[i])
+        assert list(mock.shims(i)) == list(shims[i])
+
+
+def test_load_observations_resumes(feed_infos, feed_owner):
+    '''
+    Test that loading resumes from the mock's cardinality and refuses a
+    mock holding a different feed.
+    '''
+    obs, shims, _ = feed_infos.market_info
+
+    mock = deploy_mock(feed_owner)
+    mock.loadObservations(obs[:40], shims[:40], {'from': feed_owner})
+
+    assert load_observations(mock, obs, shims, feed_owner) == len(obs) - 40
+    assert mock.cardinality() == len(obs)
+    assert load_observations(mock, obs, shims, feed_owner) == 0
+
+    other = deploy_mock(feed_owner)
+    other.loadObservations(obs[1:41], shims[1:41], {'from': feed_owner})
+
+    with pytest.raises(ValueError):
+        load_observations(other, obs, shims, feed_owner)
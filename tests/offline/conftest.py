@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def module_isolation(xdist_isolation):
+    '''
+    The offline tests never touch the chain, so set up nothing.
+    '''
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolation(module_isolation):
+    pass
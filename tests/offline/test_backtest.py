@@ -0,0 +1,88 @@
+import numpy as np
+from pytest import approx
+from scripts.backtest import FEE, OPEN, PRICE_FRAME_CAP, Backtest
+from scripts.price_index import PriceIndex
+from tests.simulation import ONE, Position
+
+
+class HourlyPairs:
+    '''
+    Builds a long and a short every ten minutes, unwinding each an hour on
+    and everything left at point `last`, tallying the OVL spent and paid.
+    '''
+
+    def __init__(self, last):
+        self.last = last
+        self.spent = 0.
+        self.paid = 0.
+
+    def __call__(self, backtest, i):
+        if i % 10 == 0:
+            backtest.build(100., [1, 5], [True, False])
+            self.spent += 200.
+
+        ids = backtest.open_ids()
+        if i != self.last:
+            ids = ids[backtest['entry'][ids] <= i - 60]
+        self.paid += backtest.unwind(ids).sum()
+
+
+def test_backtest_pnl_matches_position_value(feed_infos):
+    '''
+    Test that the backtester pays out positions their `Position._value` at
+    the `priceFrame` of their entry and exit bid and ask, less fees, and
+    that their PnL sums to the OVL paid out less the OVL spent.
+    '''
+    index = PriceIndex(feed_infos.market_info[2])
+
+    backtest = Backtest(index, capacity=2)
+    strategy = HourlyPairs(len(index) - 1)
+    report = backtest.run(strategy)
+
+    assert len(backtest) == 2 * len(range(0, len(index), 10))
+    assert np.all(report['exit'] >= report['entry'])
+
+    for i in range(0, len(backtest), 7):
+        oi = int(report['oi'][i] * ONE)
+        debt = int(report['debt'][i] * ONE)
+        frame = int(backtest.frames([i], report['exit'][i])[0] * ONE)
+
+        pos = Position(None, bool(report['is_long'][i]), 1, 0, oi, debt)
+        notional = pos.notional(oi, oi, frame) / ONE
+
+        paid = notional * (1 - backtest.fee) - report['debt'][i]
+        assert report['value'][i] == approx(max(paid, 0.), rel=1e-9)
+
+    assert report['pnl'].sum() == approx(
+        strategy.paid - strategy.spent, rel=1e-9, abs=1e-9)
+
+
+def test_report_marks_open_positions(feed_infos):
+    '''
+    Test that positions still open are reported at what they would pay out
+    unwound at the current point, from their bid and ask at entry and now.
+    '''
+    index = PriceIndex(feed_infos.market_info[2])
+    bid, ask = index.series['bid'], index.series['ask']
+
+    backtest = Backtest(index)
+    backtest.build(100., [1, 5], [True, False])
+    backtest.now = 90
+
+    report = backtest.report()
+
+    assert list(report['exit']) == [OPEN, OPEN]
+    assert list(report['value']) == [0., 0.]
+
+    for i, (leverage, is_long) in enumerate([(1, True), (5, False)]):
+        cost = 100. - 100. * leverage * FEE
+        oi, debt = cost * leverage, cost * (leverage - 1)
+        frame = min(bid[90] / ask[0], PRICE_FRAME_CAP) if is_long \
+            else ask[90] / bid[0]
+
+        pos = Position(None, is_long, 1, 0, int(oi * ONE), int(debt * ONE))
+        notional = pos.notional(int(oi * ONE), int(oi * ONE),
+                                int(frame * ONE)) / ONE
+
+        value = max(notional * (1 - FEE) - debt, 0.)
+        assert report['pnl'][i] == approx(value - 100., rel=1e-9)
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+from scripts import cache
+from scripts.feeds import COLUMNS_EXT
+from scripts.reflection import reflection_key, reflection_params
+
+
+def fill(cache_dir, keys):
+    for key in keys:
+        cache.store(key, {'x': np.arange(64)}, cache_dir, limit=1 << 30)
+
+
+def test_concurrent_evictions_skip_removed_entries(tmp_path, monkeypatch):
+    '''
+    Test that an eviction racing another over the same directory skips the
+    entries the other removed, whether they go between its listing and its
+    stats or between its stats and its removals.
+    '''
+    cache_dir = str(tmp_path)
+    keys = ['{:064x}'.format(i) for i in range(3)]
+    listdir, remove = os.listdir, os.remove
+    raced = []
+
+    def other():
+        # a concurrent worker evicting the whole cache, once
+        if not raced:
+            raced.append(None)
+            raced[0] = cache.evict(cache_dir, 0)
+
+    def stale_listdir(path):
+        names = listdir(path)
+        other()
+        return names
+
+    def racing_remove(path):
+        other()
+        remove(path)
+
+    for name, racing in [('listdir', stale_listdir),
+                         ('remove', racing_remove)]:
+        fill(cache_dir, keys)
+        raced.clear()
+
+        with monkeypatch.context() as m:
+            m.setattr(os, name, racing)
+            assert cache.evict(cache_dir, 0) == []
+
+        assert sorted(raced[0]) == keys
+        assert listdir(cache_dir) == []
+
+
+def test_lookup_hits_unchanged_feed_and_params(tmp_path):
+    '''
+    Test that a reflection is served from the cache while its raw feed and
+    parameters are unchanged, and missed once the feed's bytes or any one
+    parameter change.
+    '''
+    cache_dir = str(tmp_path / 'cache')
+    prefix = str(tmp_path / 'feed')
+    with open(prefix + '_raw_uni.json', 'w') as f:
+        f.write('[[1, 2, 3]]')
+
+    key = reflection_key(prefix)
+    cache.store(key, {'x': np.arange(8)}, cache_dir)
+
+    hit = cache.lookup(reflection_key(prefix, reflection_params()),
+                       cache_dir)
+    assert hit is not None
+    assert list(hit['x']) == list(range(8))
+    assert cache.column_key(hit) == key
+
+    for overrides in [{'step': 30}, {'windows': [1800]}, {'pbnj': .01}]:
+        assert cache.lookup(
+            reflection_key(prefix, reflection_params(**overrides)),
+            cache_dir) is None
+
+    with open(prefix + '_raw_uni.json', 'w') as f:
+        f.write('[[1, 2, 4]]')
+    assert cache.lookup(reflection_key(prefix), cache_dir) is None
+
+
+def test_evicts_least_recently_used(tmp_path):
+    '''
+    Test that entries are evicted least recently used first, a lookup
+    counting as a use, until the cache fits its limit.
+    '''
+    cache_dir = str(tmp_path)
+    keys = ['{:064x}'.format(i) for i in range(4)]
+    fill(cache_dir, keys[:3])
+
+    for i, key in enumerate(keys[:3]):
+        os.utime(cache.entry_path(key, cache_dir), (1000 * i, 1000 * i))
+    size = os.path.getsize(cache.entry_path(keys[0], cache_dir))
+
+    assert cache.lookup(keys[0], cache_dir) is not None
+    cache.store(keys[3], {'x': np.arange(64)}, cache_dir,
+                limit=int(3.5 * size))
+
+    assert cache.lookup(keys[1], cache_dir) is None
+    assert cache.evict(cache_dir, int(2.5 * size)) == [keys[2]]
+    assert sorted(k[:-len(COLUMNS_EXT)] for k in os.listdir(cache_dir)) \
+        == [keys[0], keys[3]]
@@ -0,0 +1,62 @@
+from tests.differential import ModelStack, Op, check, fuzz, lockstep
+
+
+START = 200  # seconds after deployment sequences start at
+BALANCES = [10 ** 22, 10 ** 22]
+OPS = [
+    Op('build', 0, (10 ** 18, 1, True)),
+    Op('mine', 0, (60,)),
+    Op('build', 1, (10 ** 18, 5, False)),
+    Op('unwind', 0, (0, 1000)),
+]
+
+
+class BrokenStack(ModelStack):
+    '''
+    Model crashing on its second build, as on a bug in its arithmetic.
+    '''
+
+    built = False
+
+    def build(self, actor, collateral, leverage, is_long):
+        if self.built:
+            raise ZeroDivisionError('division by zero')
+        self.built = True
+        return super().build(actor, collateral, leverage, is_long)
+
+
+def test_lockstep_reports_model_crashes(feed_infos):
+    '''
+    Test that a model raising other than `Revert` mid replay comes back as
+    a mismatch on the op it raised on, with the exception as its outcome,
+    and that the fuzzer replays such sequences without crashing.
+    '''
+    deployed = feed_infos.market_info[0][0][0] + 7200
+
+    def make(stack):
+        def make_model():
+            return stack(feed_infos.market_info, feed_infos.depth_info,
+                         deployed, BALANCES).at(deployed + START)
+        return make_model
+
+    make_model, make_broken = make(ModelStack), make(BrokenStack)
+
+    assert check(make_broken(), OPS) == (2, 'ZeroDivisionError: '
+                                            'division by zero')
+    assert lockstep(make_model(), make_model(), OPS) is None
+
+    mismatch = lockstep(make_model(), make_broken(), OPS)
+    assert mismatch.ops == OPS[:3]
+    assert mismatch.expected.error is None
+    assert mismatch.actual.error == 'ZeroDivisionError: division by zero'
+
+    def replay(ops):
+        return lockstep(make_model(), make_broken(), ops)
+
+    report = fuzz(make_broken, replay, sequences=5, length=10, sample=0.)
+
+    assert report.replayed == len(report.anomalies) > 0
+    assert len(report.mismatches) == report.replayed
+    for mismatch in report.mismatches:
+        assert [op.kind for op in mismatch.ops].count('build') == 2
+        assert mismatch.actual.error.startswith('ZeroDivisionError')
@@ -0,0 +1,44 @@
+import os
+import json
+import shutil
+from scripts import feeds
+
+
+FEEDS = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../../feeds'))
+
+
+def test_load_feed_caches_parsed_feed(tmp_path, monkeypatch):
+    '''
+    Test that `load_feed` parses the JSON files once, serves later loads
+    from the columnar file while the files only get touched, and parses
+    them again once their content changes.
+    '''
+    for suffix in ('_raw_uni_framed.json', '_reflected.json'):
+        shutil.copy(os.path.join(FEEDS, 'univ3_dai_weth' + suffix),
+                    str(tmp_path))
+    prefix = str(tmp_path / 'univ3_dai_weth')
+
+    expect = feeds.load_feed(prefix)
+    assert os.path.exists(prefix + feeds.COLUMNS_EXT)
+
+    def unparsed(f):
+        raise AssertionError("parsed {}".format(f.name))
+
+    with monkeypatch.context() as m:
+        m.setattr(json, 'load', unparsed)
+
+        assert feeds.load_feed(prefix) == expect
+
+        os.utime(prefix + '_reflected.json')
+        assert feeds.load_feed(prefix) == expect
+
+    with open(prefix + '_reflected.json') as f:
+        reflected = json.load(f)
+    reflected['spot'][0] *= 2
+    with open(prefix + '_reflected.json', 'w') as f:
+        json.dump(reflected, f)
+
+    actual = feeds.load_feed(prefix)
+    assert actual[2]['spot'][0] == 2 * expect[2]['spot'][0]
+    assert actual[:2] == expect[:2]
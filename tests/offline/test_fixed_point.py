@@ -0,0 +1,53 @@
+import pytest
+from scripts import fixed_point
+from scripts.fixed_point import ONE, UINT256_MAX, Revert
+
+
+OVERFLOWS = [
+    (fixed_point.add, UINT256_MAX, 1),
+    (fixed_point.mul_down, UINT256_MAX, 2),
+    (fixed_point.mul_up, UINT256_MAX, 2),
+    (fixed_point.div_down, UINT256_MAX, ONE),
+    (fixed_point.div_up, UINT256_MAX, ONE),
+    (fixed_point.mul_down_array, [1, UINT256_MAX], [1, 2]),
+    (fixed_point.mul_up_array, [1, UINT256_MAX], [1, 2]),
+    (fixed_point.div_down_array, [1, UINT256_MAX], [1, ONE]),
+    (fixed_point.div_up_array, [1, UINT256_MAX], [1, ONE]),
+]
+
+
+@pytest.mark.parametrize('fn,a,b', OVERFLOWS)
+def test_overflow_panics(fn, a, b):
+    '''
+    Test that sums, products and inflated dividends out of uint256 revert
+    as solidity's checked arithmetic does, before `FixedPoint`'s own
+    checks could.
+    '''
+    with pytest.raises(Revert, match='^Integer overflow$'):
+        fn(a, b)
+
+
+def test_pow_up_array_overflow_panics(monkeypatch):
+    '''
+    Test that `pow_up_array` reverts on the sum of its result and error
+    bound overflowing, as `FixedPoint.powUp` does.
+    '''
+    monkeypatch.setattr(fixed_point, 'power_array',
+                        lambda x, y: fixed_point.as_array([UINT256_MAX]))
+
+    with pytest.raises(Revert, match='^Integer overflow$'):
+        fixed_point.pow_up_array([2 * ONE], [ONE])
+
+
+def test_required_errors():
+    '''
+    Test that the checks solidity runs before any arithmetic keep their
+    `Errors.sol` codes.
+    '''
+    for fn in (fixed_point.div_down, fixed_point.div_up,
+               fixed_point.div_down_array, fixed_point.div_up_array):
+        with pytest.raises(Revert, match='^BAL#004$'):
+            fn(ONE, 0)
+
+    with pytest.raises(Revert, match='^BAL#001$'):
+        fixed_point.sub(1, 2)
@@ -0,0 +1,82 @@
+import os
+import numpy as np
+from scripts import ingest
+from scripts.feeds import X128_WORDS, from_words
+
+
+POOL = 'UniswapV3: WETH / DAI .3%'
+EXPECTED = {
+    'uniswap_v3_DAI_WETH.csv': {
+        'uniswap_v3_DAI_WETH': {
+            'observed.tick_cumulative': ('<i8', (595, 2)),
+        },
+    },
+    'uniswapv3_eth_dai.csv': {
+        'uniswapv3_eth_dai': {
+            'observations.timestamp': ('<u4', (2603,)),
+            'observations.tick_cumulative': ('<i8', (2603,)),
+        },
+    },
+    'univ3_mock_feeds_1.json': {
+        POOL: {
+            'observed.timestamp': ('<u4', (3223,)),
+            'observed.tick_cumulative': ('<i8', (3223, 2)),
+            'observed.liquidity_cumulative': ('<u8', (3223, 2, X128_WORDS)),
+        },
+    },
+}
+
+
+def test_load_fixture_normalizes_and_caches(tmp_path, monkeypatch):
+    '''
+    Test that each fixture loads into typed columns holding its exact
+    values, and that a second load is served from the cache unparsed.
+    '''
+    cache_dir = str(tmp_path)
+    loaded = {}
+
+    for name, feeds in EXPECTED.items():
+        path = os.path.join(ingest.FIXTURES_DIR, name)
+        loaded[name] = ingest.load_fixture(path, cache_dir)
+
+        assert sorted(loaded[name]) == sorted(feeds)
+        for feed, columns in feeds.items():
+            assert {
+                k: (c.dtype.str, c.shape)
+                for k, c in loaded[name][feed].items()
+            } == columns
+
+    pairs = loaded['uniswap_v3_DAI_WETH.csv']['uniswap_v3_DAI_WETH']
+    assert pairs['observed.tick_cumulative'][0].tolist() \
+        == [-71134107587, -71084259608]
+    assert pairs['observed.tick_cumulative'][-1].tolist() \
+        == [-100330225786, -100281562982]
+
+    series = loaded['uniswapv3_eth_dai.csv']['uniswapv3_eth_dai']
+    assert series['observations.timestamp'][[0, -1]].tolist() \
+        == [1620160534, 1621721126]
+    assert series['observations.tick_cumulative'][[0, -1]].tolist() \
+        == [-94763359, -127189076553]
+
+    mock = loaded['univ3_mock_feeds_1.json'][POOL]
+    assert mock['observed.timestamp'][:2].tolist() == [1621023366, 1621023939]
+    assert mock['observed.tick_cumulative'][1].tolist() \
+        == [-71181713573, -71131864373]
+    assert from_words(mock['observed.liquidity_cumulative'][0]) \
+        == [51867185408125919426427, 51867075099759743813291]
+
+    def unparsed(path):
+        raise AssertionError('parsed {}'.format(path))
+
+    monkeypatch.setattr(ingest, 'ingest', unparsed)
+
+    for name, feeds in loaded.items():
+        cached = ingest.load_fixture(
+            os.path.join(ingest.FIXTURES_DIR, name), cache_dir)
+
+        assert sorted(cached) == sorted(feeds)
+        for feed, columns in feeds.items():
+            assert sorted(cached[feed]) == sorted(columns)
+            for k, column in columns.items():
+                assert cached[feed][k].dtype == column.dtype
+                assert np.array_equal(cached[feed][k], column)
@@ -0,0 +1,71 @@
+import random
+from tests.simulation import \
+    MARGIN_MAINTENANCE, \
+    MARGIN_REWARD_RATE, \
+    Chain, \
+    Revert, \
+    StaticFeed, \
+    deploy, \
+    mul_up
+
+
+def test_scan_matches_liquidate():
+    '''
+    Test that a scan finds exactly the positions `liquidate` would take,
+    at their value and reward, as the price moves through them.
+    '''
+    rng = random.Random(0)
+
+    chain = Chain(1633520012)
+    feed = StaticFeed(-80000)
+    mothership, market, collateral = deploy(
+        chain, feed, static_cap=10 ** 30)
+    mothership.ovl.mint('bob', 10 ** 30)
+
+    found = 0
+    for _ in range(30):
+        chain.sleep(rng.choice([13, 60, 600]))
+        feed.micro_tick = feed.macro_tick = \
+            feed.micro_tick + rng.randint(-300, 300)
+
+        for _ in range(5):
+            collateral.build('bob', market, rng.randrange(10**18, 10**21),
+                             rng.randint(1, 100), rng.random() < .5)
+
+        scanned = collateral.liquidatable(market)
+
+        expected = []
+        for i in range(len(collateral.positions)):
+            pos = collateral.position(i)
+            oi, oi_shares, frame = market.position_info(
+                pos.is_long, pos.price_point)
+            if pos.oi_shares and pos.is_liquidatable(
+                    oi, oi_shares, frame, MARGIN_MAINTENANCE):
+                bid, ask, _ = market.read_price_point(pos.price_point)
+                try:
+                    price = pos.liquidation_price(
+                        oi, oi_shares, ask if pos.is_long else bid,
+                        MARGIN_MAINTENANCE)
+                except Revert:
+                    price = 0
+                expected.append((i, pos.value(oi, oi_shares, frame), price))
+
+        assert list(zip(scanned.ids, scanned.values, scanned.prices)) \
+            == expected
+        found += len(expected)
+
+        # liquidate reverts on positions worth more than their cost
+        takeable = [
+            j for j, i in enumerate(scanned.ids)
+            if scanned.values[j] <= collateral.position(i).cost
+        ]
+        if takeable:
+            j = takeable[0]
+            before = mothership.ovl.balance_of('alice')
+            collateral.liquidate(int(scanned.ids[j]), 'alice')
+
+            reward = mothership.ovl.balance_of('alice') - before
+            assert reward == scanned.rewards[j]
+            assert reward == mul_up(scanned.values[j], MARGIN_REWARD_RATE)
+
+    assert found > 0
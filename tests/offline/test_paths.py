@@ -0,0 +1,21 @@
+import numpy as np
+from pytest import approx
+from scripts.paths import calibrate, tick_paths
+
+
+def test_paths_match_calibration(feed_infos):
+    '''
+    Test that Monte Carlo paths realize the volatility calibrated from the
+    reflected market feed.
+    '''
+    obs, shims, reflected = feed_infos.market_info
+
+    params = calibrate(reflected, shims)
+
+    ticks = tick_paths(2000, 240, params['tick'], params['drift'],
+                       params['volatility'], step=60, seed=1)
+
+    assert ticks.shape == (2000, 240)
+    assert np.all(ticks[:, 0] == params['tick'])
+    assert np.diff(ticks, axis=1).std() / np.sqrt(60) \
+        == approx(params['volatility'], rel=.02)
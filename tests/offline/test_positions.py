@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scripts.positions import Positions, Shares
+from tests.simulation import Chain, Revert, StaticFeed, deploy
+
+
+def test_store_batches_and_reverts_whole():
+    '''
+    Test that batched updates accumulate over repeated ids, and that an
+    underflowing update leaves every position as it was.
+    '''
+    positions = Positions(capacity=2)
+    ids = positions.extend('market', [True, False] * 3, 5, np.arange(6))
+    assert len(positions) == 6 and list(ids) == list(range(6))
+
+    positions.add([0, 0, 3], oi_shares=10 ** 30, debt=4, cost=1)
+    assert positions.info(0).oi_shares == 2 * 10 ** 30
+    assert positions.info(3).debt == 4
+
+    with pytest.raises(Revert):
+        positions.sub([0, 3], debt=[1, 5])
+    assert list(positions['debt'][[0, 3]]) == [8, 4]
+
+    shares = Shares(capacity=1)
+    shares.mint(['bob', 'alice', 'bob'], [0, 0, 3], 7)
+    assert shares.balance_of('bob', 0) == 7
+    assert shares.total_supply(0) == 14
+
+    with pytest.raises(Revert):
+        shares.burn('bob', [0, 3], [7, 8])
+    assert shares.balance_of('bob', 3) == 7
+    assert shares.total_supply(3) == 7
+
+
+def test_restore_branches_collateral():
+    '''
+    Test that a collateral manager restored to a snapshot drops the
+    positions and shares of the branch taken since, and branches again.
+    '''
+    chain = Chain(1633520012)
+    mothership, market, collateral = deploy(chain, StaticFeed(-80000))
+    mothership.ovl.mint('bob', 10 ** 24)
+    chain.sleep(60)
+
+    pid = collateral.build('bob', market, 10 ** 20, 5, True)
+    shares = collateral.balance_of('bob', pid)
+    before = collateral.positions.info(pid)
+    snapshot = collateral.snapshot()
+
+    def branch():
+        chain.sleep(60)
+        other = collateral.build('bob', market, 10 ** 20, 2, False)
+        collateral.unwind('bob', pid, shares // 3)
+        return other
+
+    other = branch()
+    assert collateral.positions.info(pid).oi_shares < before.oi_shares
+
+    collateral.restore(snapshot)
+    assert len(collateral.positions) == 2
+    assert collateral.positions.info(pid) == before
+    assert collateral.balance_of('bob', pid) == shares
+    assert collateral.total_supply(pid) == shares
+    assert collateral.balance_of('bob', other) == 0
+
+    assert branch() == other
+    assert collateral.balance_of('bob', pid) == shares - shares // 3
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from scripts.price_index import SERIES, PriceIndex
+
+
+def reflection(timestamps):
+    '''
+    Reflected series over `timestamps`, each point's prices its index plus
+    a distinct offset per series.
+    '''
+    points = np.arange(len(timestamps), dtype=np.float64)
+    reflected = {'timestamp': list(timestamps)}
+    reflected.update({
+        key: (points + i / 10).tolist()
+        for i, key in enumerate(SERIES.values())
+    })
+    return reflected
+
+
+def test_at_selects_point_in_effect():
+    '''
+    Test that the prices in effect at a time are those of the latest point
+    at or before it, on and between grid timestamps.
+    '''
+    index = PriceIndex(reflection(range(1000, 1600, 60)))
+
+    assert index.step == 60
+    assert (index.start, index.end) == (1000, 1600)
+
+    for time, ix in [(1000, 0), (1059, 0), (1060, 1), (1061, 1),
+                     (1540, 9), (1599, 9)]:
+        prices = index.at(time)
+        assert prices['timestamp'] == 1000 + 60 * ix
+        for i, name in enumerate(SERIES):
+            assert prices[name] == ix + i / 10
+
+
+def test_irregular_grid_falls_back_to_search():
+    '''
+    Test that an irregular reflection is searched, and selects the same
+    points a scan for the latest one at or before each time does.
+    '''
+    timestamps = [1000, 1060, 1075, 1200, 1201, 1500]
+    index = PriceIndex(reflection(timestamps))
+
+    assert index.step is None
+    assert index.end == 1501
+
+    times = np.arange(1000, 1501)
+    expected = [max(i for i, t in enumerate(timestamps) if t <= time)
+                for time in times]
+
+    assert index.index(times).tolist() == expected
+    assert index.index(1074) == 1
+    assert index.index(1075) == 2
+
+
+def test_lookup_is_shaped_as_times():
+    '''
+    Test that vectorized lookups return one price per time, shaped as the
+    times queried.
+    '''
+    index = PriceIndex(reflection(range(0, 600, 60)))
+    times = np.array([[0, 59, 60], [300, 301, 599]])
+
+    prices = index.lookup(times, 'spot')
+
+    assert prices.shape == (2, 3)
+    assert prices.tolist() == [[.2, .2, 1.2], [5.2, 5.2, 9.2]]
+    assert index.lookup(times[0], 'ask').shape == (3,)
+    assert index.lookup(np.array(60), 'ask').shape == ()
+
+
+def test_between_is_half_open():
+    '''
+    Test that range queries return the points in `[start, end)`.
+    '''
+    index = PriceIndex(reflection(range(0, 600, 60)))
+
+    points = index.between(60, 240)
+    assert points['timestamp'].tolist() == [60, 120, 180]
+    assert points['spot'].tolist() == [1.2, 2.2, 3.2]
+
+    assert index.between(61, 120)['timestamp'].tolist() == []
+    assert index.between(-100, 1000)['timestamp'].tolist() \
+        == list(range(0, 600, 60))
+
+
+def test_times_outside_reflection_raise():
+    '''
+    Test that times before the first point, or from a step after the last,
+    raise.
+    '''
+    index = PriceIndex(reflection(range(0, 600, 60)))
+
+    for times in [-1, 600, [0, 600], np.array([-1, 0])]:
+        with pytest.raises(ValueError, match='outside of reflection'):
+            index.index(times)
+
+    with pytest.raises(ValueError):
+        index.at(600)
+    with pytest.raises(ValueError):
+        index.lookup([599, 600], 'bid')
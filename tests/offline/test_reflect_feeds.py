@@ -0,0 +1,58 @@
+import os
+import json
+import shutil
+from scripts import cache
+from scripts.reflect_feeds import OFFLINE, reflect_batch, reflect_feed
+from scripts.reflection import REFLECTED, reflection_key
+
+
+FEEDS = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../../feeds'))
+NAMES = ('univ3_dai_weth', 'univ3_axs_weth')
+OUTPUTS = ('_raw_uni_framed.json', '_reflected.json')
+
+
+def copy_feeds(directory):
+    '''
+    Copies the raw committed feeds into `directory`, returning their
+    prefixes there with their cached reflections evicted.
+    '''
+    os.mkdir(directory)
+
+    prefixes = []
+    for name in NAMES:
+        prefix = os.path.join(directory, name)
+        shutil.copyfile(os.path.join(FEEDS, name + '_raw_uni.json'),
+                        prefix + '_raw_uni.json')
+
+        entry = cache.entry_path(reflection_key(prefix))
+        if os.path.exists(entry):
+            os.remove(entry)
+
+        prefixes.append(prefix)
+
+    return prefixes
+
+
+def test_batch_matches_single_process(tmp_path):
+    '''
+    Test that reflecting the committed feeds offline over two worker
+    processes writes the outputs that reflecting each in this process with
+    `reflect_feed` does, from the same default start.
+    '''
+    single = copy_feeds(str(tmp_path / 'single'))
+    for prefix in single:
+        assert reflect_feed(prefix, OFFLINE) == REFLECTED
+
+    batch = copy_feeds(str(tmp_path / 'batch'))
+    results = reflect_batch([str(tmp_path / 'batch' / '*')], OFFLINE,
+                            workers=2)
+
+    assert sorted(results) == sorted(batch)
+    assert {status for status, _ in results.values()} == {REFLECTED}
+
+    for single_prefix, batch_prefix in zip(single, batch):
+        for suffix in OUTPUTS:
+            with open(single_prefix + suffix) as f, \
+                    open(batch_prefix + suffix) as g:
+                assert json.load(f) == json.load(g)
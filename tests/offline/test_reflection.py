@@ -0,0 +1,135 @@
+import os
+import json
+import shutil
+import pytest
+from pytest import approx
+from scripts.reflection import \
+    CACHED, \
+    CHAIN_POINT_SECONDS, \
+    CURRENT, \
+    OUTPUT_BYTES_PER_SECOND, \
+    append, \
+    budget, \
+    lookback, \
+    observe, \
+    reflect, \
+    reflect_prefix, \
+    reflection_params, \
+    reflection_times, \
+    restore_reflection, \
+    seconds_agos
+
+
+FEEDS = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../../feeds'))
+
+
+def test_append_matches_full_reflection(feed_infos):
+    '''
+    Test that appending the tail of the market feed to a reflection of its
+    head reproduces the reflection of the whole feed.
+    '''
+    obs, shims, reflection = feed_infos.market_info
+
+    cut = len(obs) // 2
+    head_obs = [list(ob) for ob in obs[:cut]]
+    head_shims = [list(shim) for shim in shims[:cut]]
+    tail = [(list(ob), list(shim)) for ob, shim in zip(obs, shims)]
+
+    timestamps = [
+        t for t in reflection['timestamp'] if t < head_obs[-1][0]
+    ]
+    _, head = reflect(head_obs, head_shims, timestamps)
+    head = {k: list(v) for k, v in head.items()}
+
+    obs_, shims_, reflected, _ = append(head_obs, head_shims, head, tail)
+
+    assert obs_ == [list(ob) for ob in obs]
+    assert shims_ == [list(shim) for shim in shims]
+    assert reflected['timestamp'] == list(reflection['timestamp'])
+    for k in ['one_hr', 'ten_min', 'spot', 'bids', 'asks']:
+        assert reflected[k] == approx(reflection[k], rel=1e-15)
+
+
+def test_reflection_at_custom_step_and_windows(feed_infos):
+    '''
+    Test that a reflection at a non-default step, micro window and extra
+    windows observes the framed feed as `observe` does at those windows,
+    and that its budget counts the same points.
+    '''
+    obs, shims, _ = feed_infos.market_info
+    params = reflection_params(step=300, micro=900, windows=[7200, 1800])
+
+    assert params['windows'] == [1800, 7200]
+    assert seconds_agos(params) == [3600, 900, 1, 0, 1800, 7200]
+
+    times = reflection_times(obs[0][0] + lookback(params), obs, params)
+    cumulatives, reflected = reflect(obs, shims, times, params)
+
+    assert list(reflected['timestamp']) == times
+    assert all(b - a == 300 for a, b in zip(times, times[1:]))
+
+    for k in range(0, len(times), 37):
+        ticks, _ = observe(obs, shims, times[k], seconds_agos(params))
+        assert cumulatives[:, k].tolist() == ticks
+
+        now = ticks[3]
+        assert reflected['ten_min'][k] == approx(
+            1.0001 ** ((now - ticks[1]) / 900), rel=1e-12)
+        for window, then in zip([1800, 7200], ticks[4:]):
+            assert reflected['twap_{}'.format(window)][k] == approx(
+                1.0001 ** ((now - then) / window), rel=1e-12)
+
+    estimate = budget(obs, shims, params, chain=True)
+    assert estimate['points'] == len(times)
+    assert estimate['output'] > 0
+    assert estimate['seconds'] == approx(
+        len(times) * CHAIN_POINT_SECONDS
+        + estimate['output'] / OUTPUT_BYTES_PER_SECOND)
+    assert budget(obs, shims, params)['points'] == len(times)
+
+
+@pytest.mark.parametrize('overrides', [
+    {'step': 0},
+    {'micro': 1},
+    {'micro': 7200},
+    {'windows': [1]},
+    {'frame': 3600},
+    {'windows': [86400]},
+    {'lookback': 60},
+])
+def test_invalid_reflection_params_raise(overrides):
+    '''
+    Test that unknown parameters, and steps or windows the mock cannot
+    observe, are rejected.
+    '''
+    with pytest.raises(ValueError, match='^reflection_params'):
+        reflection_params(**overrides)
+
+
+def test_restored_reflection_begins_at_start(tmp_path):
+    '''
+    Test that a cached reflection restored for another start is shifted to
+    begin at it, as reflecting anew from that start would, and is current
+    for that start only.
+    '''
+    raw = os.path.join(FEEDS, 'univ3_dai_weth_raw_uni.json')
+    prefixes = [str(tmp_path / name) for name in ('cached', 'fresh')]
+    for prefix in prefixes:
+        shutil.copyfile(raw, prefix + '_raw_uni.json')
+
+    cached, fresh = prefixes
+    params = reflection_params(step=3600)
+    start = 1633600000
+
+    reflect_prefix(cached, start, params=params)
+    assert restore_reflection(cached, start, params) == CURRENT
+
+    for shifted in [start + 86400, start - 3600]:
+        assert restore_reflection(cached, shifted, params) == CACHED
+        assert restore_reflection(cached, shifted, params) == CURRENT
+
+        reflect_prefix(fresh, shifted, cached=False, params=params)
+        for suffix in ['_raw_uni_framed.json', '_reflected.json']:
+            with open(cached + suffix) as f, open(fresh + suffix) as g:
+                assert json.load(f) == json.load(g)
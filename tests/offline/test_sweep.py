@@ -0,0 +1,42 @@
+from scripts.sweep import \
+    COLUMNS, \
+    DEFAULTS, \
+    format_table, \
+    grid, \
+    parse_axis, \
+    run_point
+
+
+def test_grid_varies_swept_parameters_only():
+    '''
+    Test that a grid covers every combination of the swept values and
+    keeps the other parameters at their deployment defaults.
+    '''
+    points = grid(**dict([
+        parse_axis('LAMBDA=.3e18,1e18'),
+        parse_axis('MARGIN_MAINTENANCE=.06e18,.2e18,.3e18')
+    ]))
+
+    assert len(points) == 6
+    assert {p['LAMBDA'] for p in points} == {3 * 10 ** 17, 10 ** 18}
+    assert all(p['K'] == DEFAULTS['K'] for p in points)
+
+
+def test_run_point_is_reproducible():
+    '''
+    Test that a sample point trades the same order flow to the same result
+    on every run, so points of a sweep are comparable.
+    '''
+    params = dict(DEFAULTS, MARGIN_MAINTENANCE=2 * 10 ** 17)
+
+    first = run_point(params, 'dai_weth', horizon=3600)
+    again = run_point(params, 'dai_weth', horizon=3600)
+
+    first.pop('seconds'), again.pop('seconds')
+    assert first == again
+    assert first['builds'] >= first['rejected']
+    assert first['unwinds'] + first['liquidations'] \
+        <= first['builds'] - first['rejected']
+
+    table = format_table([dict(first, point=0, **params)], ['LAMBDA'])
+    assert table.splitlines()[0].split() == COLUMNS[:-1] + ['LAMBDA']